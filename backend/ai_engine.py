@@ -1,20 +1,234 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so processes on one host may each train
+    fcntl = None
+
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 import joblib
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from compiled_forest import CompiledForest
+from micro_batcher import MicroBatcher
+from nutrient_matrix import NutrientMatrix
+
+# Trained models live in one directory per version under MODEL_DIR; LATEST names the one to serve
+MODEL_DIR = os.environ.get('NUTRIAI_MODEL_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+# Train on first use when no version exists; production runs `python ai_engine.py train` instead
+TRAIN_IF_MISSING = os.environ.get('NUTRIAI_TRAIN_IF_MISSING', '1') == '1'
+LATEST_FILE = 'LATEST'
+LOCK_FILE = '.lock'
+# Each version is one joblib bundle plus a JSON manifest holding its checksum
+BUNDLE_FILE = 'bundle.joblib'
+MANIFEST_FILE = 'manifest.json'
+BUNDLE_FORMAT = 1
+# Risk predictions from concurrent requests are batched up to this many rows, waiting at most
+# this long for a batch to fill; the default of 1 predicts each row on its own.  Batching only
+# pays off when a worker serves many request threads at once (the shipped gunicorn config runs
+# 2) or predictions go through sklearn; otherwise every request just waits out the delay
+RISK_BATCH_SIZE = int(os.environ.get('NUTRIAI_RISK_BATCH_SIZE', 1))
+RISK_BATCH_WAIT = float(os.environ.get('NUTRIAI_RISK_BATCH_WAIT_US', 500)) / 1e6
+# Batches up to this many rows use the compiled forest; sklearn's Cython traversal wins on larger ones
+COMPILED_MAX_ROWS = 256
+# Health-risk model inputs in column order
+RISK_FEATURES = ('age', 'weight', 'height', 'calories', 'protein', 'carbs', 'fats')
+
+
+class ModelNotReady(RuntimeError):
+    """No trained model version is available to load"""
+
+
+@contextmanager
+def model_dir_lock(model_dir: str):
+    """Exclusive lock on a model directory, shared by every process on the host"""
+    os.makedirs(model_dir, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(model_dir, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_bundle(model_dir: str, version: str) -> Dict:
+    """Verify a version against its manifest and load its bundle with arrays memory-mapped"""
+    path = os.path.join(model_dir, version)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    bundle_path = os.path.join(path, BUNDLE_FILE)
+    if file_sha256(bundle_path) != manifest['sha256']:
+        raise ModelNotReady(f'Model version {version} does not match its checksum')
+    if manifest['format'] != BUNDLE_FORMAT:
+        raise ModelNotReady(f'Model version {version} has unsupported format {manifest["format"]}')
+    
+    # Plain arrays come back as read-only maps shared through the page cache;
+    # sklearn's trees copy their node arrays while unpickling
+    bundle = joblib.load(bundle_path, mmap_mode='r')
+    if bundle['metadata']['features'] != manifest['features']:
+        raise ModelNotReady(f'Model version {version} has an inconsistent feature schema')
+    return bundle
+
+
+# Defaults for fields a community record may omit.  Missing average protein,
+# carbs and fats follow the split calculate_daily_targets uses.
+COMMUNITY_DEFAULTS = {'age': 30, 'weight': 70, 'height': 170, 'avg_calories': 2000}
+COMMUNITY_FIELDS = ('age', 'weight', 'height', 'avg_calories', 'avg_protein', 'avg_carbs', 'avg_fats')
+
+
+def community_columns(users) -> Dict[str, np.ndarray]:
+    """Float64 column per community field from a list of user dicts or a DataFrame"""
+    size = len(users)
+    columns = {}
+    for field in COMMUNITY_FIELDS:
+        if hasattr(users, 'columns'):
+            if field in users.columns:
+                values = users[field].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+            else:
+                values = np.full(size, np.nan)
+        else:
+            values = np.fromiter((user.get(field, np.nan) for user in users), dtype=np.float64, count=size)
+        if field in COMMUNITY_DEFAULTS:
+            values[np.isnan(values)] = COMMUNITY_DEFAULTS[field]
+        columns[field] = values
+    
+    derived = {
+        'avg_protein': columns['weight'] * 1.2,
+        'avg_carbs': columns['avg_calories'] * 0.5 / 4,
+        'avg_fats': columns['avg_calories'] * 0.3 / 9,
+    }
+    for field, fallback in derived.items():
+        missing = np.isnan(columns[field])
+        columns[field][missing] = fallback[missing]
+    return columns
+
+
+def compile_risk_model(model: RandomForestClassifier, scaler: StandardScaler) -> Optional[CompiledForest]:
+    """Compiled predictor for a model, or None if it does not reproduce sklearn on probe rows"""
+    compiled = CompiledForest.from_sklearn(model, scaler)
+    probe = scaler.mean_ + scaler.scale_ * np.random.RandomState(0).randn(256, len(scaler.mean_))
+    if np.array_equal(compiled.predict_proba(probe), model.predict_proba(scaler.transform(probe))):
+        return compiled
+    return None
+
+
+def latest_version(model_dir: str) -> Optional[str]:
+    """Version named by the LATEST file, if it exists"""
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if os.path.isdir(os.path.join(model_dir, version)) else None
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def train_health_risk_model() -> Tuple[StandardScaler, RandomForestClassifier, int]:
+    """Fit the feature scaler and health-risk classifier on sample data, returning both and the sample count"""
+    # Sample training data
+    rng = np.random.RandomState(42)
+    n_samples = 1000
+    
+    # Features in RISK_FEATURES order
+    X = rng.rand(n_samples, len(RISK_FEATURES))
+    X[:, 0] = rng.randint(18, 70, n_samples)  # age
+    X[:, 1] = rng.uniform(50, 120, n_samples)  # weight
+    X[:, 2] = rng.uniform(150, 200, n_samples)  # height
+    X[:, 3] = rng.uniform(1000, 3000, n_samples)  # calories
+    X[:, 4] = rng.uniform(30, 150, n_samples)  # protein
+    X[:, 5] = rng.uniform(100, 400, n_samples)  # carbs
+    X[:, 6] = rng.uniform(20, 150, n_samples)  # fats
+    
+    # Health risk labels (0: low, 1: medium, 2: high)
+    y_risk = np.zeros(n_samples)
+    y_risk[X[:, 3] > 2500] = 1  # high calorie -> medium risk
+    y_risk[X[:, 6] > 100] = 2   # high fat -> high risk
+    
+    # Scale features
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    # Train models
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(X_scaled, y_risk)
+    return scaler, model, n_samples
+
+
+def train_and_publish(model_dir: str = MODEL_DIR) -> str:
+    """Train the models and publish them as the latest version, returning it"""
+    with model_dir_lock(model_dir):
+        return _train_and_publish(model_dir)
+
+
+def _train_and_publish(model_dir: str) -> str:
+    """Train and publish; the caller holds the model directory lock"""
+    scaler, model, n_samples = train_health_risk_model()
+    version = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    metadata = {
+        'version': version,
+        'format': BUNDLE_FORMAT,
+        'features': list(RISK_FEATURES),
+        'classes': model.classes_.tolist(),
+        'training_samples': n_samples,
+        'trained_at': datetime.now().isoformat(),
+        'sklearn_version': sklearn.__version__,
+    }
+    
+    # Write the version under a temporary name so readers never see it half-written.
+    # The bundle is uncompressed so its arrays can be memory-mapped on load.
+    staging = os.path.join(model_dir, f'.{version}.tmp')
+    os.makedirs(staging)
+    bundle_path = os.path.join(staging, BUNDLE_FILE)
+    joblib.dump({'scaler': scaler, 'model': model, 'metadata': metadata}, bundle_path)
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump(dict(metadata, sha256=file_sha256(bundle_path)), f, indent=2)
+    os.replace(staging, os.path.join(model_dir, version))
+    
+    latest = os.path.join(model_dir, LATEST_FILE)
+    with open(latest + '.tmp', 'w') as f:
+        f.write(version)
+    os.replace(latest + '.tmp', latest)
+    return version
+
 
 class NutritionAI:
-    def __init__(self):
-        # Initialize models
-        self.nutrient_model = None
+    def __init__(self, model_dir: Optional[str] = None, train_if_missing: Optional[bool] = None):
+        # Models are loaded on first use (or by warm_up), never at import
+        self.model_dir = model_dir or MODEL_DIR
+        self.train_if_missing = TRAIN_IF_MISSING if train_if_missing is None else train_if_missing
         self.health_risk_model = None
+        self.risk_predictor = None  # CompiledForest for the loaded model
         self.recommendation_model = None
-        self.scaler = StandardScaler()
-        self.load_or_train_models()
+        self.scaler = None
+        self.features = RISK_FEATURES
+        self.model_metadata = None
+        self.model_version = None
+        self.model_error = None
+        self._model_lock = threading.Lock()
+        self._warmer = None
+        self.risk_batcher = (MicroBatcher(self.predict_risk, RISK_BATCH_SIZE, RISK_BATCH_WAIT)
+                             if RISK_BATCH_SIZE > 1 else None)
         
         # Nutrition database (simplified)
         self.food_database = {
@@ -26,66 +240,91 @@ class NutritionAI:
             'egg': {'calories': 78, 'protein': 6, 'carbs': 0.6, 'fats': 5, 'fiber': 0},
             'salmon': {'calories': 206, 'protein': 22, 'carbs': 0, 'fats': 13, 'fiber': 0},
         }
+        # Unknown foods fall through to an all-zero row
+        self.nutrient_matrix = NutrientMatrix(self.food_database)
+    
+    @property
+    def ready(self) -> bool:
+        """Whether the health-risk model is loaded"""
+        return self.health_risk_model is not None
+    
+    def status(self) -> Dict:
+        """Model readiness for the /api/ready probe"""
+        status = {'ready': self.ready, 'version': self.model_version, 'error': self.model_error}
+        if self.risk_batcher is not None:
+            status['batching'] = self.risk_batcher.metrics()
+        return status
     
     def load_or_train_models(self):
-        """Load trained models or train new ones"""
-        try:
-            self.nutrient_model = joblib.load('models/nutrient_model.pkl')
-            self.health_risk_model = joblib.load('models/health_risk_model.pkl')
-            print("Models loaded successfully")
-        except:
-            print("Training new models...")
-            self.train_models()
+        """Load the latest model version once, training it first if none exists and that is allowed.
+        
+        Concurrent callers in this process wait for a single load, and the
+        model directory lock makes only one process on the host train.
+        """
+        if self.ready:
+            return
+        with self._model_lock:
+            if self.ready:
+                return
+            try:
+                version = latest_version(self.model_dir)
+                if version is None:
+                    if not self.train_if_missing:
+                        raise ModelNotReady(f'No trained model in {self.model_dir}; run `python ai_engine.py train`')
+                    with model_dir_lock(self.model_dir):
+                        # Another process may have trained while we waited for the lock
+                        version = latest_version(self.model_dir)
+                        if version is None:
+                            print("Training new models...")
+                            version = _train_and_publish(self.model_dir)
+                self._load_version(version)
+            except Exception as error:
+                self.model_error = str(error)
+                raise
+            self.model_error = None
+    
+    def _load_version(self, version: str):
+        bundle = load_bundle(self.model_dir, version)
+        self.scaler = bundle['scaler']
+        self.features = tuple(bundle['metadata']['features'])
+        self.model_metadata = bundle['metadata']
+        self.model_version = version
+        self.risk_predictor = compile_risk_model(bundle['model'], bundle['scaler'])
+        # Assigned last: it is what `ready` checks
+        self.health_risk_model = bundle['model']
     
     def train_models(self):
-        """Train AI models with sample data"""
-        # Sample training data
-        np.random.seed(42)
-        n_samples = 1000
-        
-        # Features: age, weight, height, calories, protein, carbs, fats
-        X = np.random.rand(n_samples, 7)
-        X[:, 0] = np.random.randint(18, 70, n_samples)  # age
-        X[:, 1] = np.random.uniform(50, 120, n_samples)  # weight
-        X[:, 2] = np.random.uniform(150, 200, n_samples)  # height
-        X[:, 3] = np.random.uniform(1000, 3000, n_samples)  # calories
-        X[:, 4] = np.random.uniform(30, 150, n_samples)  # protein
-        X[:, 5] = np.random.uniform(100, 400, n_samples)  # carbs
-        X[:, 6] = np.random.uniform(20, 150, n_samples)  # fats
-        
-        # Health risk labels (0: low, 1: medium, 2: high)
-        y_risk = np.zeros(n_samples)
-        y_risk[X[:, 3] > 2500] = 1  # high calorie -> medium risk
-        y_risk[X[:, 6] > 100] = 2   # high fat -> high risk
-        
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Train models
-        self.health_risk_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.health_risk_model.fit(X_scaled, y_risk)
-        
-        # Save models
-        joblib.dump(self.health_risk_model, 'models/health_risk_model.pkl')
+        """Train the models, publish them as a new version and serve it"""
+        version = train_and_publish(self.model_dir)
+        with self._model_lock:
+            self._load_version(version)
+    
+    def warm_up(self):
+        """Load the models in a background thread; `ready` turns true once they are warm.
+        
+        Does nothing while a load is running or once one succeeded, so it is
+        cheap to call on every readiness probe; a failed load is retried.
+        """
+        if self.ready or (self._warmer is not None and self._warmer.is_alive()):
+            return
+        
+        def load():
+            try:
+                self.load_or_train_models()
+            except Exception:
+                pass  # Reported by status()
+        
+        self._warmer = threading.Thread(target=load, name='model-warm-up', daemon=True)
+        self._warmer.start()
     
     def analyze_meal(self, food_items, user_data):
         """Analyze nutritional content of a meal"""
-        total_nutrients = {
-            'calories': 0,
-            'protein': 0,
-            'carbs': 0,
-            'fats': 0,
-            'fiber': 0
-        }
-        
-        for item in food_items:
-            food_name = item['name'].lower()
-            quantity = item.get('quantity', 1)
-            
-            if food_name in self.food_database:
-                nutrients = self.food_database[food_name]
-                for nutrient in total_nutrients:
-                    total_nutrients[nutrient] += nutrients.get(nutrient, 0) * quantity
+        food_names = [item['name'].lower() for item in food_items]
+        quantities = [item.get('quantity', 1) for item in food_items]
+        rows = self.nutrient_matrix.rows(food_names)
+        total_nutrients = self.nutrient_matrix.as_dict(
+            self.nutrient_matrix.meal_totals(rows, quantities), 2
+        )
         
         # Calculate health risk
         risk_score = self.calculate_health_risk(user_data, total_nutrients)
@@ -103,18 +342,15 @@ class NutritionAI:
     
     def calculate_health_risk(self, user_data, nutrients):
         """Calculate health risk score"""
-        features = np.array([[
-            user_data.get('age', 30),
-            user_data.get('weight', 70),
-            user_data.get('height', 170),
-            nutrients['calories'],
-            nutrients['protein'],
-            nutrients['carbs'],
-            nutrients['fats']
-        ]])
-        
-        features_scaled = self.scaler.transform(features)
-        risk_prediction = self.health_risk_model.predict(features_scaled)[0]
+        # Loaded here, not in the batch: load errors belong to this caller, and the feature order comes from the model
+        self.load_or_train_models()
+        values = dict(nutrients, age=user_data.get('age', 30), weight=user_data.get('weight', 70),
+                      height=user_data.get('height', 170))
+        features = np.array([[values[name] for name in self.features]])
+        if self.risk_batcher is not None:
+            risk_prediction = self.risk_batcher.predict(features[0])
+        else:
+            risk_prediction = self.predict_risk(features)[0]
         
         risk_levels = ['Low Risk', 'Medium Risk', 'High Risk']
         return {
@@ -123,6 +359,13 @@ class NutritionAI:
             'details': self.get_risk_details(int(risk_prediction))
         }
     
+    def predict_risk(self, features: np.ndarray) -> np.ndarray:
+        """Risk classes for rows of unscaled features in `self.features` order"""
+        self.load_or_train_models()
+        if self.risk_predictor is not None and len(features) <= COMPILED_MAX_ROWS:
+            return self.risk_predictor.predict(features)
+        return self.health_risk_model.predict(self.scaler.transform(features))
+    
     def calculate_bmi(self, weight_kg, height_cm):
         """Calculate BMI"""
         height_m = height_cm / 100
@@ -196,35 +439,40 @@ class NutritionAI:
         return details.get(risk_level, "Analysis complete.")
     
     def analyze_community_health(self, user_data_list):
-        """Analyze community health trends"""
-        if not user_data_list:
+        """Analyze community health trends over a list of user dicts or a DataFrame of users"""
+        if len(user_data_list) == 0:
             return {"error": "No data available"}
         
-        # Extract metrics
-        bmis = [self.calculate_bmi(u.get('weight', 70), u.get('height', 170))['value'] 
-                for u in user_data_list]
-        
-        avg_calories = np.mean([u.get('avg_calories', 2000) for u in user_data_list])
+        # One float column per field, then array reductions instead of per-user calls
+        columns = community_columns(user_data_list)
+        sample_size = len(columns['weight'])
+        bmis = np.round(columns['weight'] / (columns['height'] / 100) ** 2, 1)
+        avg_calories = columns['avg_calories'].mean()
         
         # Analyze trends
-        obesity_rate = sum(1 for bmi in bmis if bmi >= 30) / len(bmis) * 100
-        overweight_rate = sum(1 for bmi in bmis if bmi >= 25) / len(bmis) * 100
+        obesity_rate = int(np.count_nonzero(bmis >= 30)) / sample_size * 100
+        overweight_rate = int(np.count_nonzero(bmis >= 25)) / sample_size * 100
         
-        # Risk distribution
-        risk_scores = [self.calculate_health_risk(u, {'calories': u.get('avg_calories', 2000)})['score'] 
-                      for u in user_data_list]
+        # Risk distribution from a single batched prediction
+        values = {
+            'age': columns['age'], 'weight': columns['weight'], 'height': columns['height'],
+            'calories': columns['avg_calories'], 'protein': columns['avg_protein'],
+            'carbs': columns['avg_carbs'], 'fats': columns['avg_fats']
+        }
+        risk_scores = self.predict_risk(np.column_stack([values[name] for name in self.features]))
+        risk_shares = np.bincount(risk_scores.astype(np.intp), minlength=3) / sample_size * 100
         
         return {
             'community_stats': {
-                'sample_size': len(user_data_list),
-                'avg_bmi': round(np.mean(bmis), 1),
-                'avg_calories': round(avg_calories),
+                'sample_size': sample_size,
+                'avg_bmi': round(float(bmis.mean()), 1),
+                'avg_calories': round(float(avg_calories)),
                 'obesity_rate': round(obesity_rate, 1),
                 'overweight_rate': round(overweight_rate, 1),
                 'health_risk_distribution': {
-                    'low_risk': round(sum(1 for s in risk_scores if s == 0) / len(risk_scores) * 100, 1),
-                    'medium_risk': round(sum(1 for s in risk_scores if s == 1) / len(risk_scores) * 100, 1),
-                    'high_risk': round(sum(1 for s in risk_scores if s == 2) / len(risk_scores) * 100, 1)
+                    'low_risk': round(float(risk_shares[0]), 1),
+                    'medium_risk': round(float(risk_shares[1]), 1),
+                    'high_risk': round(float(risk_shares[2]), 1)
                 }
             },
             'recommendations': self.generate_community_recommendations(obesity_rate, avg_calories)
@@ -245,5 +493,16 @@ class NutritionAI:
         
         return recommendations
 
-# Create instance
-nutrition_ai = NutritionAI()
\ No newline at end of file
+# Create instance; models load lazily
+nutrition_ai = NutritionAI()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NutriAI model artifacts')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    train = subcommands.add_parser('train', help='Train the models and publish a new version')
+    train.add_argument('--model-dir', default=MODEL_DIR)
+    args = parser.parse_args()
+    
+    if args.command == 'train':
+        print(f"Published model version {train_and_publish(args.model_dir)} in {args.model_dir}")
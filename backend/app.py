@@ -3,20 +3,118 @@ from flask_cors import CORS
 import json
 from datetime import datetime, timedelta
 import hashlib
+import os
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import re
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every worker writes the meal snapshot
+    fcntl = None
+
+from food_index import FoodIndex
+from nutrient_matrix import NutrientMatrix
+from user_stats import RollingStats
+from meal_store import MealStore, to_epoch
+from streaks import DayLog, StreakBoard
+from community import CommunityAggregates
+from sessions import SessionStore
+from journal import Journal, JournaledBackend
+from meal_snapshot import MealSnapshot, UserHistory
+from ai_engine import nutrition_ai
+from storage import (HTTPClient, MemoryBackend, ReadThroughCache, ServiceBackend, SQLiteBackend,
+                     StorageBackend, StoredMapping, StoredSessionBackend)
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True, origins=["http://localhost:3000", "http://127.0.0.1:3000"])
 
 # Configuration
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
+# Seconds a /api/community/insights snapshot may be served before it is rebuilt
+app.config['COMMUNITY_MAX_STALENESS'] = 30
+# Session lifetime, concurrent sessions allowed per user, and how often expired ones are swept
+app.config['SESSION_TTL_SECONDS'] = 7 * 24 * 3600
+app.config['MAX_SESSIONS_PER_USER'] = 10
+app.config['SESSION_SWEEP_INTERVAL'] = 60
+# SQLite file holding users, meals and sessions for every worker; unset keeps state in this process
+app.config['STATE_DB_PATH'] = os.environ.get('NUTRIAI_STATE_DB')
+# URL of a state service (`python storage.py serve`) that holds them instead, e.g. http://127.0.0.1:8765
+app.config['STATE_SERVICE_URL'] = os.environ.get('NUTRIAI_STATE_SERVICE')
+# Seconds between polls of the shared change feed (0 polls on every request)
+app.config['STATE_SYNC_INTERVAL'] = float(os.environ.get('NUTRIAI_STATE_SYNC_INTERVAL', 0))
+# SQLAlchemy database for users, meals and sessions; takes precedence over STATE_DB_PATH
+app.config['DATABASE_URL'] = os.environ.get('DATABASE_URL')
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Directory for a write-behind journal that makes single-process state survive restarts
+app.config['JOURNAL_DIR'] = os.environ.get('NUTRIAI_JOURNAL_DIR')
+# Most journal entries per fsync, seconds to wait for a batch, and writes between snapshots
+app.config['JOURNAL_BATCH_SIZE'] = int(os.environ.get('NUTRIAI_JOURNAL_BATCH_SIZE', 256))
+app.config['JOURNAL_FLUSH_INTERVAL'] = float(os.environ.get('NUTRIAI_JOURNAL_FLUSH_INTERVAL', 0.05))
+app.config['JOURNAL_SNAPSHOT_EVERY'] = int(os.environ.get('NUTRIAI_JOURNAL_SNAPSHOT_EVERY', 10000))
+# Binary meal snapshot that new workers start from instead of re-reading every meal, and seconds
+# between rewrites by a background thread in whichever worker holds the snapshot's .lock file
+app.config['MEAL_SNAPSHOT_PATH'] = os.environ.get('NUTRIAI_MEAL_SNAPSHOT')
+app.config['MEAL_SNAPSHOT_INTERVAL'] = float(os.environ.get('NUTRIAI_MEAL_SNAPSHOT_INTERVAL', 600))
+
+# Largest number of meals accepted by /api/analyze/batch
+MAX_BATCH_MEALS = 100
+# How far a replayed meal's timestamp may run ahead of the server clock
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+def create_storage_backend() -> StorageBackend:
+    """Database, state service, shared SQLite or journaled storage when configured, otherwise process-local"""
+    if app.config['DATABASE_URL']:
+        from sql_storage import SQLAlchemyBackend
+        return SQLAlchemyBackend(app, app.config['DATABASE_URL'],
+                                 pool_size=app.config['DB_POOL_SIZE'],
+                                 max_overflow=app.config['DB_MAX_OVERFLOW'],
+                                 pool_recycle=app.config['DB_POOL_RECYCLE'])
+    if app.config['STATE_SERVICE_URL']:
+        return ServiceBackend(HTTPClient(app.config['STATE_SERVICE_URL']))
+    if app.config['STATE_DB_PATH']:
+        return SQLiteBackend(app.config['STATE_DB_PATH'])
+    if app.config['JOURNAL_DIR']:
+        journal = Journal(app.config['JOURNAL_DIR'], batch_size=app.config['JOURNAL_BATCH_SIZE'],
+                          flush_interval=app.config['JOURNAL_FLUSH_INTERVAL'])
+        return JournaledBackend(journal, snapshot_every=app.config['JOURNAL_SNAPSHOT_EVERY'])
+    return MemoryBackend()
+
+# Users, meals and sessions live in shared storage behind a per-worker cache.
+# meals_db is this worker's time-ordered index of the shared 'meals' records.
+state = ReadThroughCache(create_storage_backend(), cached=('users', 'sessions', 'user_sessions'),
+                         sync_interval=app.config['STATE_SYNC_INTERVAL'])
+users_db = StoredMapping(state, 'users')
+meals_db = MealStore()
+# Held while meals are published and applied to this worker's history and
+# aggregates, so a sync on another request thread never sees half a write
+state_lock = threading.RLock()
+# Held by the one request thread polling the change feed, from the poll until its changes are
+# applied; other threads skip the poll rather than queue behind it
+sync_lock = threading.Lock()
+sessions_db = SessionStore(StoredSessionBackend(state),
+                           ttl=app.config['SESSION_TTL_SECONDS'],
+                           max_per_user=app.config['MAX_SESSIONS_PER_USER'],
+                           sweep_interval=app.config['SESSION_SWEEP_INTERVAL'])
 
-# In-memory databases with better structure
-users_db: Dict[str, Dict] = {}
-meals_db: Dict[str, List] = {}
-sessions_db: Dict[str, Dict] = {}
+# Rolling 7-day meal aggregates per user, kept in step with meals_db
+STATS_WINDOW_DAYS = 7
+user_stats: Dict[str, RollingStats] = {}
+
+# Days with meals per user, and the consistency leaderboard built from them
+day_logs: Dict[str, DayLog] = {}
+streak_board = StreakBoard()
+
+# Community-wide counters, updated on every profile and meal write
+community_stats = CommunityAggregates()
+# Thread that rewrites the meal snapshot in the background, once started
+meal_snapshot_writer: Optional[threading.Thread] = None
 
 # Nutrition database for more accurate analysis
 NUTRITION_DB = {
@@ -42,6 +140,13 @@ NUTRITION_DB = {
     'nuts': {'calories': 607, 'protein': 20, 'carbs': 21, 'fats': 54, 'fiber': 7},
 }
 
+# Used for foods that are not in NUTRITION_DB
+DEFAULT_NUTRITION = {'calories': 150, 'protein': 5, 'carbs': 20, 'fats': 5, 'fiber': 2}
+
+# Name resolver and nutrient matrix over NUTRITION_DB, built once at startup
+FOOD_INDEX = FoodIndex(NUTRITION_DB)
+NUTRIENT_MATRIX = NutrientMatrix(NUTRITION_DB, default=DEFAULT_NUTRITION)
+
 # Helper functions
 def hash_password(password: str) -> str:
     """Hash password for storage"""
@@ -58,13 +163,15 @@ def validate_password(password: str) -> bool:
         return False
     return True
 
+def calculate_bmr(weight: float, height: float, age: int, gender: str) -> float:
+    """Calculate BMR using the Mifflin-St Jeor equation"""
+    if gender.lower() == 'male':
+        return 10 * weight + 6.25 * height - 5 * age + 5
+    return 10 * weight + 6.25 * height - 5 * age - 161
+
 def calculate_daily_targets(weight: float, height: float, age: int, gender: str, activity_level: str, goal: str) -> Dict:
     """Calculate personalized daily nutritional targets"""
-    # Calculate BMR using Mifflin-St Jeor Equation
-    if gender.lower() == 'male':
-        bmr = 10 * weight + 6.25 * height - 5 * age + 5
-    else:
-        bmr = 10 * weight + 6.25 * height - 5 * age - 161
+    bmr = calculate_bmr(weight, height, age, gender)
     
     # Activity multipliers
     activity_multipliers = {
@@ -101,11 +208,10 @@ def calculate_daily_targets(weight: float, height: float, age: int, gender: str,
 
 def authenticate_token(token: str) -> Optional[Dict]:
     """Validate authentication token"""
-    if token in sessions_db:
-        session = sessions_db[token]
-        if datetime.fromisoformat(session['expires']) > datetime.now():
-            return users_db.get(session['user_id'])
-    return None
+    user_id = sessions_db.user_id(token)
+    if user_id is None:
+        return None
+    return users_db.get(user_id)
 
 def require_auth(f):
     """Decorator for authentication"""
@@ -142,125 +248,17 @@ def analyze_meal():
         if not isinstance(food_items, list) or len(food_items) == 0:
             return jsonify({'error': 'At least one food item is required'}), 400
         
-        # Extract user data for personalized analysis
-        user = request.user
-        user_profile = user.get('profile', {})
-        
-        # Calculate nutrition
-        total_calories = 0
-        total_protein = 0
-        total_carbs = 0
-        total_fats = 0
-        total_fiber = 0
-        processed_items = []
-        
-        for item in food_items:
-            food_name = item.get('name', '').lower().strip()
-            quantity = item.get('quantity', 1)
-            unit = item.get('unit', 'serving')
-            
-            # Find closest match in nutrition database
-            nutrition = None
-            for key in NUTRITION_DB:
-                if key in food_name or food_name in key:
-                    nutrition = NUTRITION_DB[key].copy()
-                    break
-            
-            # Default values if not found
-            if not nutrition:
-                nutrition = {'calories': 150, 'protein': 5, 'carbs': 20, 'fats': 5, 'fiber': 2}
-            
-            # Adjust for quantity
-            adjusted_nutrition = {k: v * quantity for k, v in nutrition.items()}
-            
-            total_calories += adjusted_nutrition['calories']
-            total_protein += adjusted_nutrition['protein']
-            total_carbs += adjusted_nutrition['carbs']
-            total_fats += adjusted_nutrition['fats']
-            total_fiber += adjusted_nutrition['fiber']
-            
-            processed_items.append({
-                'name': food_name.title(),
-                'quantity': quantity,
-                'unit': unit,
-                'nutrition': adjusted_nutrition
-            })
-        
-        # Calculate health assessment
-        bmi = calculate_bmi(user_profile.get('weight', 70), user_profile.get('height', 170))
-        risk_score = calculate_risk_score(total_calories, total_fats, total_carbs, bmi)
-        meal_score = calculate_meal_score(total_calories, total_protein, total_carbs, total_fats, total_fiber)
-        
-        # Generate personalized recommendations
-        daily_targets = user.get('daily_targets', calculate_daily_targets(
-            user_profile.get('weight', 70),
-            user_profile.get('height', 170),
-            user_profile.get('age', 30),
-            user_profile.get('gender', 'male'),
-            user_profile.get('activity_level', 'moderately_active'),
-            user_profile.get('goal', 'maintain_weight')
-        ))
-        
-        recommendations = generate_recommendations(
-            total_calories, total_protein, total_carbs, total_fats, total_fiber,
-            daily_targets, len(food_items), user_profile.get('goal', 'maintain_weight')
-        )
-        
-        # Prepare response
+        # Analyze with the user's profile for personalized results
+        processed_items, analysis = analyze_meals(request.user, [food_items])[0]
         response = {
             'success': True,
-            'analysis': {
-                'nutrition': {
-                    'calories': round(total_calories),
-                    'protein': round(total_protein, 1),
-                    'carbs': round(total_carbs, 1),
-                    'fats': round(total_fats, 1),
-                    'fiber': round(total_fiber, 1),
-                    'sodium': round(total_fats * 0.1, 1),  # Estimate
-                    'sugar': round(total_carbs * 0.2, 1)   # Estimate
-                },
-                'health_assessment': {
-                    'risk_level': risk_score['level'],
-                    'risk_score': risk_score['score'],
-                    'risk_factors': risk_score['factors'],
-                    'meal_score': meal_score,
-                    'meal_grade': get_meal_grade(meal_score)
-                },
-                'bmi_context': {
-                    'value': round(bmi, 1),
-                    'category': get_bmi_category(bmi),
-                    'message': get_bmi_message(bmi, user_profile.get('goal'))
-                },
-                'comparison': {
-                    'daily_targets': daily_targets,
-                    'percentage_of_daily': {
-                        'calories': round((total_calories / daily_targets['calories']) * 100),
-                        'protein': round((total_protein / daily_targets['protein']) * 100),
-                        'carbs': round((total_carbs / daily_targets['carbs']) * 100),
-                        'fats': round((total_fats / daily_targets['fats']) * 100)
-                    }
-                },
-                'recommendations': recommendations,
-                'food_details': processed_items,
-                'timestamp': datetime.now().isoformat()
-            }
+            'analysis': analysis
         }
         
         # Save meal to history
-        meal_record = {
-            'id': str(uuid.uuid4()),
-            'foods': processed_items,
-            'analysis': response['analysis'],
-            'timestamp': datetime.now().isoformat(),
-            'location': data.get('location'),
-            'meal_type': data.get('meal_type', 'other'),
-            'notes': data.get('notes', '')
-        }
-        
-        if request.user_id not in meals_db:
-            meals_db[request.user_id] = []
+        meal_record = create_meal_record(processed_items, analysis, data, datetime.now())
         
-        meals_db[request.user_id].append(meal_record)
+        store_meals(request.user_id, [meal_record])
         
         # Update user statistics
         update_user_stats(request.user_id)
@@ -271,100 +269,343 @@ def analyze_meal():
         app.logger.error(f"Error in analyze_meal: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@app.route('/api/analyze/batch', methods=['POST'])
+@require_auth
+def analyze_meal_batch():
+    """Analyze a batch of queued meals, returning per-meal results in order"""
+    try:
+        data = request.json
+        
+        if not data or not isinstance(data.get('meals'), list) or len(data['meals']) == 0:
+            return jsonify({'error': 'At least one meal is required'}), 400
+        
+        meals = data['meals']
+        if len(meals) > MAX_BATCH_MEALS:
+            return jsonify({'error': f'A batch can contain at most {MAX_BATCH_MEALS} meals'}), 400
+        
+        # Validate every meal up front so one bad entry does not fail the batch
+        results = [None] * len(meals)
+        valid = []
+        for index, meal in enumerate(meals):
+            error, timestamp = validate_batch_meal(meal)
+            if error:
+                results[index] = {'index': index, 'success': False, 'error': error}
+            else:
+                valid.append((index, meal, timestamp))
+        
+        # Resolve, total and score all valid meals in one pass
+        analyses = analyze_meals(request.user, [meal['food_items'] for _, meal, _ in valid])
+        
+        records = []
+        for (index, meal, timestamp), (processed_items, analysis) in zip(valid, analyses):
+            meal_record = create_meal_record(processed_items, analysis, meal, timestamp)
+            records.append(meal_record)
+            results[index] = {
+                'index': index,
+                'success': True,
+                'meal_id': meal_record['id'],
+                'analysis': analysis
+            }
+        
+        # Append to history in one step and refresh statistics once
+        if records:
+            store_meals(request.user_id, records)
+            update_user_stats(request.user_id)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'summary': {
+                'total': len(meals),
+                'succeeded': len(records),
+                'failed': len(meals) - len(records)
+            }
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Error in analyze_meal_batch: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+def validate_batch_meal(meal) -> Tuple[Optional[str], Optional[datetime]]:
+    """Validate one entry of a batch, returning (error, timestamp)"""
+    if not isinstance(meal, dict):
+        return 'Meal must be an object', None
+    
+    food_items = meal.get('food_items')
+    if not isinstance(food_items, list) or len(food_items) == 0:
+        return 'At least one food item is required', None
+    
+    for item in food_items:
+        if not isinstance(item, dict) or not isinstance(item.get('name', ''), str):
+            return 'Each food item must have a name', None
+        quantity = item.get('quantity', 1)
+        if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or quantity < 0:
+            return 'Food item quantity must be a non-negative number', None
+    
+    # Meals replayed from an offline queue keep the time they were eaten
+    timestamp = datetime.now()
+    if meal.get('timestamp'):
+        try:
+            timestamp = datetime.fromisoformat(meal['timestamp'])
+        except (TypeError, ValueError):
+            return 'Invalid timestamp format', None
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        if timestamp > datetime.now() + MAX_CLOCK_SKEW:
+            return 'Timestamp is in the future', None
+    
+    return None, timestamp
+
+def analyze_meals(user: Dict, meals: List[List[Dict]]) -> List[Tuple[List[Dict], Dict]]:
+    """Analyze the food items of several meals for one user.
+    
+    Returns a (processed_items, analysis) pair per meal, in order.
+    """
+    if not meals:
+        return []
+    
+    user_profile = user.get('profile', {})
+    
+    # Calculate nutrition for every item of every meal at once
+    food_names = [item.get('name', '').lower().strip() for items in meals for item in items]
+    quantities = [item.get('quantity', 1) for items in meals for item in items]
+    rows = NUTRIENT_MATRIX.rows(FOOD_INDEX.resolve_many(food_names))
+    item_nutrition = NUTRIENT_MATRIX.item_nutrition(rows, quantities)
+    
+    bounds = np.cumsum([0] + [len(items) for items in meals])
+    totals = NUTRIENT_MATRIX.batch_totals([
+        (rows[start:end], quantities[start:end]) for start, end in zip(bounds[:-1], bounds[1:])
+    ]).astype(np.float64)
+    calories, protein, carbs, fats, fiber = (totals[:, i] for i in range(totals.shape[1]))
+    
+    # Calculate health assessment
+    derived = profile_derived(user)
+    bmi = derived['bmi']
+    risk_scores = calculate_risk_scores(calories, fats, carbs, bmi)
+    meal_scores = calculate_meal_scores(calories, protein, carbs, fats, fiber)
+    
+    # Generate personalized recommendations
+    daily_targets = derived['daily_targets']
+    goal = user_profile.get('goal', 'maintain_weight')
+    recommendations = generate_recommendations_batch(
+        calories, protein, carbs, fats, fiber,
+        daily_targets, [len(items) for items in meals], goal
+    )
+    
+    bmi_context = {
+        'value': round(bmi, 1),
+        'category': derived['bmi_category'],
+        'message': derived['bmi_message']
+    }
+    timestamp = datetime.now().isoformat()
+    
+    results = []
+    for i, items in enumerate(meals):
+        start = bounds[i]
+        processed_items = []
+        for offset, item in enumerate(items):
+            processed_items.append({
+                'name': food_names[start + offset].title(),
+                'quantity': quantities[start + offset],
+                'unit': item.get('unit', 'serving'),
+                'nutrition': NUTRIENT_MATRIX.as_dict(item_nutrition[start + offset], 2)
+            })
+        
+        total_calories = float(calories[i])
+        total_protein = float(protein[i])
+        total_carbs = float(carbs[i])
+        total_fats = float(fats[i])
+        total_fiber = float(fiber[i])
+        risk_score = risk_scores[i]
+        meal_score = meal_scores[i]
+        
+        analysis = {
+            'nutrition': {
+                'calories': round(total_calories),
+                'protein': round(total_protein, 1),
+                'carbs': round(total_carbs, 1),
+                'fats': round(total_fats, 1),
+                'fiber': round(total_fiber, 1),
+                'sodium': round(total_fats * 0.1, 1),  # Estimate
+                'sugar': round(total_carbs * 0.2, 1)   # Estimate
+            },
+            'health_assessment': {
+                'risk_level': risk_score['level'],
+                'risk_score': risk_score['score'],
+                'risk_factors': risk_score['factors'],
+                'meal_score': meal_score,
+                'meal_grade': get_meal_grade(meal_score)
+            },
+            'bmi_context': dict(bmi_context),
+            'comparison': {
+                'daily_targets': daily_targets,
+                'percentage_of_daily': {
+                    'calories': round((total_calories / daily_targets['calories']) * 100),
+                    'protein': round((total_protein / daily_targets['protein']) * 100),
+                    'carbs': round((total_carbs / daily_targets['carbs']) * 100),
+                    'fats': round((total_fats / daily_targets['fats']) * 100)
+                }
+            },
+            'recommendations': recommendations[i],
+            'food_details': processed_items,
+            'timestamp': timestamp
+        }
+        results.append((processed_items, analysis))
+    
+    return results
+
+def create_meal_record(processed_items: List[Dict], analysis: Dict, data: Dict, timestamp: datetime) -> Dict:
+    """Build the history entry for an analyzed meal"""
+    return {
+        'id': str(uuid.uuid4()),
+        'foods': processed_items,
+        'analysis': analysis,
+        'timestamp': timestamp.isoformat(),
+        'location': data.get('location'),
+        'meal_type': data.get('meal_type', 'other'),
+        'notes': data.get('notes', '')
+    }
+
+def profile_derived(user: Dict) -> Dict:
+    """BMI, BMR, daily targets and BMI category and message for a user.
+    
+    Computed on every call: it takes a few microseconds, less than
+    serializing the profile to check a cached copy.
+    """
+    user_profile = user.get('profile', {})
+    bmi = calculate_bmi(user_profile.get('weight', 70), user_profile.get('height', 170))
+    derived = {
+        'bmi': bmi,
+        'bmr': calculate_bmr(user_profile.get('weight', 70), user_profile.get('height', 170),
+                             user_profile.get('age', 30), user_profile.get('gender', 'male')),
+        'daily_targets': get_daily_targets(user),
+        'bmi_category': get_bmi_category(bmi),
+        'bmi_message': get_bmi_message(bmi, user_profile.get('goal'))
+    }
+    return derived
+
+def get_daily_targets(user: Dict) -> Dict:
+    """Stored daily targets, or targets derived from the profile"""
+    if 'daily_targets' in user:
+        return user['daily_targets']
+    
+    user_profile = user.get('profile', {})
+    return calculate_daily_targets(
+        user_profile.get('weight', 70),
+        user_profile.get('height', 170),
+        user_profile.get('age', 30),
+        user_profile.get('gender', 'male'),
+        user_profile.get('activity_level', 'moderately_active'),
+        user_profile.get('goal', 'maintain_weight')
+    )
+
 def calculate_risk_score(calories: float, fats: float, carbs: float, bmi: float) -> Dict:
     """Calculate health risk score"""
-    score = 0
-    factors = []
-    
-    if calories > 1000:
-        score += 2
-        factors.append('High calorie intake')
-    elif calories > 800:
-        score += 1
-        factors.append('Moderate-high calorie intake')
-    
-    if fats > 40:
-        score += 2
-        factors.append('High fat content')
-    elif fats > 25:
-        score += 1
-        factors.append('Moderate-high fat content')
-    
-    if carbs > 100:
-        score += 1
-        factors.append('High carbohydrate content')
-    
-    if bmi > 30:
-        score += 2
-        factors.append('Obesity BMI range')
-    elif bmi > 25:
-        score += 1
-        factors.append('Overweight BMI range')
-    
-    if score == 0:
-        level = 'Low Risk'
-    elif score <= 2:
-        level = 'Moderate Risk'
-    elif score <= 4:
-        level = 'High Risk'
-    else:
-        level = 'Very High Risk'
-    
-    return {'score': score, 'level': level, 'factors': factors}
+    return calculate_risk_scores([calories], [fats], [carbs], bmi)[0]
+
+def calculate_risk_scores(calories, fats, carbs, bmi) -> List[Dict]:
+    """Calculate health risk scores for arrays of meals"""
+    calories = np.asarray(calories, dtype=np.float64)
+    fats = np.asarray(fats, dtype=np.float64)
+    carbs = np.asarray(carbs, dtype=np.float64)
+    bmi = np.broadcast_to(np.asarray(bmi, dtype=np.float64), calories.shape)
+    
+    # (condition, points, factor) in the order factors are reported
+    rules = [
+        (calories > 1000, 2, 'High calorie intake'),
+        ((calories > 800) & (calories <= 1000), 1, 'Moderate-high calorie intake'),
+        (fats > 40, 2, 'High fat content'),
+        ((fats > 25) & (fats <= 40), 1, 'Moderate-high fat content'),
+        (carbs > 100, 1, 'High carbohydrate content'),
+        (bmi > 30, 2, 'Obesity BMI range'),
+        ((bmi > 25) & (bmi <= 30), 1, 'Overweight BMI range'),
+    ]
+    
+    scores = np.zeros(calories.shape, dtype=np.int64)
+    factors = [[] for _ in range(calories.size)]
+    for mask, points, factor in rules:
+        scores += points * mask
+        for i in np.flatnonzero(mask):
+            factors[i].append(factor)
+    
+    levels = np.select(
+        [scores == 0, scores <= 2, scores <= 4],
+        ['Low Risk', 'Moderate Risk', 'High Risk'],
+        default='Very High Risk'
+    )
+    
+    return [{'score': int(score), 'level': str(level), 'factors': factor_list}
+            for score, level, factor_list in zip(scores, levels, factors)]
 
 def calculate_meal_score(calories: float, protein: float, carbs: float, fats: float, fiber: float) -> int:
     """Calculate overall meal score (0-100)"""
-    score = 100
+    return calculate_meal_scores([calories], [protein], [carbs], [fats], [fiber])[0]
+
+def calculate_meal_scores(calories, protein, carbs, fats, fiber) -> List[int]:
+    """Calculate meal scores (0-100) for arrays of meals"""
+    calories = np.asarray(calories, dtype=np.float64)
+    protein = np.asarray(protein, dtype=np.float64)
+    fats = np.asarray(fats, dtype=np.float64)
+    fiber = np.asarray(fiber, dtype=np.float64)
+    
+    score = np.full(calories.shape, 100.0)
     
     # Deduct for excessive calories
-    if calories > 800:
-        score -= min(30, (calories - 800) / 10)
+    score -= np.where(calories > 800, np.minimum(30, (calories - 800) / 10), 0)
     
     # Bonus for good protein
-    if protein > 20:
-        score += min(10, (protein - 20) / 2)
+    score += np.where(protein > 20, np.minimum(10, (protein - 20) / 2), 0)
     
     # Bonus for fiber
-    if fiber > 5:
-        score += min(10, fiber)
+    score += np.where(fiber > 5, np.minimum(10, fiber), 0)
     
     # Deduct for high fats without protein
-    if fats > 30 and protein < 15:
-        score -= 15
+    score -= np.where((fats > 30) & (protein < 15), 15, 0)
     
     # Ensure score is within bounds
-    return max(0, min(100, round(score)))
+    return [int(s) for s in np.clip(np.round(score), 0, 100)]
 
 def generate_recommendations(calories: float, protein: float, carbs: float, fats: float, 
                            fiber: float, targets: Dict, food_count: int, goal: str) -> List[str]:
     """Generate personalized recommendations"""
-    recommendations = []
+    return generate_recommendations_batch(
+        [calories], [protein], [carbs], [fats], [fiber], targets, [food_count], goal
+    )[0]
+
+def generate_recommendations_batch(calories, protein, carbs, fats, fiber,
+                                   targets: Dict, food_counts, goal: str) -> List[List[str]]:
+    """Generate personalized recommendations for arrays of meals"""
+    calories = np.asarray(calories, dtype=np.float64)
+    protein = np.asarray(protein, dtype=np.float64)
+    fiber = np.asarray(fiber, dtype=np.float64)
+    food_counts = np.asarray(food_counts)
     
-    # Protein recommendations
     protein_percentage = (protein / targets['protein']) * 100
-    if protein_percentage < 50:
-        recommendations.append("Consider adding lean protein like chicken, fish, or tofu")
-    elif protein_percentage > 150:
-        recommendations.append("High protein intake - ensure adequate hydration")
-    
-    # Calorie recommendations based on goal
     calorie_percentage = (calories / targets['calories']) * 100
-    if goal == 'weight_loss' and calorie_percentage > 40:
-        recommendations.append("For weight loss, consider smaller portions or lower-calorie alternatives")
-    elif goal == 'muscle_gain' and protein_percentage < 30:
-        recommendations.append("For muscle gain, increase protein intake with this meal")
-    
-    # Fiber recommendations
-    if fiber < 5:
-        recommendations.append("Add more fiber-rich foods like vegetables, fruits, or whole grains")
-    
-    # Variety recommendations
-    if food_count < 3:
-        recommendations.append("Include more food variety for balanced nutrition")
     
-    # Positive reinforcement
-    if calorie_percentage <= 35 and protein_percentage >= 25 and fiber >= 5:
-        recommendations.append("Great meal composition! Well balanced and nutritious.")
+    # (condition, recommendation) in the order they are reported
+    rules = [
+        # Protein recommendations
+        (protein_percentage < 50, "Consider adding lean protein like chicken, fish, or tofu"),
+        (protein_percentage > 150, "High protein intake - ensure adequate hydration"),
+        # Calorie recommendations based on goal
+        ((goal == 'weight_loss') & (calorie_percentage > 40),
+         "For weight loss, consider smaller portions or lower-calorie alternatives"),
+        ((goal == 'muscle_gain') & (protein_percentage < 30),
+         "For muscle gain, increase protein intake with this meal"),
+        # Fiber recommendations
+        (fiber < 5, "Add more fiber-rich foods like vegetables, fruits, or whole grains"),
+        # Variety recommendations
+        (food_counts < 3, "Include more food variety for balanced nutrition"),
+        # Positive reinforcement
+        ((calorie_percentage <= 35) & (protein_percentage >= 25) & (fiber >= 5),
+         "Great meal composition! Well balanced and nutritious."),
+    ]
+    
+    recommendations = [[] for _ in range(calories.size)]
+    for mask, text in rules:
+        for i in np.flatnonzero(np.broadcast_to(mask, calories.shape)):
+            recommendations[i].append(text)
     
     return recommendations
 
@@ -393,30 +634,223 @@ def get_bmi_message(bmi: float, goal: str) -> str:
     else:
         return f"Your BMI indicates {category.lower()}. Consider consulting a nutritionist."
 
+def meal_key(user_id: str, meal_id: str) -> str:
+    """Key of a meal record in shared storage"""
+    return f'{user_id}/{meal_id}'
+
+def store_meals(user_id: str, meals: List[Dict]):
+    """Persist new meals and add them to this worker's history and aggregates"""
+    with state_lock:
+        state.put_many('meals', {meal_key(user_id, meal['id']): meal for meal in meals})
+        meals_db.extend(user_id, meals)
+        for meal in meals:
+            index_meal(user_id, meal)
+
+def delete_stored_meal(user_id: str, meal_id: str) -> Optional[Dict]:
+    """Delete a meal everywhere, returning the removed record"""
+    with state_lock:
+        meal = meals_db.remove(user_id, meal_id)
+        if meal is not None:
+            state.delete('meals', meal_key(user_id, meal_id))
+            unindex_meal(user_id, meal)
+    return meal
+
+def index_meal(user_id: str, meal: Dict):
+    """Add a stored meal to the per-user aggregates"""
+    day = datetime.fromisoformat(meal['timestamp']).toordinal()
+    stats = user_stats.get(user_id)
+    if stats is None:
+        stats = user_stats[user_id] = RollingStats(STATS_WINDOW_DAYS)
+    stats.add(day, meal['analysis']['nutrition']['calories'],
+              meal['analysis']['health_assessment']['meal_score'])
+    
+    day_log = day_logs.get(user_id)
+    if day_log is None:
+        day_log = day_logs[user_id] = DayLog()
+    day_log.add(day)
+    streak_board.update(user_id, day_log)
+    community_stats.add_meal(user_id, meal, day, meals_db.latest_epoch(user_id))
+
+def unindex_meal(user_id: str, meal: Dict):
+    """Remove a deleted meal from the per-user aggregates"""
+    day = datetime.fromisoformat(meal['timestamp']).toordinal()
+    if user_id in user_stats:
+        user_stats[user_id].remove(day, meal['analysis']['nutrition']['calories'],
+                                   meal['analysis']['health_assessment']['meal_score'])
+    if user_id in day_logs:
+        day_logs[user_id].remove(day)
+        streak_board.update(user_id, day_logs[user_id])
+    community_stats.remove_meal(user_id, meal, day, meals_db.latest_epoch(user_id))
+
+def index_profile(user_id: str, profile: Dict):
+    """Move a user into the community buckets for their current profile"""
+    bmi = None
+    if 'weight' in profile and 'height' in profile:
+        bmi = calculate_bmi(profile['weight'], profile['height'])
+    community_stats.set_profile(user_id, profile.get('goal', 'maintain_weight'), bmi,
+                                None if bmi is None else get_bmi_category(bmi))
+
+def calculate_user_stats(user_id: str) -> Dict:
+    """User statistics from the rolling window aggregates"""
+    total_calories, total_scores, total_meals = (
+        user_stats[user_id].window(datetime.now().toordinal()) if user_id in user_stats else (0, 0, 0))
+    
+    if not total_meals:
+        return {
+            'avg_daily_calories': 0,
+            'meals_logged_7d': 0,
+            'avg_meal_score': 0,
+            'last_updated': datetime.now().isoformat()
+        }
+    # Calculate averages
+    return {
+        'avg_daily_calories': round(total_calories / min(total_meals, STATS_WINDOW_DAYS)),
+        'meals_logged_7d': total_meals,
+        'avg_meal_score': round(total_scores / total_meals),
+        'last_updated': datetime.now().isoformat()
+    }
+
 def update_user_stats(user_id: str):
-    """Update user statistics based on meal history"""
-    if user_id not in meals_db or not meals_db[user_id]:
+    """Store refreshed user statistics after a meal is added or deleted"""
+    if user_id not in user_stats or users_db.get(user_id) is None:
         return
-    
-    user_meals = meals_db[user_id]
-    recent_meals = [m for m in user_meals 
-                   if datetime.fromisoformat(m['timestamp']) > datetime.now() - timedelta(days=7)]
-    
-    if not recent_meals:
+    # A record of its own, so this never writes back a stale copy of the user
+    state.put('user_stats', user_id, calculate_user_stats(user_id))
+
+@app.before_request
+def sync_shared_state():
+    """Apply users and meals written by other workers since the last sync"""
+    if sync_lock.acquire(blocking=False):
+        try:
+            # Polled outside state_lock so other requests keep running; while sync_lock is held,
+            # state.seq may run ahead of what has been applied, so snapshots take it first
+            changes = state.sync()
+            with state_lock:
+                if changes is None:
+                    load_shared_state()
+                else:
+                    apply_changes(changes)
+        finally:
+            sync_lock.release()
+    if app.config['MEAL_SNAPSHOT_PATH'] and meal_snapshot_writer is None:
+        start_meal_snapshot_writer()
+
+def apply_changes(changes: List[Tuple[str, str]]):
+    """Bring this worker's meal history and aggregates up to date with changed records"""
+    for namespace, key in changes:
+        if namespace == 'users':
+            user = users_db.get(key)
+            if user is not None:
+                index_profile(key, user.get('profile', {}))
+        elif namespace == 'meals':
+            user_id, meal_id = key.split('/', 1)
+            meal = state.get('meals', key)
+            local_meal = meals_db.get(user_id, meal_id)
+            if meal is not None and local_meal is None:
+                meals_db.add(user_id, meal)
+                index_meal(user_id, meal)
+            elif meal is None and local_meal is not None:
+                meals_db.remove(user_id, meal_id)
+                unindex_meal(user_id, local_meal)
+
+def reset_derived_state():
+    """Drop this worker's meal history and aggregates"""
+    global streak_board, community_stats
+    meals_db.clear()
+    user_stats.clear()
+    day_logs.clear()
+    streak_board = StreakBoard()
+    community_stats = CommunityAggregates()
+
+def load_shared_state():
+    """Rebuild this worker's meal history and aggregates, from the meal snapshot when it is current"""
+    if load_meal_snapshot():
         return
     
-    # Calculate averages
-    total_calories = sum(m['analysis']['nutrition']['calories'] for m in recent_meals)
-    total_meals = len(recent_meals)
-    
-    if user_id in users_db:
-        users_db[user_id]['stats'] = {
-            'avg_daily_calories': round(total_calories / min(total_meals, 7)),
-            'meals_logged_7d': total_meals,
-            'avg_meal_score': round(sum(m['analysis']['health_assessment']['meal_score'] 
-                                      for m in recent_meals) / total_meals),
-            'last_updated': datetime.now().isoformat()
-        }
+    reset_derived_state()
+    for user_id, user in users_db.items():
+        index_profile(user_id, user.get('profile', {}))
+    meals_by_user: Dict[str, List[Dict]] = {}
+    for key, meal in state.iter_items('meals'):
+        meals_by_user.setdefault(key.split('/', 1)[0], []).append(meal)
+    for user_id, meals in meals_by_user.items():
+        meals.sort(key=lambda meal: to_epoch(meal['timestamp']))
+        meals_db.extend(user_id, meals)
+        for meal in meals:
+            index_meal(user_id, meal)
+
+def load_meal_snapshot() -> bool:
+    """Load meal history from the snapshot file and replay later changes, if it is usable"""
+    path = app.config['MEAL_SNAPSHOT_PATH']
+    if not path or not os.path.exists(path):
+        return False
+    try:
+        snapshot = MealSnapshot.load(path)
+    except (OSError, ValueError):
+        return False
+    changes, _ = state.backend.changes_since(snapshot.seq)
+    if changes is None:
+        return False  # Older than the change feed reaches
+    
+    reset_derived_state()
+    for user_id, user in users_db.items():
+        index_profile(user_id, user.get('profile', {}))
+    # Aggregates are built from per-day and per-food totals, so nothing here loops over meals
+    columns = snapshot.columns
+    last_epochs = columns['epoch'][columns['user_offsets'][1:] - 1].tolist()
+    histories = []
+    for index, (user_id, (days, meals, calories, scores)) in enumerate(zip(snapshot.users,
+                                                                          snapshot.daily_totals())):
+        # Records stay encoded in the mapped file until the user's history is first read
+        meals_db.extend_lazy(user_id, sum(meals), UserHistory(snapshot, index))
+        user_stats[user_id] = RollingStats(STATS_WINDOW_DAYS)
+        user_stats[user_id].add_days(days, calories, scores, meals)
+        day_log = day_logs[user_id] = DayLog.from_counts(days, meals)
+        streak_board.update(user_id, day_log)
+        histories.append((user_id, sum(meals), sum(scores), last_epochs[index]))
+    if histories:
+        first_day = int(columns['day'].max()) - community_stats.foods.days + 1
+        community_stats.add_histories(histories, snapshot.food_counts(), snapshot.daily_food_counts(first_day))
+    apply_changes(changes)
+    # A snapshot of a store that has since been wiped can still pass the feed check
+    return len(meals_db) == state.count('meals')
+
+def save_meal_snapshot():
+    """Write this worker's meal history as the snapshot new workers start from"""
+    # Copy the lists under the locks and serialize outside them; records are never mutated in place
+    with sync_lock, state_lock:
+        seq = state.seq  # Everything up to here is applied; later changes replay idempotently
+        histories = [meals_db.pending(user_id) or (user_id, meals_db.epochs(user_id), meals_db.range(user_id))
+                     for user_id in meals_db.users()]
+    MealSnapshot.write(app.config['MEAL_SNAPSHOT_PATH'], seq, histories)
+
+def start_meal_snapshot_writer():
+    """Rewrite the meal snapshot every MEAL_SNAPSHOT_INTERVAL seconds from a daemon thread.
+    
+    Only the worker holding an exclusive lock on the snapshot's .lock file
+    writes; the lock is released when that worker exits, and the next
+    worker to try takes over.
+    """
+    global meal_snapshot_writer
+    with state_lock:
+        if meal_snapshot_writer is not None:
+            return
+        meal_snapshot_writer = threading.Thread(target=write_meal_snapshots, name='meal-snapshot-writer',
+                                                daemon=True)
+    meal_snapshot_writer.start()
+
+def write_meal_snapshots():
+    lock_file = open(app.config['MEAL_SNAPSHOT_PATH'] + '.lock', 'a')
+    while True:
+        time.sleep(app.config['MEAL_SNAPSHOT_INTERVAL'])
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            save_meal_snapshot()
+        except BlockingIOError:
+            pass  # Another worker is the writer
+        except Exception as e:
+            app.logger.error(f"Error writing meal snapshot: {str(e)}")
 
 @app.route('/api/user/profile', methods=['GET'])
 @require_auth
@@ -425,16 +859,12 @@ def get_user_profile():
     user = request.user
     user_id = request.user_id
     
-    # Calculate statistics
-    stats = user.get('stats', {})
-    meals_count = len(meals_db.get(user_id, []))
+    # Calculate statistics for the response only; they are stored on meal writes
+    stats = calculate_user_stats(user_id)
+    meals_count = meals_db.count(user_id)
     
     # Get recent meals
-    recent_meals = []
-    if user_id in meals_db:
-        recent_meals = sorted(meals_db[user_id], 
-                            key=lambda x: x['timestamp'], 
-                            reverse=True)[:5]
+    recent_meals = meals_db.newest(user_id, 5)
     
     profile_data = {
         'success': True,
@@ -449,10 +879,7 @@ def get_user_profile():
             'health_metrics': {
                 'weight': user.get('profile', {}).get('weight'),
                 'height': user.get('profile', {}).get('height'),
-                'bmi': round(calculate_bmi(
-                    user.get('profile', {}).get('weight', 70),
-                    user.get('profile', {}).get('height', 170)
-                ), 1),
+                'bmi': round(profile_derived(user)['bmi'], 1),
                 'goal': user.get('profile', {}).get('goal'),
                 'activity_level': user.get('profile', {}).get('activity_level')
             },
@@ -478,26 +905,10 @@ def get_user_profile():
 
 def calculate_streak(user_id: str) -> int:
     """Calculate consecutive days with meals logged"""
-    if user_id not in meals_db:
+    if user_id not in day_logs:
         return 0
     
-    dates = set()
-    for meal in meals_db[user_id]:
-        meal_date = datetime.fromisoformat(meal['timestamp']).date()
-        dates.add(meal_date)
-    
-    dates = sorted(dates, reverse=True)
-    streak = 0
-    current_date = datetime.now().date()
-    
-    for i in range(len(dates)):
-        expected_date = current_date - timedelta(days=i)
-        if expected_date in dates:
-            streak += 1
-        else:
-            break
-    
-    return streak
+    return day_logs[user_id].streak(datetime.now().toordinal())
 
 @app.route('/api/user/profile', methods=['PUT'])
 @require_auth
@@ -515,6 +926,7 @@ def update_user_profile():
         # Update profile info
         if 'profile' in data:
             user['profile'] = {**user.get('profile', {}), **data['profile']}
+            index_profile(user_id, user['profile'])
             
             # Recalculate daily targets if relevant fields changed
             profile = user['profile']
@@ -557,29 +969,27 @@ def get_meals():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         meal_type = request.args.get('meal_type')
-        limit = int(request.args.get('limit', 50))
-        offset = int(request.args.get('offset', 0))
-        
-        # Filter meals
-        meals = meals_db[user_id]
-        
-        if start_date:
-            start = datetime.fromisoformat(start_date)
-            meals = [m for m in meals if datetime.fromisoformat(m['timestamp']) >= start]
-        
-        if end_date:
-            end = datetime.fromisoformat(end_date)
-            meals = [m for m in meals if datetime.fromisoformat(m['timestamp']) <= end]
+        cursor = request.args.get('cursor')
+        try:
+            limit = int(request.args.get('limit', 50))
+            offset = int(request.args.get('offset', 0))
+            # Date filters are range slices of the time-ordered store
+            start = datetime.fromisoformat(start_date) if start_date else None
+            end = datetime.fromisoformat(end_date) if end_date else None
+            before = parse_meal_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid limit, offset, date or cursor'}), 400
         
-        if meal_type:
-            meals = [m for m in meals if m.get('meal_type') == meal_type]
-        
-        # Sort by timestamp (newest first)
-        meals = sorted(meals, key=lambda x: x['timestamp'], reverse=True)
-        
-        # Paginate
-        total = len(meals)
-        paginated_meals = meals[offset:offset + limit]
+        where = (lambda meal: meal.get('meal_type') == meal_type) if meal_type else None
+        if before is not None:
+            # Keyset pagination: resume below the last meal of the previous page.
+            # One extra meal tells whether another page follows.
+            paginated_meals, total = meals_db.page_before(user_id, before, limit + 1, start, end, where)
+            has_more = len(paginated_meals) > limit
+            paginated_meals = paginated_meals[:limit]
+        else:
+            paginated_meals, total = meals_db.page(user_id, offset, limit, start, end, where)
+            has_more = offset + limit < total
         
         return jsonify({
             'success': True,
@@ -588,7 +998,8 @@ def get_meals():
                 'total': total,
                 'limit': limit,
                 'offset': offset,
-                'has_more': offset + limit < total
+                'has_more': has_more,
+                'next_cursor': meal_cursor(paginated_meals[-1]) if has_more and paginated_meals else None
             }
         })
         
@@ -596,20 +1007,28 @@ def get_meals():
         app.logger.error(f"Error getting meals: {str(e)}")
         return jsonify({'error': 'Failed to retrieve meals'}), 500
 
+def meal_cursor(meal: Dict) -> str:
+    """Opaque keyset cursor pointing just below a meal"""
+    return f"{meal['timestamp']}|{meal['id']}"
+
+def parse_meal_cursor(cursor: str) -> Tuple[float, str]:
+    """(epoch, meal_id) position encoded in a keyset cursor; ValueError if malformed"""
+    timestamp, separator, meal_id = cursor.partition('|')
+    if not separator or not meal_id:
+        raise ValueError(f'Malformed meal cursor: {cursor!r}')
+    return to_epoch(timestamp), meal_id
+
 @app.route('/api/meals/<meal_id>', methods=['GET'])
 @require_auth
 def get_meal(meal_id):
     """Get a specific meal"""
     user_id = request.user_id
     
-    if user_id not in meals_db:
+    meal = meals_db.get(user_id, meal_id)
+    if meal is None:
         return jsonify({'error': 'Meal not found'}), 404
     
-    for meal in meals_db[user_id]:
-        if meal['id'] == meal_id:
-            return jsonify({'success': True, 'meal': meal})
-    
-    return jsonify({'error': 'Meal not found'}), 404
+    return jsonify({'success': True, 'meal': meal})
 
 @app.route('/api/meals/<meal_id>', methods=['DELETE'])
 @require_auth
@@ -617,20 +1036,16 @@ def delete_meal(meal_id):
     """Delete a meal"""
     user_id = request.user_id
     
-    if user_id not in meals_db:
+    deleted_meal = delete_stored_meal(user_id, meal_id)
+    if deleted_meal is None:
         return jsonify({'error': 'Meal not found'}), 404
     
-    for i, meal in enumerate(meals_db[user_id]):
-        if meal['id'] == meal_id:
-            deleted_meal = meals_db[user_id].pop(i)
-            update_user_stats(user_id)
-            return jsonify({
-                'success': True,
-                'message': 'Meal deleted successfully',
-                'deleted_meal': deleted_meal
-            })
-    
-    return jsonify({'error': 'Meal not found'}), 404
+    update_user_stats(user_id)
+    return jsonify({
+        'success': True,
+        'message': 'Meal deleted successfully',
+        'deleted_meal': deleted_meal
+    })
 
 @app.route('/api/dashboard/summary', methods=['GET'])
 @require_auth
@@ -640,15 +1055,13 @@ def get_dashboard_summary():
     user = request.user
     profile = user.get('profile', {})
     
-    # Calculate BMI
-    bmi = calculate_bmi(profile.get('weight', 70), profile.get('height', 170))
+    derived = profile_derived(user)
+    bmi = derived['bmi']
     
     # Get recent meals (last 7 days)
-    recent_meals = []
-    if user_id in meals_db:
-        week_ago = datetime.now() - timedelta(days=7)
-        recent_meals = [m for m in meals_db[user_id] 
-                       if datetime.fromisoformat(m['timestamp']) > week_ago]
+    now = datetime.now()
+    recent_meals = meals_db.range(user_id, start=now - timedelta(days=7))
+    meals_today = meals_db.count(user_id, start=datetime.combine(now.date(), datetime.min.time()))
     
     # Calculate insights
     if recent_meals:
@@ -678,13 +1091,12 @@ def get_dashboard_summary():
         'summary': {
             'health_overview': {
                 'bmi': round(bmi, 1),
-                'bmi_category': get_bmi_category(bmi),
+                'bmi_category': derived['bmi_category'],
                 'goal': profile.get('goal', 'maintain_weight'),
                 'progress': calculate_progress(user_id, profile.get('goal'))
             },
             'nutrition_tracking': {
-                'meals_logged_today': len([m for m in recent_meals 
-                                          if datetime.fromisoformat(m['timestamp']).date() == datetime.now().date()]),
+                'meals_logged_today': meals_today,
                 'avg_meal_score': round(avg_score, 1),
                 'avg_calories_per_meal': round(avg_calories),
                 'current_streak': calculate_streak(user_id)
@@ -732,15 +1144,13 @@ def calculate_progress(user_id: str, goal: str) -> Dict:
     if user_id not in meals_db:
         return {'percentage': 0, 'description': 'Start logging meals to track progress'}
     
-    recent_meals = [m for m in meals_db[user_id] 
-                   if datetime.fromisoformat(m['timestamp']) > datetime.now() - timedelta(days=30)]
+    # Calculate consistency
+    today = datetime.now().toordinal()
+    days_with_meals = day_logs[user_id].days_between(today - 29, today) if user_id in day_logs else 0
     
-    if not recent_meals:
+    if not days_with_meals:
         return {'percentage': 0, 'description': 'No recent meals logged'}
     
-    # Calculate consistency
-    days_with_meals = len(set(datetime.fromisoformat(m['timestamp']).date() 
-                             for m in recent_meals))
     consistency = min(100, (days_with_meals / 30) * 100)
     
     if goal == 'weight_loss':
@@ -815,15 +1225,8 @@ def login():
             return jsonify({'error': 'Invalid password'}), 401
         
         # Generate session token
-        token = str(uuid.uuid4())
-        expires = datetime.now() + timedelta(days=7)
-        
-        sessions_db[token] = {
-            'user_id': user_id,
-            'created': datetime.now().isoformat(),
-            'expires': expires.isoformat(),
-            'user_agent': request.headers.get('User-Agent', '')
-        }
+        token, expires = sessions_db.create(user_id, request.headers.get('User-Agent', ''))
+        expires = datetime.fromtimestamp(expires)
         
         # Remove password hash from response
         user_response = user.copy()
@@ -914,17 +1317,11 @@ def register():
             'joined': datetime.now().isoformat(),
             'last_login': datetime.now().isoformat()
         }
+        index_profile(user_id, profile)
         
         # Generate session token
-        token = str(uuid.uuid4())
-        expires = datetime.now() + timedelta(days=7)
-        
-        sessions_db[token] = {
-            'user_id': user_id,
-            'created': datetime.now().isoformat(),
-            'expires': expires.isoformat(),
-            'user_agent': request.headers.get('User-Agent', '')
-        }
+        token, expires = sessions_db.create(user_id, request.headers.get('User-Agent', ''))
+        expires = datetime.fromtimestamp(expires)
         
         return jsonify({
             'success': True,
@@ -949,36 +1346,29 @@ def logout():
     """User logout"""
     token = request.headers.get('Authorization')[7:]  # Remove 'Bearer ' prefix
     
-    if token in sessions_db:
-        del sessions_db[token]
+    sessions_db.revoke(token)
     
     return jsonify({'success': True, 'message': 'Logged out successfully'})
 
 @app.route('/api/community/insights', methods=['GET'])
 def get_community_insights():
     """Get community health insights"""
-    # Calculate statistics from all users
-    total_users = len(users_db)
-    total_meals = sum(len(meals) for meals in meals_db.values())
+    return jsonify(community_stats.snapshot(build_community_insights,
+                                            app.config['COMMUNITY_MAX_STALENESS']))
+
+def build_community_insights(stats: CommunityAggregates) -> Dict:
+    """Assemble the community insights payload from the maintained aggregates"""
+    total_users = stats.total_users
+    total_meals = stats.total_meals
     
     # Calculate average BMI
-    bmis = []
-    for user in users_db.values():
-        profile = user.get('profile', {})
-        if 'weight' in profile and 'height' in profile:
-            bmi = calculate_bmi(profile['weight'], profile['height'])
-            bmis.append(bmi)
-    
-    avg_bmi = round(sum(bmis) / len(bmis), 1) if bmis else 25.8
+    avg_bmi = stats.avg_bmi()
+    avg_bmi = round(avg_bmi, 1) if avg_bmi is not None else 25.8
     
-    # Calculate goal distribution
-    goals = {}
-    for user in users_db.values():
-        goal = user.get('profile', {}).get('goal', 'maintain_weight')
-        goals[goal] = goals.get(goal, 0) + 1
+    goals = dict(stats.goal_counts)
     
     # Generate community data
-    community_data = {
+    return {
         'success': True,
         'insights': {
             'overview': {
@@ -989,9 +1379,14 @@ def get_community_insights():
             },
             'health_stats': {
                 'avg_bmi': avg_bmi,
-                'bmi_distribution': calculate_bmi_distribution(bmis),
+                'bmi_distribution': calculate_bmi_distribution(stats.bmi_counts),
                 'goal_distribution': goals,
-                'most_common_foods': get_community_foods()
+                'most_common_foods': get_community_foods(),
+                'trending_foods': {
+                    'today': get_community_foods(days=1),
+                    '7d': get_community_foods(days=7),
+                    '30d': get_community_foods(days=30)
+                }
             },
             'trends': {
                 'avg_meal_score': calculate_community_avg_score(),
@@ -1002,31 +1397,18 @@ def get_community_insights():
         'leaderboards': {
             'consistency': get_consistency_leaders(),
             'meal_quality': get_quality_leaders()
-        }
+        },
+        'generated_at': datetime.now().isoformat()
     }
-    
-    return jsonify(community_data)
 
 def calculate_active_users() -> int:
     """Calculate number of users active in last 7 days"""
-    week_ago = datetime.now() - timedelta(days=7)
-    active_users = set()
-    
-    for user_id, meals in meals_db.items():
-        for meal in meals:
-            if datetime.fromisoformat(meal['timestamp']) > week_ago:
-                active_users.add(user_id)
-                break
-    
-    return len(active_users)
+    return community_stats.active_users((datetime.now() - timedelta(days=7)).timestamp())
 
-def calculate_bmi_distribution(bmis: List[float]) -> Dict[str, int]:
+def calculate_bmi_distribution(bmi_counts: Dict[str, int]) -> Dict[str, int]:
     """Calculate BMI category distribution"""
     distribution = {'Underweight': 0, 'Normal': 0, 'Overweight': 0, 'Obese': 0}
-    
-    for bmi in bmis:
-        category = get_bmi_category(bmi)
-        distribution[category] = distribution.get(category, 0) + 1
+    distribution.update(bmi_counts)
     
     # Convert to percentages
     total = sum(distribution.values())
@@ -1036,62 +1418,48 @@ def calculate_bmi_distribution(bmis: List[float]) -> Dict[str, int]:
     
     return distribution
 
-def get_community_foods() -> List[Dict]:
-    """Get most common foods across community"""
-    food_counts = {}
-    
-    for meals in meals_db.values():
-        for meal in meals:
-            for food in meal.get('foods', []):
-                name = food.get('name')
-                if name:
-                    food_counts[name] = food_counts.get(name, 0) + 1
-    
-    top_foods = sorted(food_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+def get_community_foods(days: Optional[int] = None) -> List[Dict]:
+    """Get most common foods across community, optionally over the last `days` days"""
+    # Counts come from a Space-Saving sketch and may overcount rare foods slightly
+    top_foods = community_stats.top_foods(10, datetime.now().toordinal(), days)
     return [{'food': food, 'count': count} for food, count in top_foods]
 
 def calculate_community_avg_score() -> float:
     """Calculate average meal score across community"""
-    scores = []
-    
-    for meals in meals_db.values():
-        for meal in meals:
-            score = meal['analysis']['health_assessment']['meal_score']
-            scores.append(score)
-    
-    return round(sum(scores) / len(scores), 1) if scores else 0
+    avg_score = community_stats.avg_meal_score()
+    return round(avg_score, 1) if avg_score is not None else 0
 
 def get_consistency_leaders() -> List[Dict]:
     """Get users with highest consistency streaks"""
     leaders = []
     
-    for user_id, user in users_db.items():
-        streak = calculate_streak(user_id)
-        if streak > 0:
-            leaders.append({
-                'name': user.get('name', 'Anonymous'),
-                'streak': streak,
-                'meals_logged': len(meals_db.get(user_id, []))
-            })
+    for user_id, streak in streak_board.leaders(datetime.now().toordinal(), 5):
+        user = users_db.get(user_id)
+        if user is None:
+            continue
+        leaders.append({
+            'name': user.get('name', 'Anonymous'),
+            'streak': streak,
+            'meals_logged': meals_db.count(user_id)
+        })
     
-    return sorted(leaders, key=lambda x: x['streak'], reverse=True)[:5]
+    return leaders
 
 def get_quality_leaders() -> List[Dict]:
     """Get users with highest average meal scores"""
     leaders = []
     
-    for user_id, user in users_db.items():
-        user_meals = meals_db.get(user_id, [])
-        if user_meals:
-            avg_score = sum(m['analysis']['health_assessment']['meal_score'] 
-                          for m in user_meals) / len(user_meals)
-            leaders.append({
-                'name': user.get('name', 'Anonymous'),
-                'avg_score': round(avg_score, 1),
-                'meals_logged': len(user_meals)
-            })
+    for user_id, avg_score, meals_logged in community_stats.quality_leaders(5):
+        user = users_db.get(user_id)
+        if user is None:
+            continue
+        leaders.append({
+            'name': user.get('name', 'Anonymous'),
+            'avg_score': round(avg_score, 1),
+            'meals_logged': meals_logged
+        })
     
-    return sorted(leaders, key=lambda x: x['avg_score'], reverse=True)[:5]
+    return leaders
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -1101,11 +1469,19 @@ def health_check():
         'timestamp': datetime.now().isoformat(),
         'stats': {
             'users': len(users_db),
-            'meals': sum(len(meals) for meals in meals_db.values()),
+            'meals': len(meals_db),
             'sessions': len(sessions_db)
         }
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once the health-risk model is warm, 503 until then"""
+    # Starts loading the model however the server was launched; the first probe kicks it off
+    nutrition_ai.warm_up()
+    status = nutrition_ai.status()
+    return jsonify({'ready': status['ready'], 'model': status}), 200 if status['ready'] else 503
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -1136,6 +1512,8 @@ def get_bmi_category(bmi):
     else:
         return 'Obese'
 
+load_shared_state()
+
 if __name__ == '__main__':
     print("🚀 Starting Enhanced Nutrition API Server...")
     print("=" * 50)
@@ -1144,6 +1522,7 @@ if __name__ == '__main__':
     print("  POST   /api/auth/register  - User registration")
     print("  POST   /api/auth/logout    - User logout")
     print("  POST   /api/analyze        - Analyze a meal (Auth required)")
+    print("  POST   /api/analyze/batch  - Analyze queued meals (Auth required)")
     print("  GET    /api/user/profile   - Get user profile (Auth required)")
     print("  PUT    /api/user/profile   - Update profile (Auth required)")
     print("  GET    /api/meals          - Get meal history (Auth required)")
@@ -1153,4 +1532,5 @@ if __name__ == '__main__':
     print("=" * 50)
     print("Server running at: http://localhost:5000")
     print("Debug mode: ON")
+    sessions_db.start_sweeper()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,202 @@
+import heapq
+import threading
+import time
+from bisect import bisect_right, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from heavy_hitters import WindowedSpaceSaving
+
+
+class _ScoreBoard:
+    """Users ranked by average meal score, served from a lazily cleaned max-heap"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str, int]] = []
+        self._versions: Dict[str, int] = {}
+
+    def update(self, user_id: str, avg_score: Optional[float]):
+        """Publish a user's new average, or None once they have no meals"""
+        version = self._versions.get(user_id, 0) + 1
+        self._versions[user_id] = version
+        if avg_score is not None:
+            heapq.heappush(self._heap, (-avg_score, user_id, version))
+
+    def top(self, limit: int) -> List[Tuple[str, float]]:
+        """Highest (user_id, average) pairs"""
+        leaders = []
+        keep = []
+        while self._heap and len(leaders) < limit:
+            entry = heapq.heappop(self._heap)
+            if entry[2] != self._versions.get(entry[1]):
+                continue  # Superseded
+            keep.append(entry)
+            leaders.append((entry[1], -entry[0]))
+
+        for entry in keep:
+            heapq.heappush(self._heap, entry)
+        return leaders
+
+    def compact(self, live: int):
+        """Drop superseded entries once they outnumber live ones"""
+        if len(self._heap) > 2 * live + 64:
+            self._heap = [e for e in self._heap if e[2] == self._versions.get(e[1])]
+            heapq.heapify(self._heap)
+
+
+class CommunityAggregates:
+    """Community-wide counters kept current on every profile and meal write.
+
+    Profile writes move a user between BMI and goal buckets; meal writes
+    feed the food heavy-hitters sketches and adjust score sums, per-user averages and the user's last
+    activity time.  Reads never walk users or meals: `snapshot` serves a
+    prebuilt payload and rebuilds it from the counters at most once per
+    `max_age` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._profiles: Dict[str, Tuple[Optional[str], Optional[float], str]] = {}
+        self.bmi_counts: Dict[str, int] = {}
+        self.bmi_sum = 0.0
+        self.bmi_users = 0
+        self.goal_counts: Dict[str, int] = {}
+
+        self.total_meals = 0
+        self.score_sum = 0.0
+        self.foods = WindowedSpaceSaving(capacity=256, days=30)
+        self._user_scores: Dict[str, List[float]] = {}  # user_id -> [score sum, meal count]
+        self._quality = _ScoreBoard()
+
+        self._last_active: Dict[str, float] = {}
+        self._active_epochs: List[float] = []  # Sorted values of _last_active
+
+        self._snapshot: Optional[Dict] = None
+        self._snapshot_at = float('-inf')
+
+    @property
+    def total_users(self) -> int:
+        return len(self._profiles)
+
+    def set_profile(self, user_id: str, goal: str, bmi: Optional[float] = None,
+                    category: Optional[str] = None):
+        """Add a user, or move them to the buckets of an updated profile"""
+        with self._lock:
+            previous = self._profiles.get(user_id)
+            if previous is not None:
+                self._count_profile(*previous, sign=-1)
+            self._profiles[user_id] = (category, bmi, goal)
+            self._count_profile(category, bmi, goal, sign=1)
+
+    def _count_profile(self, category: Optional[str], bmi: Optional[float], goal: str, sign: int):
+        if category is not None:
+            self.bmi_counts[category] = self.bmi_counts.get(category, 0) + sign
+            self.bmi_sum += sign * bmi
+            self.bmi_users += sign
+        count = self.goal_counts.get(goal, 0) + sign
+        if count:
+            self.goal_counts[goal] = count
+        else:
+            self.goal_counts.pop(goal, None)
+
+    def add_meal(self, user_id: str, meal: Dict, day: int, last_active: Optional[float]):
+        """Count a meal stored on `day`; `last_active` is the user's newest meal epoch"""
+        self._count_meal(user_id, meal, day, 1, last_active)
+
+    def add_histories(self, histories: Iterable[Tuple[str, int, float, float]], foods: Dict[str, int],
+                      day_foods: Dict[int, Dict[str, int]]):
+        """Count many users' non-empty meal histories at once.
+
+        `histories` holds (user_id, meals, score sum, newest meal epoch) per
+        user; `foods` and `day_foods` count food names over all their meals
+        and per recent day.
+        """
+        with self._lock:
+            self.foods.add_counts(foods, day_foods)
+            for user_id, meals, score_sum, last_active in histories:
+                self.total_meals += meals
+                self.score_sum += score_sum
+                totals = self._user_scores.setdefault(user_id, [0.0, 0])
+                totals[0] += score_sum
+                totals[1] += meals
+                self._quality.update(user_id, totals[0] / totals[1])
+                self._last_active[user_id] = last_active
+            self._quality.compact(len(self._user_scores))
+            self._active_epochs = sorted(self._last_active.values())
+
+    def remove_meal(self, user_id: str, meal: Dict, day: int, last_active: Optional[float]):
+        """Uncount a deleted meal; `last_active` is the user's newest remaining meal epoch"""
+        self._count_meal(user_id, meal, day, -1, last_active)
+
+    def _count_meal(self, user_id: str, meal: Dict, day: int, sign: int,
+                    last_active: Optional[float]):
+        score = meal['analysis']['health_assessment']['meal_score']
+        with self._lock:
+            self.total_meals += sign
+            self.score_sum += sign * score
+            if not self.total_meals:
+                self.score_sum = 0.0  # Reset exactly instead of accumulating float error
+
+            names = [food.get('name') for food in meal.get('foods', []) if food.get('name')]
+            if sign > 0:
+                self.foods.add(day, names)
+            else:
+                self.foods.discard(day, names)
+
+            totals = self._user_scores.setdefault(user_id, [0.0, 0])
+            totals[0] += sign * score
+            totals[1] += sign
+            if totals[1] > 0:
+                self._quality.update(user_id, totals[0] / totals[1])
+            else:
+                del self._user_scores[user_id]
+                self._quality.update(user_id, None)
+            self._quality.compact(len(self._user_scores))
+
+            self._set_last_active(user_id, last_active)
+
+    def _set_last_active(self, user_id: str, epoch: Optional[float]):
+        previous = self._last_active.pop(user_id, None)
+        if previous is not None:
+            del self._active_epochs[bisect_right(self._active_epochs, previous) - 1]
+        if epoch is not None:
+            self._last_active[user_id] = epoch
+            insort(self._active_epochs, epoch)
+
+    def active_users(self, since: float) -> int:
+        """Number of users whose newest meal is after `since`"""
+        with self._lock:
+            return len(self._active_epochs) - bisect_right(self._active_epochs, since)
+
+    def avg_bmi(self) -> Optional[float]:
+        with self._lock:
+            return self.bmi_sum / self.bmi_users if self.bmi_users else None
+
+    def avg_meal_score(self) -> Optional[float]:
+        with self._lock:
+            return self.score_sum / self.total_meals if self.total_meals else None
+
+    def top_foods(self, limit: int = 10, today: Optional[int] = None,
+                  days: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Most logged foods with estimated counts, for all time or the last `days` days"""
+        with self._lock:
+            return self.foods.top(limit, today, days)
+
+    def quality_leaders(self, limit: int = 5) -> List[Tuple[str, float, int]]:
+        """(user_id, average meal score, meals logged) for the best averages"""
+        with self._lock:
+            return [(user_id, avg, self._user_scores[user_id][1])
+                    for user_id, avg in self._quality.top(limit)]
+
+    def snapshot(self, build: Callable[['CommunityAggregates'], Dict], max_age: float) -> Dict:
+        """Payload from `build`, reused until it is more than `max_age` seconds old"""
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._snapshot_at > max_age:
+                self._snapshot = build(self)
+                self._snapshot_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        """Force the next snapshot to be rebuilt"""
+        with self._lock:
+            self._snapshot = None
@@ -6,6 +6,8 @@ db = SQLAlchemy()
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
+    public_id = db.Column(db.String(32), unique=True, index=True)  # Id used by the API
+    name = db.Column(db.String(120))
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
@@ -14,18 +16,28 @@ class User(db.Model):
     height = db.Column(db.Float)  # in cm
     gender = db.Column(db.String(10))
     health_conditions = db.Column(db.Text)
+    goal = db.Column(db.String(50))
+    activity_level = db.Column(db.String(50))
+    data = db.Column(db.Text)  # JSON: targets, preferences, stats and other profile fields
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relationships
+    # Relationships (hot paths query the child tables directly rather than walking these)
     nutrition_logs = db.relationship('NutritionLog', backref='user', lazy=True)
     health_metrics = db.relationship('HealthMetric', backref='user', lazy=True)
 
 class NutritionLog(db.Model):
     __tablename__ = 'nutrition_logs'
+    __table_args__ = (
+        db.Index('ix_nutrition_logs_user_id_timestamp', 'user_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    meal_id = db.Column(db.String(36), index=True)  # Rows of one meal share a meal_id
+    item_index = db.Column(db.Integer, default=0)
     meal_type = db.Column(db.String(50))  # breakfast, lunch, dinner, snack
     food_item = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.Float)
+    unit = db.Column(db.String(50))
     calories = db.Column(db.Float)
     protein = db.Column(db.Float)  # in grams
     carbs = db.Column(db.Float)    # in grams
@@ -34,9 +46,13 @@ class NutritionLog(db.Model):
     sugar = db.Column(db.Float)    # in grams
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     image_url = db.Column(db.String(500))  # for food image analysis
+    meal_data = db.Column(db.Text)  # JSON of the meal record, on the meal's first row
 
 class HealthMetric(db.Model):
     __tablename__ = 'health_metrics'
+    __table_args__ = (
+        db.Index('ix_health_metrics_user_id_timestamp', 'user_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     metric_type = db.Column(db.String(50))  # weight, blood_pressure, glucose, etc.
@@ -52,4 +68,24 @@ class CommunityHealth(db.Model):
     health_indicator = db.Column(db.String(100))  # obesity_rate, diabetes_rate, etc.
     value = db.Column(db.Float)
     date_recorded = db.Column(db.Date)
-    population_sample = db.Column(db.Integer)
\ No newline at end of file
+    population_sample = db.Column(db.Integer)
+
+class StateRecord(db.Model):
+    __tablename__ = 'state_records'
+    __table_args__ = (db.Index('ix_state_records_expiry', 'namespace', 'expires'),)
+    namespace = db.Column(db.String(50), primary_key=True)  # sessions, user_sessions, etc.
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text, nullable=False)  # JSON
+    expires = db.Column(db.Float)  # Copy of the record's expiry epoch, if any
+
+class StateChange(db.Model):
+    __tablename__ = 'state_changes'
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Handed out by StateSequence
+    namespace = db.Column(db.String(50), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+
+class StateSequence(db.Model):
+    """Single row holding the last change-feed sequence number handed out"""
+    __tablename__ = 'state_sequence'
+    id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
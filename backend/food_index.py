@@ -0,0 +1,178 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Postings bucketed by key length, so a search can stop at the shortest keys that match
+Buckets = Dict[int, Set[str]]
+
+
+class FoodIndex:
+    """Resolve free-text food names to keys of a nutrition catalogue.
+
+    A name matches a catalogue key when one contains the other (the rule
+    analyze_meal has always used).  When several keys match, the best one
+    is picked deterministically:
+
+      1. exact match
+      2. a key contained in the name (the longest key wins, whole words first)
+      3. a key containing the name (the shortest key wins, whole words first)
+
+    with ties broken alphabetically.  Resolved names are kept in an LRU cache.
+
+    Keys inside a name are found by looking up the name's substrings of
+    each key length in the catalogue, so the cost depends on the name, not
+    the catalogue.  Keys containing a name come from inverted indexes of
+    words and adjacent word pairs, and of character trigrams, with postings
+    bucketed by key length: the search walks the rarest posting from the
+    shortest bucket up and stops at the first length with a match.  Names
+    shorter than a trigram use the trigrams that contain them.
+    """
+
+    def __init__(self, keys: Iterable[str], cache_size: int = 4096):
+        self._keys: Set[str] = set()
+        self._lengths: List[int] = []  # Distinct key lengths, ascending
+        self._grams: Dict[str, Buckets] = {}
+        self._gram_sizes: Dict[str, int] = {}
+        self._words: Dict[str, Buckets] = {}
+        self._word_sizes: Dict[str, int] = {}
+        self._short_keys: Set[str] = set()
+        # One- and two-character strings -> trigrams containing them
+        self._grams_containing: Dict[str, Set[str]] = {}
+        for key in keys:
+            self.add(key)
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def add(self, key: str):
+        """Add a catalogue key to the index"""
+        key = normalize_food_name(key)
+        if not key or key in self._keys:
+            return
+        self._keys.add(key)
+        length = len(key)
+        if length not in self._lengths:
+            self._lengths = sorted(self._lengths + [length])
+        grams = trigrams(key)
+        if not grams:
+            self._short_keys.add(key)
+        for gram in grams:
+            if gram not in self._grams:
+                for part in {gram[0], gram[1], gram[2], gram[:2], gram[1:]}:
+                    self._grams_containing.setdefault(part, set()).add(gram)
+        for index, sizes, terms in ((self._grams, self._gram_sizes, grams),
+                                    (self._words, self._word_sizes, word_terms(key))):
+            for term in terms:
+                buckets = index.get(term)
+                if buckets is None:
+                    buckets = index[term] = {}
+                bucket = buckets.get(length)
+                if bucket is None:
+                    bucket = buckets[length] = set()
+                bucket.add(key)
+                sizes[term] = sizes.get(term, 0) + 1
+        # Cached answers may no longer be the best match
+        if hasattr(self, 'resolve'):
+            self.resolve.cache_clear()
+
+    def resolve_many(self, names: Iterable[str]) -> List[Optional[str]]:
+        """Resolve a sequence of names, preserving order"""
+        return [self.resolve(normalize_food_name(name)) for name in names]
+
+    def _resolve(self, name: str) -> Optional[str]:
+        name = normalize_food_name(name)
+        if not name:
+            return None
+        if name in self._keys:
+            return name
+
+        candidates = self._contained_keys(name) or self._containing_keys(name)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda key: _rank(key, name))
+
+    def _contained_keys(self, name: str) -> Set[str]:
+        """Keys that occur inside `name`"""
+        found = set()
+        for length in self._lengths:
+            if length >= len(name):
+                break
+            for start in range(len(name) - length + 1):
+                if name[start:start + length] in self._keys:
+                    found.add(name[start:start + length])
+        return found
+
+    def _containing_keys(self, name: str) -> List[str]:
+        """Shortest keys that `name` occurs inside, whole-word matches first"""
+        found = _shortest(self._words, self._word_sizes, word_terms(name), len(name),
+                          lambda key: _is_whole_words(key, name))
+        if found:
+            return found
+
+        grams = trigrams(name)
+        if grams:
+            return _shortest(self._grams, self._gram_sizes, grams, len(name), lambda key: name in key)
+
+        # Every key of three or more characters containing `name` is in a posting of a trigram containing it
+        short = [key for key in self._short_keys if name in key]
+        if short:
+            return short
+        buckets: Dict[int, List[Set[str]]] = {}
+        for gram in self._grams_containing.get(name, ()):
+            for length, keys in self._grams[gram].items():
+                buckets.setdefault(length, []).append(keys)
+        return list(set().union(*buckets[min(buckets)])) if buckets else []
+
+
+def _shortest(index: Dict[str, Buckets], sizes: Dict[str, int], terms: Iterable[str], min_length: int,
+              matches) -> List[str]:
+    """Keys of the shortest length in every term's posting that satisfy `matches`.
+
+    Walks the rarest term's posting one length bucket at a time, checking
+    the other terms by membership in their bucket of the same length.
+    """
+    terms = sorted(set(terms), key=lambda term: sizes.get(term, 0))
+    if not terms or terms[0] not in index:
+        return []
+    rarest, others = index[terms[0]], [index.get(term, {}) for term in terms[1:]]
+    for length in sorted(rarest):
+        if length < min_length:
+            continue
+        found = [key for key in rarest[length]
+                 if all(key in other.get(length, ()) for other in others) and matches(key)]
+        if found:
+            return found
+    return []
+
+
+def normalize_food_name(name: str) -> str:
+    """Lowercase and collapse whitespace in a food name"""
+    return ' '.join(str(name).lower().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Distinct character trigrams of a string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def word_terms(text: str) -> Set[str]:
+    """Words of a string and its adjacent word pairs, which keep word order in the index"""
+    words = text.split()
+    return set(words) | {f'{a} {b}' for a, b in zip(words, words[1:])}
+
+
+def _rank(key: str, name: str) -> Tuple[int, int, int, str]:
+    """Sort key for a candidate match, lower is better"""
+    whole_word = 0 if _is_whole_words(key, name) else 1
+    if key in name:
+        return (0, whole_word, -len(key), key)
+    return (1, whole_word, len(key), key)
+
+
+def _is_whole_words(key: str, name: str) -> bool:
+    """Whether the shorter string appears in the longer one on word boundaries"""
+    short, long = (key, name) if len(key) <= len(name) else (name, key)
+    return f' {short} ' in f' {long} '
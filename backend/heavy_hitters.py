@@ -0,0 +1,195 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """Approximate top-K counter over a stream using at most `capacity` counters.
+
+    This is the Space-Saving algorithm (Metwally et al.): a new item that
+    arrives when every counter is taken replaces the item with the smallest
+    count and inherits that count as its error.  After N increments:
+
+    * every estimate overcounts the true count by at most ``error <= N / capacity``
+    * every item whose true count exceeds ``N / capacity`` is monitored
+
+    Decrements (for deleted meals) only touch monitored items, so these
+    bounds are exact for insert-only streams and remain a close
+    approximation when deletes are rare.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.total = 0
+        self._counts: Dict[str, List[int]] = {}  # item -> [count, error]
+        self._heap: List[Tuple[int, str]] = []  # Lazy (count, item) entries for finding the minimum
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._counts
+
+    def add(self, item: str, count: int = 1):
+        """Count `count` more occurrences of `item`"""
+        self.total += count
+        entry = self._counts.get(item)
+        if entry is None:
+            if len(self._counts) < self.capacity:
+                entry = self._counts[item] = [0, 0]
+            else:
+                floor = self._pop_min()
+                entry = self._counts[item] = [floor, floor]
+        entry[0] += count
+        self._push(entry[0], item)
+
+    def add_counts(self, counts: Dict[str, int]):
+        """Count several items at once, largest count first.
+
+        An item no larger than the smallest monitored count once the sketch
+        is full only adds to the total: streaming it would evict a counter
+        it cannot outgrow.  Counting exact totals into an empty sketch thus
+        keeps the `capacity` largest items with no error.
+        """
+        for item, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+            if item not in self._counts and len(self._counts) >= self.capacity and count <= self.min_count():
+                self.total += count
+            else:
+                self.add(item, count)
+
+    def discard(self, item: str, count: int = 1):
+        """Take back occurrences of a monitored item"""
+        self.total = max(0, self.total - count)
+        entry = self._counts.get(item)
+        if entry is None:
+            return
+        entry[0] -= count
+        if entry[0] <= 0:
+            del self._counts[item]
+        else:
+            entry[1] = min(entry[1], entry[0])
+            self._push(entry[0], item)
+
+    def min_count(self) -> int:
+        """Smallest monitored count once the sketch is full, else 0"""
+        if len(self._counts) < self.capacity:
+            return 0
+        while self._heap:
+            count, item = self._heap[0]
+            entry = self._counts.get(item)
+            if entry is not None and entry[0] == count:
+                return count
+            heapq.heappop(self._heap)
+        return 0
+
+    def items(self) -> Iterable[Tuple[str, int, int]]:
+        """(item, estimated count, max overcount) for every monitored item"""
+        return ((item, count, error) for item, (count, error) in self._counts.items())
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        """Highest estimated (item, count) pairs"""
+        ranked = heapq.nlargest(limit, self._counts.items(), key=lambda kv: kv[1][0])
+        return [(item, count) for item, (count, _) in ranked]
+
+    def _push(self, count: int, item: str):
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._heap = [(c, i) for i, (c, _) in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> int:
+        """Evict the item with the smallest count, returning that count"""
+        while True:
+            count, item = heapq.heappop(self._heap)
+            entry = self._counts.get(item)
+            if entry is not None and entry[0] == count:
+                del self._counts[item]
+                return count
+
+
+class WindowedSpaceSaving:
+    """Space-Saving sketches for all time plus one per day over the last `days` days.
+
+    Day sketches live in a ring buffer indexed by day ordinal and are reset
+    lazily when their slot is reused, like RollingStats.  A window query
+    merges the day sketches it covers: estimates add up, and so do the
+    error bounds, with a full day sketch contributing its minimum count as
+    the error for items it does not monitor.  Memory stays at
+    ``(days + 1) * capacity`` counters however many distinct items arrive.
+    """
+
+    def __init__(self, capacity: int = 256, days: int = 30):
+        self.capacity = capacity
+        self.days = days
+        self.all_time = SpaceSaving(capacity)
+        self._day_ids: List[Optional[int]] = [None] * days
+        self._sketches: List[Optional[SpaceSaving]] = [None] * days
+
+    def add(self, day: int, items: Iterable[str]):
+        """Count items seen on `day`"""
+        items = list(items)
+        for item in items:
+            self.all_time.add(item)
+
+        sketch = self._day_sketch(day)
+        if sketch is not None:
+            for item in items:
+                sketch.add(item)
+
+    def add_counts(self, totals: Dict[str, int], days: Dict[int, Dict[str, int]]):
+        """Count items from exact counts: all-time `totals`, and per-day counts for recent days"""
+        self.all_time.add_counts(totals)
+        for day in sorted(days):
+            sketch = self._day_sketch(day)
+            if sketch is not None:
+                sketch.add_counts(days[day])
+
+    def _day_sketch(self, day: int) -> Optional[SpaceSaving]:
+        """Sketch of `day`, taking over its ring slot; None if the slot holds a newer day"""
+        slot = day % self.days
+        current = self._day_ids[slot]
+        if current != day:
+            if current is not None and current > day:
+                return None  # Older than every day the ring holds
+            self._day_ids[slot] = day
+            self._sketches[slot] = SpaceSaving(self.capacity)
+        return self._sketches[slot]
+
+    def discard(self, day: int, items: Iterable[str]):
+        """Take back items previously counted on `day`"""
+        items = list(items)
+        for item in items:
+            self.all_time.discard(item)
+
+        slot = day % self.days
+        if self._day_ids[slot] == day:
+            for item in items:
+                self._sketches[slot].discard(item)
+
+    def top(self, limit: int, today: Optional[int] = None,
+            days: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Top (item, count) pairs for all time, or the `days` days ending `today`"""
+        if days is None:
+            return self.all_time.top(limit)
+        return [(item, count) for item, count, _ in self.window(today, days)[:limit]]
+
+    def window(self, today: int, days: int) -> List[Tuple[str, int, int]]:
+        """(item, estimated count, error bound) over a window, highest first"""
+        first_day = today - min(days, self.days) + 1
+        sketches = [sketch for day, sketch in zip(self._day_ids, self._sketches)
+                    if day is not None and first_day <= day <= today]
+
+        merged: Dict[str, List[int]] = {}
+        for sketch in sketches:
+            for item, count, error in sketch.items():
+                entry = merged.setdefault(item, [0, 0])
+                entry[0] += count
+                entry[1] += error
+        for sketch in sketches:
+            floor = sketch.min_count()
+            if floor:
+                for item, entry in merged.items():
+                    if item not in sketch:
+                        entry[1] += floor
+
+        ranked = sorted(merged.items(), key=lambda kv: -kv[1][0])
+        return [(item, count, error) for item, (count, error) in ranked]
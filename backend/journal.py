@@ -0,0 +1,297 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from storage import Change, MemoryBackend, StorageBackend
+
+# Entry header: payload length and CRC32 of the payload
+HEADER = struct.Struct('<II')
+SNAPSHOT_FILE = 'snapshot.json'
+
+
+class JournalError(RuntimeError):
+    """The writer thread stopped after a failed write; later writes are not durable"""
+
+
+class Journal:
+    """Append-only, length-prefixed log written by a background thread.
+
+    `append` only queues the entry.  The writer thread takes whatever has
+    queued up, to at most `batch_size` entries, writes the batch and fsyncs
+    once (group commit), waiting up to `flush_interval` seconds for the
+    first entry of a batch.  An acknowledged write can therefore be lost if
+    the process dies within roughly `flush_interval` of making it.
+
+    The log is split into segments named after their first sequence
+    number.  A snapshot is written by the same thread, in order with the
+    entries, and starts a new segment; segments it covers are deleted.
+
+    If a write fails (e.g. the disk is full) the writer records the error
+    and stops; `append` and `flush` then raise JournalError rather than
+    queueing entries nothing will write or waiting forever.
+    """
+
+    def __init__(self, directory: str, batch_size: int = 256, flush_interval: float = 0.05):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue: 'queue.Queue[Tuple[str, object]]' = queue.Queue()
+        self._file = None
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+    # Reading
+
+    def load(self) -> Tuple[int, Dict[str, Dict[str, Dict]], List[list]]:
+        """(snapshot seq, snapshot records, journal entries after the snapshot)"""
+        seq, records = 0, {}
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                snapshot = json.load(f)
+            seq, records = snapshot['seq'], snapshot['records']
+
+        entries = [entry for segment in self._segments() for entry in self._read(segment)
+                   if entry[0] > seq]
+        return seq, records, entries
+
+    def _segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, 'journal-*.log')))
+
+    @staticmethod
+    def _read(path: str) -> Iterator[list]:
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, offset)
+            payload = data[offset + HEADER.size:offset + HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return  # Torn write at the tail from a crash
+            yield json.loads(payload)
+            offset += HEADER.size + length
+
+    # Writing
+
+    def start(self, next_seq: int):
+        """Open a fresh segment and start the writer thread"""
+        self._open_segment(next_seq)
+        self._writer = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def append(self, seq: int, op: str, namespace: Optional[str], key: Optional[str],
+               value_json: Optional[str] = None):
+        """Queue an entry; the value comes already serialized"""
+        self._check()
+        payload = '[%d,%s,%s,%s,%s]' % (seq, json.dumps(op), json.dumps(namespace), json.dumps(key),
+                                         value_json or 'null')
+        payload = payload.encode()
+        self._queue.put(('entry', HEADER.pack(len(payload), zlib.crc32(payload)) + payload))
+
+    def snapshot(self, seq: int, records: Dict[str, Dict[str, str]]):
+        """Queue a snapshot of the state after entry `seq`, given as serialized records"""
+        self._check()
+        self._queue.put(('snapshot', (seq, records)))
+
+    def flush(self):
+        """Block until everything queued so far is on disk"""
+        self._check()
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        # A writer that fails before getting to this request never sets it
+        while not done.wait(0.1):
+            self._check()
+
+    def _check(self):
+        if self._error is not None:
+            raise JournalError(f'journal writer stopped: {self._error!r}') from self._error
+
+    def close(self):
+        if self._closed or self._writer is None:
+            return
+        self._closed = True
+        self._queue.put(('stop', None))
+        self._writer.join()
+
+    def _run(self):
+        try:
+            self._write_batches()
+        except Exception as e:
+            self._error = e
+
+    def _write_batches(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.flush_interval) if len(batch) == 1
+                                 else self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            pending = []
+            for kind, item in batch:
+                if kind == 'entry':
+                    pending.append(item)
+                    continue
+                self._commit(pending)
+                pending = []
+                if kind == 'snapshot':
+                    self._write_snapshot(*item)
+                elif kind == 'flush':
+                    item.set()
+                elif kind == 'stop':
+                    self._file.close()
+                    return
+            self._commit(pending)
+
+    def _commit(self, entries: List[bytes]):
+        if not entries:
+            return
+        self._file.write(b''.join(entries))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _open_segment(self, first_seq: int):
+        if self._file is not None:
+            self._file.close()
+        # A leftover file with this name holds only a torn entry that load() skipped
+        path = os.path.join(self.directory, f'journal-{first_seq:020d}.log')
+        self._file = open(path, 'wb')
+
+    def _write_snapshot(self, seq: int, records: Dict[str, Dict[str, str]]):
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('{"seq":%d,"records":{' % seq)
+            for i, (namespace, items) in enumerate(records.items()):
+                f.write('%s%s:{' % (',' if i else '', json.dumps(namespace)))
+                f.write(','.join('%s:%s' % (json.dumps(key), value) for key, value in items.items()))
+                f.write('}')
+            f.write('}}')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+        # Entries up to `seq` are in the snapshot; later ones go to a new segment
+        old_segments = self._segments()
+        self._open_segment(seq + 1)
+        # The rename must reach the disk before the segments it replaces are removed
+        _fsync_directory(self.directory)
+        for segment in old_segments:
+            if not segment.endswith(f'{seq + 1:020d}.log'):
+                os.remove(segment)
+
+
+def _fsync_directory(directory: str):
+    """Make renames and new files in `directory` durable"""
+    if os.name == 'nt':
+        return  # Directories cannot be opened for fsync; NTFS journals renames itself
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JournaledBackend(StorageBackend):
+    """MemoryBackend made durable by a write-behind Journal.
+
+    Writes apply to memory and queue a journal entry, so requests never wait
+    on the disk.  On startup the last snapshot is loaded and newer entries
+    are replayed; a new snapshot is queued every `snapshot_every` writes so
+    replay stays short.  Each record's JSON is kept alongside it, so a
+    snapshot is a copy of string references that the writer thread can
+    stream out while callers keep mutating their dicts.  The journal
+    belongs to one process, so this backend suits single-worker
+    deployments; use SQLite or a database for several.
+    """
+
+    def __init__(self, journal: Journal, snapshot_every: int = 10000):
+        self.journal = journal
+        self.snapshot_every = snapshot_every
+        self.memory = MemoryBackend()
+        self._serialized: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.RLock()
+
+        self._seq, records, entries = journal.load()
+        for namespace, items in records.items():
+            for key, value in items.items():
+                self._apply('put', namespace, key, value, json.dumps(value, separators=(',', ':')))
+        for seq, op, namespace, key, value in entries:
+            self._apply(op, namespace, key, value, None if value is None else
+                        json.dumps(value, separators=(',', ':')))
+            self._seq = seq
+        self._since_snapshot = len(entries)
+        journal.start(self._seq + 1)
+
+    def _apply(self, op: str, namespace: Optional[str], key: Optional[str],
+               value: Optional[Dict], value_json: Optional[str]):
+        if op == 'put':
+            self.memory.put(namespace, key, value)
+            self._serialized.setdefault(namespace, {})[key] = value_json
+        elif op == 'delete':
+            self.memory.delete(namespace, key)
+            self._serialized.get(namespace, {}).pop(key, None)
+        elif op == 'clear':
+            self.memory.clear(namespace)
+            if namespace is None:
+                self._serialized.clear()
+            else:
+                self._serialized.pop(namespace, None)
+
+    def _log(self, op: str, namespace: Optional[str] = None, key: Optional[str] = None,
+             value: Optional[Dict] = None):
+        """Apply a write to memory and journal it, under one lock so sequence order matches"""
+        value_json = None if value is None else json.dumps(value, separators=(',', ':'))
+        with self._lock:
+            # Journal first, so a failed journal rejects the write instead of keeping it in memory only
+            self.journal.append(self._seq + 1, op, namespace, key, value_json)
+            self._seq += 1
+            self._apply(op, namespace, key, value, value_json)
+            self._since_snapshot += 1
+            if self._since_snapshot >= self.snapshot_every:
+                self._since_snapshot = 0
+                self.journal.snapshot(self._seq, {ns: dict(items) for ns, items in self._serialized.items()})
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        return self.memory.get(namespace, key)
+
+    def put(self, namespace: str, key: str, value: Dict):
+        self._log('put', namespace, key, value)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        # Checked under the lock so two concurrent deletes do not both log one
+        with self._lock:
+            if self.memory.get(namespace, key) is None:
+                return False
+            self._log('delete', namespace, key)
+            return True
+
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        return self.memory.items(namespace)
+
+    def count(self, namespace: str) -> int:
+        return self.memory.count(namespace)
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        return self.memory.expired(namespace, now)
+
+    def sequence(self) -> int:
+        return self.memory.sequence()
+
+    def changes_since(self, seq: int) -> Tuple[Optional[List[Change]], int]:
+        return self.memory.changes_since(seq)
+
+    def clear(self, namespace: Optional[str] = None):
+        self._log('clear', namespace)
@@ -0,0 +1,260 @@
+import json
+import os
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+MAGIC = b'NUTRISNP'
+VERSION = 1
+# Magic, format version, header length
+PREAMBLE = struct.Struct('<8sIQ')
+ALIGN = 64
+
+
+class MealSnapshot:
+    """Every user's meal history in one binary file, mapped back with numpy.memmap.
+
+    The file is a JSON header followed by 64-byte aligned arrays:
+
+    * per meal: `epoch`, `calories` and `score` (float64), `day` ordinal
+      (int32), and `food_offsets` into `food_ids`
+    * `food_ids`: indexes into the interned string table
+    * per user: `user_names` (string table index), `user_offsets` into the
+      meal columns and `record_offsets` into `records`, where each user's
+      meals are one JSON array
+    * the string table: UTF-8 `strings` with `string_offsets`
+
+    Loading parses only the header and the string table; the columns stay
+    mapped read-only, so workers share their pages through the page cache.
+    Aggregates are rebuilt from per-day and per-food totals computed over
+    whole columns, without touching the records or parsing a timestamp.  A user's records are decoded through a
+    UserHistory only when first needed.  `seq` is the storage change-feed
+    position the snapshot reflects.
+    """
+
+    COLUMNS = ('epoch', 'day', 'calories', 'score', 'food_offsets', 'food_ids', 'user_names',
+               'user_offsets', 'record_offsets', 'records', 'string_offsets', 'strings')
+
+    def __init__(self, seq: int, columns: Dict[str, np.ndarray]):
+        self.seq = seq
+        self.columns = columns
+        offsets = columns['string_offsets'].tolist()
+        blob = columns['strings']
+        self.strings = [bytes(blob[a:b]).decode() for a, b in zip(offsets, offsets[1:])]
+        self.users = [self.strings[i] for i in columns['user_names'].tolist()]
+
+    def __len__(self) -> int:
+        """Number of meals"""
+        return len(self.columns['epoch'])
+
+    @classmethod
+    def load(cls, path: str) -> 'MealSnapshot':
+        """Map a snapshot file; raises ValueError if it is not one"""
+        with open(path, 'rb') as f:
+            preamble = f.read(PREAMBLE.size)
+            if len(preamble) < PREAMBLE.size:
+                raise ValueError(f'{path} is truncated')
+            magic, version, header_size = PREAMBLE.unpack(preamble)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a version {VERSION} meal snapshot')
+            header = json.loads(f.read(header_size))
+
+        columns = {}
+        for name, (dtype, offset, length) in header['columns'].items():
+            if length:
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(length,))
+            else:
+                columns[name] = np.zeros(0, dtype=dtype)
+        return cls(header['seq'], columns)
+
+    def user_range(self, index: int) -> Tuple[int, int]:
+        """Meal rows [start, stop) of the user at `index`"""
+        offsets = self.columns['user_offsets']
+        return int(offsets[index]), int(offsets[index + 1])
+
+    def meals(self, index: int) -> List[Dict]:
+        """Meal records of the user at `index`, oldest first"""
+        return json.loads(self.encoded_meals(index))
+
+    def encoded_meals(self, index: int) -> bytes:
+        """JSON array of the meal records of the user at `index`"""
+        offsets = self.columns['record_offsets']
+        return bytes(self.columns['records'][offsets[index]:offsets[index + 1]])
+
+    def foods(self, start: int, stop: int) -> List[List[str]]:
+        """Food names of each meal in rows [start, stop)"""
+        offsets = self.columns['food_offsets'][start:stop + 1].tolist()
+        ids = self.columns['food_ids'][offsets[0]:offsets[-1]].tolist()
+        base = offsets[0]
+        return [[self.strings[i] for i in ids[a - base:b - base]] for a, b in zip(offsets, offsets[1:])]
+
+    def daily_totals(self) -> List[Tuple[List[int], List[int], List[float], List[float]]]:
+        """Per user, in user order: distinct meal days ascending, with the meals, calories and score of each"""
+        if not len(self):
+            return []
+        columns = self.columns
+        sizes = np.diff(columns['user_offsets'])
+        users = np.repeat(np.arange(len(sizes)), sizes)
+        order = np.lexsort((columns['day'], users))
+        users, days = users[order], columns['day'][order]
+        starts = np.flatnonzero(np.r_[True, (np.diff(users) != 0) | (np.diff(days) != 0)])
+        meals = np.diff(np.r_[starts, len(days)]).tolist()
+        calories = np.add.reduceat(columns['calories'][order], starts).tolist()
+        scores = np.add.reduceat(columns['score'][order], starts).tolist()
+        bounds = np.searchsorted(users[starts], np.arange(len(sizes) + 1)).tolist()
+        days = days[starts].tolist()
+        return [(days[a:b], meals[a:b], calories[a:b], scores[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+    def food_counts(self) -> Dict[str, int]:
+        """Times each food name was logged across all meals"""
+        counts = np.bincount(self.columns['food_ids'], minlength=len(self.strings)).tolist()
+        return {self.strings[i]: count for i, count in enumerate(counts) if count}
+
+    def daily_food_counts(self, first_day: int) -> Dict[int, Dict[str, int]]:
+        """Times each food name was logged per day, for days from `first_day` on"""
+        columns = self.columns
+        days = np.repeat(columns['day'], np.diff(columns['food_offsets']))
+        recent = days >= first_day
+        keys = days[recent].astype(np.int64) * len(self.strings) + columns['food_ids'][recent]
+        keys, counts = np.unique(keys, return_counts=True)
+        result: Dict[int, Dict[str, int]] = {}
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            day, food = divmod(key, len(self.strings))
+            result.setdefault(day, {})[self.strings[food]] = count
+        return result
+
+    @staticmethod
+    def write(path: str, seq: int,
+              histories: Iterable[Union['UserHistory', Tuple[str, Sequence[float], List[Dict]]]]):
+        """Atomically write (user id, meal epochs, meals oldest first) histories to `path`.
+
+        A UserHistory from an earlier snapshot is copied column by column
+        with its records still encoded.
+        """
+        strings: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(strings)
+            return index
+
+        epochs: List[float] = []
+        days: List[int] = []
+        calories: List[float] = []
+        scores: List[float] = []
+        food_offsets = [0]
+        food_ids: List[int] = []
+        user_names: List[int] = []
+        user_offsets = [0]
+        record_offsets = [0]
+        records: List[bytes] = []
+        for history in histories:
+            if isinstance(history, UserHistory):
+                source, index = history.snapshot, history.index
+                start, stop = source.user_range(index)
+                if start == stop:
+                    continue
+                user_names.append(intern(history.user_id))
+                epochs.extend(source.columns['epoch'][start:stop].tolist())
+                days.extend(source.columns['day'][start:stop].tolist())
+                calories.extend(source.columns['calories'][start:stop].tolist())
+                scores.extend(source.columns['score'][start:stop].tolist())
+                for names in source.foods(start, stop):
+                    food_ids.extend(intern(name) for name in names)
+                    food_offsets.append(len(food_ids))
+                user_offsets.append(len(epochs))
+                records.append(history.encoded())
+                record_offsets.append(record_offsets[-1] + len(records[-1]))
+                continue
+
+            user_id, user_epochs, meals = history
+            if not meals:
+                continue
+            user_names.append(intern(user_id))
+            epochs.extend(user_epochs)
+            for meal in meals:
+                days.append(datetime.fromisoformat(meal['timestamp']).toordinal())
+                calories.append(meal['analysis']['nutrition']['calories'])
+                scores.append(meal['analysis']['health_assessment']['meal_score'])
+                food_ids.extend(intern(food['name']) for food in meal.get('foods', []) if food.get('name'))
+                food_offsets.append(len(food_ids))
+            user_offsets.append(len(epochs))
+            records.append(json.dumps(meals, separators=(',', ':')).encode())
+            record_offsets.append(record_offsets[-1] + len(records[-1]))
+
+        encoded = [s.encode() for s in strings]
+        string_offsets = np.cumsum([0] + [len(s) for s in encoded], dtype=np.int64)
+        arrays = {
+            'epoch': np.asarray(epochs, dtype=np.float64),
+            'day': np.asarray(days, dtype=np.int32),
+            'calories': np.asarray(calories, dtype=np.float64),
+            'score': np.asarray(scores, dtype=np.float64),
+            'food_offsets': np.asarray(food_offsets, dtype=np.int64),
+            'food_ids': np.asarray(food_ids, dtype=np.int32),
+            'user_names': np.asarray(user_names, dtype=np.int32),
+            'user_offsets': np.asarray(user_offsets, dtype=np.int64),
+            'record_offsets': np.asarray(record_offsets, dtype=np.int64),
+            'records': np.frombuffer(b''.join(records), dtype=np.uint8),
+            'string_offsets': string_offsets,
+            'strings': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        }
+
+        # Arrays follow the header; grow the header's reserved space until the offsets fit
+        relative, offset = {}, 0
+        for name in MealSnapshot.COLUMNS:
+            offset = _align(offset)
+            relative[name] = offset
+            offset += arrays[name].nbytes
+        data_start = 0
+        while True:
+            layout = {name: [arrays[name].dtype.str, data_start + relative[name], len(arrays[name])]
+                      for name in MealSnapshot.COLUMNS}
+            header = json.dumps({'seq': seq, 'columns': layout}).encode()
+            if _align(PREAMBLE.size + len(header)) <= data_start:
+                break
+            data_start = _align(PREAMBLE.size + len(header))
+
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            for name in MealSnapshot.COLUMNS:
+                f.seek(layout[name][1])
+                f.write(arrays[name].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+class UserHistory:
+    """One user's meals in a MealSnapshot, decoded only when called.
+
+    Calling it returns (epochs, meals oldest first), the loader
+    MealStore.extend_lazy expects.  The snapshot stays mapped while any
+    history refers to it, even after its file is replaced.
+    """
+
+    __slots__ = ('snapshot', 'index')
+
+    def __init__(self, snapshot: MealSnapshot, index: int):
+        self.snapshot = snapshot
+        self.index = index
+
+    @property
+    def user_id(self) -> str:
+        return self.snapshot.users[self.index]
+
+    def __call__(self) -> Tuple[List[float], List[Dict]]:
+        start, stop = self.snapshot.user_range(self.index)
+        return self.snapshot.columns['epoch'][start:stop].tolist(), self.snapshot.meals(self.index)
+
+    def encoded(self) -> bytes:
+        return self.snapshot.encoded_meals(self.index)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
@@ -0,0 +1,331 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Compact a user's history once it holds this many tombstones and they
+# make up more than a quarter of the slots
+COMPACT_MIN_TOMBSTONES = 64
+COMPACT_RATIO = 0.25
+
+
+class _UserMeals:
+    """One user's meals in timestamp order, with parsed epoch seconds alongside.
+
+    Deleted meals leave a tombstone (None) in their slot so that later slots
+    do not shift; `dead` holds the tombstoned slots in sorted order so live
+    counts over a slot range stay O(log n).  Tombstones at the end are
+    trimmed right away and the rest are compacted once they pile up.
+    A history registered lazily keeps its loader in `pending` until `load`.
+    """
+
+    __slots__ = ('epochs', 'meals', 'index', 'dead', 'pending')
+
+    def __init__(self):
+        self.epochs: List[float] = []
+        self.meals: List[Optional[Dict]] = []
+        self.index: Dict[str, int] = {}
+        self.dead: List[int] = []
+        self.pending: Optional[Callable[[], Tuple[List[float], List[Dict]]]] = None
+
+    def load(self):
+        """Decode a lazily registered history"""
+        load, self.pending = self.pending, None
+        epochs, meals = load()
+        self.epochs, self.meals = list(epochs), list(meals)
+        self.index = {meal['id']: slot for slot, meal in enumerate(self.meals)}
+        self.dead = []
+
+    def __len__(self) -> int:
+        return len(self.meals) - len(self.dead)
+
+    def insert(self, epoch: float, meal: Dict) -> int:
+        """Insert a meal keeping timestamp order, returning its slot"""
+        if not self.epochs or epoch >= self.epochs[-1]:
+            self.epochs.append(epoch)
+            self.meals.append(meal)
+            slot = len(self.meals) - 1
+            self.index[meal['id']] = slot
+            return slot
+
+        # Back-dated meal (e.g. replayed from an offline queue): later slots shift
+        slot = bisect_right(self.epochs, epoch)
+        self.epochs.insert(slot, epoch)
+        self.meals.insert(slot, meal)
+        for later in range(slot + 1, len(self.meals)):
+            if self.meals[later] is not None:
+                self.index[self.meals[later]['id']] = later
+        first_dead = bisect_left(self.dead, slot)
+        self.dead[first_dead:] = [d + 1 for d in self.dead[first_dead:]]
+        self.index[meal['id']] = slot
+        return slot
+
+    def get(self, meal_id: str) -> Optional[Dict]:
+        slot = self.index.get(meal_id)
+        return None if slot is None else self.meals[slot]
+
+    def remove(self, meal_id: str) -> Optional[Dict]:
+        """Tombstone a meal by id, returning the removed record"""
+        slot = self.index.pop(meal_id, None)
+        if slot is None:
+            return None
+
+        meal = self.meals[slot]
+        self.meals[slot] = None
+        insort(self.dead, slot)
+
+        # Trailing tombstones can go without disturbing other slots
+        while self.meals and self.meals[-1] is None:
+            self.meals.pop()
+            self.epochs.pop()
+            self.dead.pop()
+
+        if len(self.dead) >= COMPACT_MIN_TOMBSTONES and len(self.dead) > len(self.meals) * COMPACT_RATIO:
+            self.compact()
+        return meal
+
+    def compact(self):
+        """Drop tombstones and rebuild the id index"""
+        live = [(e, m) for e, m in zip(self.epochs, self.meals) if m is not None]
+        self.epochs = [e for e, _ in live]
+        self.meals = [m for _, m in live]
+        self.index = {m['id']: slot for slot, m in enumerate(self.meals)}
+        self.dead = []
+
+    def bounds(self, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+        """Slot range of meals with start <= epoch <= end"""
+        lo = 0 if start is None else bisect_left(self.epochs, start)
+        hi = len(self.epochs) if end is None else bisect_right(self.epochs, end)
+        return lo, max(lo, hi)
+
+    def live_count(self, lo: int, hi: int, where: Optional[Callable[[Dict], bool]] = None) -> int:
+        """Number of live meals in slots [lo, hi), only those matching `where` if given"""
+        if where is not None:
+            return sum(1 for m in self.meals[lo:hi] if m is not None and where(m))
+        return (hi - lo) - (bisect_left(self.dead, hi) - bisect_left(self.dead, lo))
+
+    def live(self, lo: int, hi: int) -> List[Dict]:
+        """Live meals in slots [lo, hi), oldest first"""
+        if bisect_left(self.dead, hi) == bisect_left(self.dead, lo):
+            return self.meals[lo:hi]
+        return [m for m in self.meals[lo:hi] if m is not None]
+
+    def slot_before(self, epoch: float, meal_id: str) -> int:
+        """First slot at or after the (epoch, meal_id) position a keyset cursor points to"""
+        slot = self.index.get(meal_id)
+        if slot is not None and self.epochs[slot] == epoch:
+            return slot
+        return bisect_left(self.epochs, epoch)  # Cursor meal is gone; resume at older timestamps
+
+    def newest_first(self, lo: int, hi: int, offset: int, limit: int,
+                     where: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        """Up to `limit` live meals in [lo, hi), newest first, after skipping `offset`.
+
+        With `where`, only matching meals count and offset is skipped by walking.
+        """
+        stop = hi
+        if offset > 0 and where is None:
+            if self.live_count(lo, hi) <= offset:
+                return []
+            # Highest slot that still has `offset` live meals at or above it
+            low, high = lo, hi
+            while low < high:
+                mid = (low + high + 1) // 2
+                if self.live_count(mid, hi) >= offset:
+                    low = mid
+                else:
+                    high = mid - 1
+            stop = low
+
+        page = []
+        skip = offset if where is not None else 0
+        slot = stop - 1
+        while slot >= lo and len(page) < limit:
+            meal = self.meals[slot]
+            if meal is not None and (where is None or where(meal)):
+                if skip:
+                    skip -= 1
+                else:
+                    page.append(meal)
+            slot -= 1
+        return page
+
+
+class MealStore:
+    """Meal history for every user, kept in timestamp order.
+
+    Each meal's ISO timestamp is parsed once on insert and kept as epoch
+    seconds next to the record, so date filters are bisect slices and
+    "newest N" or a page of history costs O(log n + page).  An id -> slot
+    index makes lookup and delete by meal id constant time.  Histories
+    registered with `extend_lazy` are decoded on the user's first access.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, _UserMeals] = {}
+        self._total = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def __len__(self) -> int:
+        """Total number of meals across all users"""
+        return self._total
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._total = 0
+
+    def users(self) -> List[str]:
+        """Ids of users with stored meals"""
+        return list(self._users)
+
+    def _user(self, user_id: str, create: bool = False) -> Optional[_UserMeals]:
+        """A user's meals, decoded first if they were registered lazily"""
+        user_meals = self._users.get(user_id)
+        if user_meals is None:
+            if create:
+                user_meals = self._users[user_id] = _UserMeals()
+            return user_meals
+        if user_meals.pending is not None:
+            user_meals.load()
+        return user_meals
+
+    def add(self, user_id: str, meal: Dict):
+        """Store a meal record for a user"""
+        epoch = to_epoch(meal['timestamp'])
+        with self._lock:
+            self._user(user_id, create=True).insert(epoch, meal)
+            self._total += 1
+
+    def extend(self, user_id: str, meals: List[Dict]):
+        """Store several meal records for a user"""
+        for meal in meals:
+            self.add(user_id, meal)
+
+    def extend_lazy(self, user_id: str, count: int,
+                    load: Callable[[], Tuple[List[float], List[Dict]]]):
+        """Register a user's `count` meals without decoding them.
+
+        `load()` returns (epochs, meals oldest first) and runs on the user's
+        first access; until then `pending` returns it.  The user must not
+        have meals yet.
+        """
+        with self._lock:
+            self._user(user_id, create=True).pending = load
+            self._total += count
+
+    def pending(self, user_id: str) -> Optional[Callable[[], Tuple[List[float], List[Dict]]]]:
+        """The loader of a user whose lazily registered meals are not decoded yet"""
+        user_meals = self._users.get(user_id)
+        return None if user_meals is None else user_meals.pending
+
+    def get(self, user_id: str, meal_id: str) -> Optional[Dict]:
+        """Find a meal by id"""
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return None
+            return user_meals.get(meal_id)
+
+    def remove(self, user_id: str, meal_id: str) -> Optional[Dict]:
+        """Delete a meal by id, returning the removed record"""
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return None
+            meal = user_meals.remove(meal_id)
+            if meal is not None:
+                self._total -= 1
+            return meal
+
+    def count(self, user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        """Number of a user's meals with start <= timestamp <= end"""
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return 0
+            lo, hi = user_meals.bounds(_epoch_or_none(start), _epoch_or_none(end))
+            return user_meals.live_count(lo, hi)
+
+    def range(self, user_id: str, start: Optional[datetime] = None,
+              end: Optional[datetime] = None) -> List[Dict]:
+        """A user's meals with start <= timestamp <= end, oldest first"""
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return []
+            lo, hi = user_meals.bounds(_epoch_or_none(start), _epoch_or_none(end))
+            return user_meals.live(lo, hi)
+
+    def epochs(self, user_id: str, start: Optional[datetime] = None,
+               end: Optional[datetime] = None) -> List[float]:
+        """Epoch timestamps of a user's meals in a range, oldest first"""
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return []
+            lo, hi = user_meals.bounds(_epoch_or_none(start), _epoch_or_none(end))
+            return [e for e, m in zip(user_meals.epochs[lo:hi], user_meals.meals[lo:hi])
+                    if m is not None]
+
+    def newest(self, user_id: str, limit: int) -> List[Dict]:
+        """A user's most recent meals, newest first"""
+        return self.page(user_id, 0, limit)[0]
+
+    def page(self, user_id: str, offset: int, limit: int, start: Optional[datetime] = None,
+             end: Optional[datetime] = None,
+             where: Optional[Callable[[Dict], bool]] = None) -> Tuple[List[Dict], int]:
+        """A page of a user's meals in a range, newest first, plus the range size.
+
+        `where` keeps only meals it returns True for; the page and the size
+        then cost a walk over the range.
+        """
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return [], 0
+            lo, hi = user_meals.bounds(_epoch_or_none(start), _epoch_or_none(end))
+            total = user_meals.live_count(lo, hi, where)
+            return user_meals.newest_first(lo, hi, max(0, offset), max(0, limit), where), total
+
+    def page_before(self, user_id: str, before: Tuple[float, str], limit: int,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    where: Optional[Callable[[Dict], bool]] = None) -> Tuple[List[Dict], int]:
+        """Keyset page: meals older than the `before` (epoch, meal id) cursor, newest first, plus the range size"""
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None:
+                return [], 0
+            lo, hi = user_meals.bounds(_epoch_or_none(start), _epoch_or_none(end))
+            total = user_meals.live_count(lo, hi, where)
+            hi = max(lo, min(hi, user_meals.slot_before(*before)))
+            return user_meals.newest_first(lo, hi, 0, max(0, limit), where), total
+
+    def latest_epoch(self, user_id: str) -> Optional[float]:
+        """Epoch of a user's most recent meal"""
+        # Trailing tombstones are trimmed on delete, so the last slot is live
+        with self._lock:
+            user_meals = self._user(user_id)
+            if user_meals is None or not user_meals.epochs:
+                return None
+            return user_meals.epochs[-1]
+
+    def iter_meals(self) -> Iterator[Dict]:
+        """Every stored meal, user by user"""
+        for user_id in self.users():
+            yield from self.range(user_id)
+
+
+def to_epoch(timestamp) -> float:
+    """Epoch seconds for an ISO timestamp string or datetime"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+
+def _epoch_or_none(value: Optional[datetime]) -> Optional[float]:
+    return None if value is None else to_epoch(value)
@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesces single-row predictions from concurrent threads into batched calls.
+
+    Callers submit one feature row and get a Future.  A scheduler thread
+    takes the first queued row, keeps collecting until `max_batch` rows
+    are waiting or `max_wait` seconds have passed since that first row was
+    queued, then makes one `predict_fn` call on the stacked rows and
+    resolves each caller's future with its row of the result.  A failing
+    batch fails every future in it.
+
+    `metrics` reports batch sizes, how long rows waited in the queue and
+    why each batch was flushed ('size', 'timeout' or 'shutdown').
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_batch: int = 32,
+                 max_wait: float = 0.0005):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: 'queue.Queue[Optional[Tuple[np.ndarray, Future, float]]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._batches = 0
+        self._rows = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._flush_reasons = {'size': 0, 'timeout': 0, 'shutdown': 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, row: np.ndarray) -> Future:
+        """Queue one feature row for the next batch"""
+        if self._thread is None:
+            self._start()
+        future: Future = Future()
+        self._queue.put((np.asarray(row), future, time.perf_counter()))
+        return future
+
+    def predict(self, row: np.ndarray, timeout: Optional[float] = None):
+        """Prediction for one row, blocking until its batch has run"""
+        return self.submit(row).result(timeout)
+
+    def close(self):
+        """Flush what is queued and stop the scheduler thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': round(self._rows / self._batches, 2) if self._batches else 0,
+                'batch_sizes': dict(sorted(self._batch_sizes.items())),
+                'flush_reasons': dict(self._flush_reasons),
+                'queue_wait_us': {
+                    'mean': round(self._wait_total / self._rows * 1e6, 1) if self._rows else 0,
+                    'max': round(self._wait_max * 1e6, 1),
+                },
+            }
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            reason = 'size'
+            deadline = first[2] + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    reason = 'timeout'
+                    break
+                if item is None:
+                    self._flush(batch, 'shutdown')
+                    return
+                batch.append(item)
+            self._flush(batch, reason)
+
+    def _flush(self, batch: List[Tuple[np.ndarray, Future, float]], reason: str):
+        started = time.perf_counter()
+        waits = [started - queued for _, _, queued in batch]
+        with self._lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._flush_reasons[reason] += 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+        try:
+            results = self.predict_fn(np.vstack([row for row, _, _ in batch]))
+        except Exception as error:
+            for _, future, _ in batch:
+                future.set_exception(error)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,72 @@
+import numpy as np
+from scipy import sparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats', 'fiber')
+
+
+class NutrientMatrix:
+    """Food catalogue held as a contiguous float32 matrix of foods x nutrients.
+
+    Row ids follow the catalogue order and one extra row at the end holds the
+    fallback nutrition used for foods that are not in the catalogue.  A meal
+    is a gather of rows plus a quantity-weighted sum, and a batch of meals is
+    a single sparse (meals x foods) matrix product.
+    """
+
+    def __init__(self, foods: Dict[str, Dict], default: Optional[Dict] = None,
+                 nutrients: Sequence[str] = NUTRIENTS):
+        self.nutrients = tuple(nutrients)
+        self.row_ids: Dict[str, int] = {}
+
+        rows = []
+        for name, values in foods.items():
+            self.row_ids[name] = len(rows)
+            rows.append([values.get(n, 0) for n in self.nutrients])
+        rows.append([(default or {}).get(n, 0) for n in self.nutrients])
+
+        self.matrix = np.ascontiguousarray(rows, dtype=np.float32)
+        self.matrix.setflags(write=False)
+        self.default_row = len(rows) - 1
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def row(self, name: Optional[str]) -> int:
+        """Row id for a catalogue key, or the fallback row"""
+        if name is None:
+            return self.default_row
+        return self.row_ids.get(name, self.default_row)
+
+    def rows(self, names: Sequence[Optional[str]]) -> np.ndarray:
+        """Row ids for a sequence of catalogue keys"""
+        return np.fromiter((self.row(name) for name in names), dtype=np.intp, count=len(names))
+
+    def item_nutrition(self, rows: np.ndarray, quantities: Sequence[float]) -> np.ndarray:
+        """Per-item nutrition, one row per food item"""
+        return self.matrix[rows] * np.asarray(quantities, dtype=np.float32)[:, None]
+
+    def meal_totals(self, rows: np.ndarray, quantities: Sequence[float]) -> np.ndarray:
+        """Nutrient totals for one meal"""
+        return np.asarray(quantities, dtype=np.float32) @ self.matrix[rows]
+
+    def batch_totals(self, meals: List[Tuple[np.ndarray, Sequence[float]]]) -> np.ndarray:
+        """Nutrient totals for many meals, one row per meal"""
+        if not meals:
+            return np.zeros((0, len(self.nutrients)), dtype=np.float32)
+
+        lengths = [len(rows) for rows, _ in meals]
+        meal_ids = np.repeat(np.arange(len(meals)), lengths)
+        food_ids = np.concatenate([np.asarray(rows, dtype=np.intp) for rows, _ in meals])
+        weights = np.concatenate([np.asarray(q, dtype=np.float32) for _, q in meals])
+
+        # Duplicate (meal, food) pairs are summed by the COO -> CSR conversion
+        quantities = sparse.csr_matrix((weights, (meal_ids, food_ids)),
+                                       shape=(len(meals), self.matrix.shape[0]))
+        return np.asarray(quantities @ self.matrix, dtype=np.float32)
+
+    def as_dict(self, values: np.ndarray, ndigits: Optional[int] = None) -> Dict[str, float]:
+        """Convert a nutrient vector back to a name -> value dict"""
+        if ndigits is None:
+            return {n: float(v) for n, v in zip(self.nutrients, values)}
+        return {n: round(float(v), ndigits) for n, v in zip(self.nutrients, values)}
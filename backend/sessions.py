@@ -0,0 +1,190 @@
+import heapq
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+
+class SessionBackend(ABC):
+    """Where session records live.
+
+    A record is a dict with `user_id`, `user_agent` and epoch-second
+    `created` and `expires` floats.  An implementation shared by every
+    worker makes a login on one worker valid on all of them.
+    """
+
+    @abstractmethod
+    def put(self, token: str, session: Dict):
+        """Store a session record"""
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[Dict]:
+        """Session record for a token, expired or not"""
+
+    @abstractmethod
+    def delete(self, token: str) -> bool:
+        """Remove a session, returning whether it existed"""
+
+    @abstractmethod
+    def user_tokens(self, user_id: str) -> List[str]:
+        """A user's session tokens, oldest first"""
+
+    @abstractmethod
+    def delete_expired(self, now: float) -> int:
+        """Remove every session that expired at or before `now`, returning how many"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every session"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored sessions"""
+
+
+class InMemorySessionBackend(SessionBackend):
+    """Sessions in a process-local dict, with a min-heap of expiry times.
+
+    Sweeping pops the heap while its head has expired, so the cost is
+    proportional to the number of expired sessions.  Entries left behind
+    by logouts are skipped when popped and dropped when the heap is rebuilt.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict] = {}
+        self._by_user: Dict[str, Dict[str, None]] = {}  # Insertion-ordered token sets
+        self._expiry: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def put(self, token: str, session: Dict):
+        with self._lock:
+            self._sessions[token] = session
+            self._by_user.setdefault(session['user_id'], {})[token] = None
+            heapq.heappush(self._expiry, (session['expires'], token))
+            if len(self._expiry) > 2 * len(self._sessions) + 64:
+                self._expiry = [(s['expires'], t) for t, s in self._sessions.items()]
+                heapq.heapify(self._expiry)
+
+    def get(self, token: str) -> Optional[Dict]:
+        return self._sessions.get(token)
+
+    def delete(self, token: str) -> bool:
+        with self._lock:
+            return self._delete(token)
+
+    def _delete(self, token: str) -> bool:
+        session = self._sessions.pop(token, None)
+        if session is None:
+            return False
+        tokens = self._by_user.get(session['user_id'])
+        if tokens is not None:
+            tokens.pop(token, None)
+            if not tokens:
+                del self._by_user[session['user_id']]
+        return True
+
+    def user_tokens(self, user_id: str) -> List[str]:
+        with self._lock:
+            return list(self._by_user.get(user_id, ()))
+
+    def delete_expired(self, now: float) -> int:
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires, token = heapq.heappop(self._expiry)
+                session = self._sessions.get(token)
+                if session is not None and session['expires'] == expires:
+                    self._delete(token)
+                    removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._by_user.clear()
+            self._expiry.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SessionStore:
+    """Session tokens with epoch expiry, a per-user cap and periodic sweeping.
+
+    Expired sessions are rejected on lookup and removed in bulk at most
+    once per `sweep_interval` seconds, either lazily by the request that
+    notices the interval has passed or by `start_sweeper`'s thread.
+    """
+
+    def __init__(self, backend: Optional[SessionBackend] = None, ttl: float = 7 * 24 * 3600,
+                 max_per_user: int = 10, sweep_interval: float = 60.0):
+        self.backend = backend if backend is not None else InMemorySessionBackend()
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._sweeper: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def clear(self):
+        self.backend.clear()
+
+    def create(self, user_id: str, user_agent: str = '') -> Tuple[str, float]:
+        """Open a session for a user, returning (token, expiry epoch)"""
+        now = time.time()
+        self.maybe_sweep(now)
+
+        token = str(uuid.uuid4())
+        expires = now + self.ttl
+        self.backend.put(token, {
+            'user_id': user_id,
+            'created': now,
+            'expires': expires,
+            'user_agent': user_agent
+        })
+
+        # Over the cap, the oldest sessions are signed out
+        tokens = self.backend.user_tokens(user_id)
+        for old_token in tokens[:max(0, len(tokens) - self.max_per_user)]:
+            self.backend.delete(old_token)
+        return token, expires
+
+    def user_id(self, token: str) -> Optional[str]:
+        """User id for a live session token"""
+        now = time.time()
+        self.maybe_sweep(now)
+        session = self.backend.get(token)
+        if session is None:
+            return None
+        if session['expires'] <= now:
+            self.backend.delete(token)
+            return None
+        return session['user_id']
+
+    def revoke(self, token: str) -> bool:
+        """End a session"""
+        return self.backend.delete(token)
+
+    def maybe_sweep(self, now: Optional[float] = None) -> int:
+        """Sweep expired sessions if the sweep interval has passed"""
+        now = time.time() if now is None else now
+        if now < self._next_sweep:
+            return 0
+        self._next_sweep = now + self.sweep_interval
+        return self.backend.delete_expired(now)
+
+    def start_sweeper(self):
+        """Sweep from a daemon thread every `sweep_interval` seconds"""
+        if self._sweeper is not None:
+            return
+
+        def sweep_forever():
+            while True:
+                time.sleep(self.sweep_interval)
+                self.maybe_sweep()
+
+        self._sweeper = threading.Thread(target=sweep_forever, name='session-sweeper', daemon=True)
+        self._sweeper.start()
@@ -0,0 +1,354 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, inspect, text, update
+from sqlalchemy.exc import IntegrityError
+
+from database import NutritionLog, StateChange, StateRecord, StateSequence, User, db
+from storage import Change, StorageBackend, record_expires
+
+# Profile fields with their own columns on User
+USER_COLUMNS = ('age', 'weight', 'height', 'gender', 'goal', 'activity_level')
+NUTRIENT_COLUMNS = ('calories', 'protein', 'carbs', 'fats', 'fiber')
+
+
+def engine_options(uri: str, pool_size: int = 5, max_overflow: int = 10,
+                   pool_timeout: float = 30, pool_recycle: int = 1800) -> Dict:
+    """SQLALCHEMY_ENGINE_OPTIONS with a sized, self-healing connection pool"""
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        return {}  # In-memory SQLite lives on a single connection
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,  # Drop connections before server-side idle timeouts
+        'pool_pre_ping': True,
+    }
+
+
+class SQLAlchemyBackend(StorageBackend):
+    """StorageBackend on the SQLAlchemy models in database.py.
+
+    Users map to `users` rows and each meal to one `nutrition_logs` row per
+    food item, written with a single bulk insert per batch; the full meal
+    record rides along as JSON on its first row.  Other namespaces
+    (sessions) use `state_records`, and the change feed is `state_changes`.
+    Reads never walk the User relationships: meal rows are fetched with one
+    query keyed on `meal_id` or on the `(user_id, timestamp)` index.
+
+    Sequence numbers come from the single `state_sequence` row, bumped in
+    the writing transaction.  Its row lock is held until commit, so changes
+    become visible in sequence order and a reader that has seen seq N has
+    seen every change before it.  An autoincrement key would not do: on
+    Postgres or MySQL a lower value can commit after a higher one, and
+    readers past it would never apply that change.
+
+    Databases created by an earlier schema get the missing columns and
+    indexes on startup.  Their old `nutrition_logs` rows carry no meal
+    record and are not read as meals.  Reading every meal streams the rows,
+    but it is still a full table scan: set NUTRIAI_MEAL_SNAPSHOT so workers
+    start from the meal snapshot instead.
+    """
+
+    def __init__(self, app, uri: str, max_changes: int = 100000, **pool):
+        app.config['SQLALCHEMY_DATABASE_URI'] = uri
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri, **pool)
+        self.app = app
+        self.max_changes = max_changes
+        self._user_pks: Dict[str, int] = {}
+        self._writes = 0
+
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            self._migrate()
+            self._init_sequence()
+
+    def _migrate(self):
+        """Add columns and indexes that create_all leaves out of tables made by an older schema"""
+        inspector = inspect(db.engine)
+        added = set()
+        with db.engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} '
+                                          f'{column.type.compile(dialect=db.engine.dialect)}'))
+                        added.add((table.name, column.name))
+                indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in indexes:
+                        index.create(conn)
+
+        if ('state_records', 'expires') in added:
+            for row in StateRecord.query.all():
+                row.expires = record_expires(json.loads(row.value))
+        if ('users', 'public_id') in added:
+            for row in User.query.all():
+                row.public_id = uuid.uuid4().hex
+        db.session.commit()
+
+    def _init_sequence(self):
+        if db.session.get(StateSequence, 1) is not None:
+            return
+        latest = db.session.query(func.max(StateChange.seq)).scalar() or 0
+        db.session.add(StateSequence(id=1, seq=latest))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Another worker created it first
+
+    # Users
+
+    def _user_pk(self, public_id: str) -> Optional[int]:
+        pk = self._user_pks.get(public_id)
+        if pk is None:
+            pk = db.session.query(User.id).filter_by(public_id=public_id).scalar()
+            if pk is not None:
+                self._user_pks[public_id] = pk
+        return pk
+
+    @staticmethod
+    def _user_to_dict(row: User) -> Dict:
+        user = json.loads(row.data or '{}')
+        user.update({
+            'id': row.public_id,
+            'email': row.email,
+            'name': row.name,
+            'password_hash': row.password_hash,
+        })
+        profile = user.setdefault('profile', {})
+        for column in USER_COLUMNS:
+            value = getattr(row, column)
+            if value is not None:
+                profile[column] = value
+        return user
+
+    @staticmethod
+    def _user_from_dict(row: User, user: Dict):
+        profile = user.get('profile', {})
+        row.email = user['email']
+        row.username = user['email']
+        row.name = user.get('name')
+        row.password_hash = user.get('password_hash', '')
+        for column in USER_COLUMNS:
+            setattr(row, column, profile.get(column))
+        extra = {k: v for k, v in user.items() if k not in ('id', 'email', 'name', 'password_hash')}
+        extra['profile'] = {k: v for k, v in profile.items() if k not in USER_COLUMNS}
+        row.data = json.dumps(extra)
+
+    # Meals
+
+    def _meal_rows(self, user_pk: int, meal: Dict) -> List[Dict]:
+        timestamp = datetime.fromisoformat(meal['timestamp'])
+        record = {k: v for k, v in meal.items() if k != 'foods'}
+        rows = []
+        for index, food in enumerate(meal.get('foods') or [{}]):
+            nutrition = food.get('nutrition', {})
+            row = {
+                'user_id': user_pk,
+                'meal_id': meal['id'],
+                'item_index': index,
+                'meal_type': meal.get('meal_type'),
+                'food_item': food.get('name', ''),
+                'quantity': food.get('quantity'),
+                'unit': food.get('unit'),
+                'timestamp': timestamp,
+                'meal_data': json.dumps(record) if index == 0 else None,
+            }
+            row.update({n: nutrition.get(n) for n in NUTRIENT_COLUMNS})
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _meal_from_rows(rows: List[NutritionLog]) -> Dict:
+        meal = json.loads(rows[0].meal_data)
+        meal['foods'] = [] if not rows[0].food_item else [{
+            'name': row.food_item,
+            'quantity': row.quantity,
+            'unit': row.unit,
+            'nutrition': {n: getattr(row, n) for n in NUTRIENT_COLUMNS}
+        } for row in rows]
+        return meal
+
+    # StorageBackend
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        with self.app.app_context():
+            if namespace == 'users':
+                row = User.query.filter_by(public_id=key).first()
+                return None if row is None else self._user_to_dict(row)
+            if namespace == 'meals':
+                rows = (NutritionLog.query.filter_by(meal_id=key.split('/', 1)[1])
+                        .order_by(NutritionLog.item_index).all())
+                return self._meal_from_rows(rows) if rows else None
+            row = db.session.get(StateRecord, (namespace, key))
+            return None if row is None else json.loads(row.value)
+
+    def put(self, namespace: str, key: str, value: Dict):
+        self.put_many(namespace, {key: value})
+
+    def put_many(self, namespace: str, records: Dict[str, Dict]):
+        if not records:
+            return
+        with self.app.app_context():
+            if namespace == 'users':
+                for key, user in records.items():
+                    row = User.query.filter_by(public_id=key).first() or User(public_id=key)
+                    self._user_from_dict(row, user)
+                    db.session.add(row)
+            elif namespace == 'meals':
+                rows = []
+                for key, meal in records.items():
+                    user_pk = self._user_pk(key.split('/', 1)[0])
+                    if user_pk is None:
+                        raise KeyError(f'Unknown user for meal {key}')
+                    rows.extend(self._meal_rows(user_pk, meal))
+                db.session.execute(delete(NutritionLog).where(
+                    NutritionLog.meal_id.in_([meal['id'] for meal in records.values()])))
+                db.session.execute(insert(NutritionLog), rows)
+            else:
+                for key, value in records.items():
+                    db.session.merge(StateRecord(namespace=namespace, key=key, value=json.dumps(value),
+                                                 expires=record_expires(value)))
+            self._commit([(namespace, key) for key in records])
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self.app.app_context():
+            if namespace == 'users':
+                pk = self._user_pk(key)
+                NutritionLog.query.filter_by(user_id=pk).delete()
+                deleted = User.query.filter_by(public_id=key).delete()
+                self._user_pks.pop(key, None)
+            elif namespace == 'meals':
+                deleted = NutritionLog.query.filter_by(meal_id=key.split('/', 1)[1]).delete()
+            else:
+                deleted = StateRecord.query.filter_by(namespace=namespace, key=key).delete()
+            if not deleted:
+                db.session.rollback()
+                return False
+            self._commit([(namespace, key)])
+            return True
+
+    @staticmethod
+    def _allocate(count: int) -> int:
+        """Reserve `count` sequence numbers in this transaction, returning the last.
+
+        The UPDATE locks the counter row until commit, so writers hand out
+        numbers and commit them one transaction at a time.
+        """
+        db.session.execute(update(StateSequence).where(StateSequence.id == 1)
+                           .values(seq=StateSequence.seq + count))
+        return db.session.query(StateSequence.seq).filter_by(id=1).scalar()
+
+    @staticmethod
+    def _latest() -> int:
+        return db.session.query(StateSequence.seq).filter_by(id=1).scalar() or 0
+
+    def _commit(self, changes: List[Change]):
+        if changes:
+            last = self._allocate(len(changes))
+            first = last - len(changes) + 1
+            db.session.execute(insert(StateChange), [{'seq': first + i, 'namespace': n, 'key': k}
+                                                     for i, (n, k) in enumerate(changes)])
+        db.session.commit()
+
+        self._writes += len(changes)
+        if self._writes >= max(1, self.max_changes // 10):
+            self._writes = 0
+            StateChange.query.filter(StateChange.seq <= self._latest() - self.max_changes).delete()
+            db.session.commit()
+
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        with self.app.app_context():
+            if namespace == 'users':
+                return [(row.public_id, self._user_to_dict(row))
+                        for row in User.query.filter(User.public_id.isnot(None)).all()]
+            if namespace == 'meals':
+                return list(self.iter_items(namespace))
+            return [(row.key, json.loads(row.value))
+                    for row in StateRecord.query.filter_by(namespace=namespace).all()]
+
+    def iter_items(self, namespace: str) -> Iterator[Tuple[str, Dict]]:
+        if namespace != 'meals':
+            yield from self.items(namespace)
+            return
+        with self.app.app_context():
+            # One ordered query over every item row, fetched in batches and grouped here into meals
+            rows = (db.session.query(NutritionLog, User.public_id)
+                    .join(User, User.id == NutritionLog.user_id)
+                    .filter(NutritionLog.meal_id.isnot(None))
+                    .order_by(NutritionLog.user_id, NutritionLog.timestamp,
+                              NutritionLog.meal_id, NutritionLog.item_index)
+                    .yield_per(1000))
+            current: List[NutritionLog] = []
+            owner = None
+            for row, public_id in rows:
+                if current and row.meal_id != current[0].meal_id:
+                    yield f'{owner}/{current[0].meal_id}', self._meal_from_rows(current)
+                    current = []
+                current.append(row)
+                owner = public_id
+            if current:
+                yield f'{owner}/{current[0].meal_id}', self._meal_from_rows(current)
+
+    def count(self, namespace: str) -> int:
+        with self.app.app_context():
+            if namespace == 'users':
+                return db.session.query(func.count(User.id)).scalar()
+            if namespace == 'meals':
+                return db.session.query(func.count(func.distinct(NutritionLog.meal_id))).scalar()
+            return StateRecord.query.filter_by(namespace=namespace).count()
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        with self.app.app_context():
+            if namespace in ('users', 'meals'):
+                return []
+            rows = (db.session.query(StateRecord.key)
+                    .filter(StateRecord.namespace == namespace, StateRecord.expires <= now).all())
+            return [key for key, in rows]
+
+    def sequence(self) -> int:
+        with self.app.app_context():
+            return self._latest()
+
+    def changes_since(self, seq: int) -> Tuple[Optional[List[Change]], int]:
+        with self.app.app_context():
+            # Every change up to the committed counter has committed with it
+            latest = self._latest()
+            oldest = db.session.query(func.min(StateChange.seq)).scalar()
+            if seq > latest or (seq < latest and (oldest is None or oldest > seq + 1)):
+                return None, latest
+            rows = (db.session.query(StateChange.namespace, StateChange.key)
+                    .filter(StateChange.seq > seq, StateChange.seq <= latest)
+                    .order_by(StateChange.seq).all())
+            return [(namespace, key) for namespace, key in rows], latest
+
+    def clear(self, namespace: Optional[str] = None):
+        with self.app.app_context():
+            if namespace is None:
+                for model in (NutritionLog, User, StateRecord, StateChange):
+                    model.query.delete()
+                # Readers at any earlier sequence see a gap and reload
+                self._allocate(1)
+                db.session.commit()
+                self._user_pks.clear()
+                return
+
+            changes = [(namespace, key) for key, _ in self.items(namespace)]
+            if namespace == 'users':
+                rows = (db.session.query(User.public_id, NutritionLog.meal_id).distinct()
+                        .join(User, User.id == NutritionLog.user_id)
+                        .filter(NutritionLog.meal_id.isnot(None)))
+                changes += [('meals', f'{public_id}/{meal_id}') for public_id, meal_id in rows]
+                NutritionLog.query.delete()
+                User.query.delete()
+                self._user_pks.clear()
+            elif namespace == 'meals':
+                NutritionLog.query.delete()
+            else:
+                StateRecord.query.filter_by(namespace=namespace).delete()
+            self._commit(changes)
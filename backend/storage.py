@@ -0,0 +1,667 @@
+import argparse
+import heapq
+import http.client
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from sessions import SessionBackend
+
+# A change feed entry: (namespace, key) of a record that was written or deleted
+Change = Tuple[str, str]
+
+
+def record_expires(value: Dict) -> Optional[float]:
+    """A record's `expires` epoch, if it has one"""
+    expires = value.get('expires')
+    return expires if isinstance(expires, (int, float)) else None
+
+
+class StorageBackend(ABC):
+    """JSON records grouped by namespace, plus a feed of changes.
+
+    Every put or delete appends to the change feed under a new sequence
+    number.  Workers poll the feed with `changes_since` to find out which of
+    their cached or derived records another worker has touched.
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        """A record, or None"""
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Dict):
+        """Insert or replace a record"""
+
+    def put_many(self, namespace: str, records: Dict[str, Dict]):
+        """Insert or replace several records"""
+        for key, value in records.items():
+            self.put(namespace, key, value)
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        """Remove a record, returning whether it existed"""
+
+    @abstractmethod
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        """Every (key, record) pair in a namespace"""
+
+    def iter_items(self, namespace: str) -> Iterator[Tuple[str, Dict]]:
+        """Every (key, record) pair in a namespace, for backends that can stream them"""
+        return iter(self.items(namespace))
+
+    @abstractmethod
+    def count(self, namespace: str) -> int:
+        """Number of records in a namespace"""
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        """Keys of records whose `expires` epoch is at or before `now`.
+
+        This default scans the namespace; the backends below index expiry
+        times so the cost follows the number of expired records.
+        """
+        return [key for key, value in self.items(namespace)
+                if record_expires(value) is not None and record_expires(value) <= now]
+
+    @abstractmethod
+    def sequence(self) -> int:
+        """Sequence number of the latest change"""
+
+    @abstractmethod
+    def changes_since(self, seq: int) -> Tuple[Optional[List[Change]], int]:
+        """Changes after `seq` and the latest sequence number.
+
+        The change list is None when changes after `seq` have already been
+        trimmed from the feed; the caller must then reload from scratch.
+        """
+
+    @abstractmethod
+    def clear(self, namespace: Optional[str] = None):
+        """Remove every record in a namespace, or everything"""
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local storage for a single worker, tests and development"""
+
+    def __init__(self, max_changes: int = 100000):
+        self.max_changes = max_changes
+        self._records: Dict[str, Dict[str, Dict]] = {}
+        self._changes: List[Change] = []
+        self._first_seq = 1  # Sequence number of _changes[0]
+        self._expiry: Dict[str, List[Tuple[float, str]]] = {}  # Min-heaps of (expires, key)
+        self._lock = threading.RLock()
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        return self._records.get(namespace, {}).get(key)
+
+    def put(self, namespace: str, key: str, value: Dict):
+        with self._lock:
+            self._records.setdefault(namespace, {})[key] = value
+            if record_expires(value) is not None:
+                heapq.heappush(self._expiry.setdefault(namespace, []), (record_expires(value), key))
+            self._record_change(namespace, key)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            if self._records.get(namespace, {}).pop(key, None) is None:
+                return False
+            self._record_change(namespace, key)
+            return True
+
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return list(self._records.get(namespace, {}).items())
+
+    def count(self, namespace: str) -> int:
+        return len(self._records.get(namespace, {}))
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        # Entries for records since deleted or rewritten are dropped; live ones go back
+        with self._lock:
+            heap = self._expiry.get(namespace, [])
+            records = self._records.get(namespace, {})
+            due: Dict[str, float] = {}
+            while heap and heap[0][0] <= now:
+                expires, key = heapq.heappop(heap)
+                if key in records and record_expires(records[key]) == expires:
+                    due[key] = expires
+            for key, expires in due.items():
+                heapq.heappush(heap, (expires, key))
+            return list(due)
+
+    def sequence(self) -> int:
+        return self._first_seq + len(self._changes) - 1
+
+    def changes_since(self, seq: int) -> Tuple[Optional[List[Change]], int]:
+        with self._lock:
+            latest = self.sequence()
+            if seq >= latest:
+                return ([], latest) if seq == latest else (None, latest)
+            if seq + 1 < self._first_seq:
+                return None, latest
+            return self._changes[seq + 1 - self._first_seq:], latest
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            if namespace is None:
+                self._records.clear()
+                self._expiry.clear()
+                self._first_seq += len(self._changes) + 1  # Invalidate every reader
+                self._changes = []
+            else:
+                self._expiry.pop(namespace, None)
+                for key in list(self._records.pop(namespace, {})):
+                    self._record_change(namespace, key)
+
+    def _record_change(self, namespace: str, key: str):
+        self._changes.append((namespace, key))
+        if len(self._changes) > self.max_changes:
+            trim = len(self._changes) // 2
+            del self._changes[:trim]
+            self._first_seq += trim
+
+
+class SQLiteBackend(StorageBackend):
+    """Storage in one SQLite file in WAL mode, shared by every worker on the host.
+
+    WAL lets readers in all workers proceed while one writer commits.  Each
+    thread of each process opens its own connection, so the backend can be
+    created before gunicorn forks.  The change feed is a table with an
+    autoincrement key and is trimmed to roughly `max_changes` rows.  A
+    record's `expires` field is copied to an indexed column for `expired`.
+    """
+
+    def __init__(self, path: str, max_changes: int = 100000, timeout: float = 30.0):
+        self.path = path
+        self.max_changes = max_changes
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS records (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires REAL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL
+                );
+            """)
+            # Files created before the expires column get it, filled from the stored JSON
+            conn.execute('BEGIN IMMEDIATE')
+            if 'expires' not in [row[1] for row in conn.execute('PRAGMA table_info(records)')]:
+                conn.execute('ALTER TABLE records ADD COLUMN expires REAL')
+                conn.execute("UPDATE records SET expires = json_extract(value, '$.expires')")
+            conn.execute('CREATE INDEX IF NOT EXISTS records_expiry ON records (namespace, expires) '
+                         'WHERE expires IS NOT NULL')
+            conn.execute('COMMIT')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, statements: Sequence[Tuple[str, Sequence]], changes: Sequence[Change]):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.executemany('INSERT INTO changes (namespace, key) VALUES (?, ?)', changes)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._writes += len(changes)
+        if self._writes >= max(1, self.max_changes // 10):
+            self._writes = 0
+            conn.execute('DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?',
+                         (self.max_changes,))
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            'SELECT value FROM records WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, namespace: str, key: str, value: Dict):
+        self.put_many(namespace, {key: value})
+
+    def put_many(self, namespace: str, records: Dict[str, Dict]):
+        if not records:
+            return
+        self._write([('INSERT OR REPLACE INTO records (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                      (namespace, key, json.dumps(value), record_expires(value)))
+                     for key, value in records.items()],
+                    [(namespace, key) for key in records])
+
+    def delete(self, namespace: str, key: str) -> bool:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            deleted = conn.execute('DELETE FROM records WHERE namespace = ? AND key = ?',
+                                   (namespace, key)).rowcount
+            if deleted:
+                conn.execute('INSERT INTO changes (namespace, key) VALUES (?, ?)', (namespace, key))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return bool(deleted)
+
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        rows = self._connection().execute(
+            'SELECT key, value FROM records WHERE namespace = ?', (namespace,)).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def count(self, namespace: str) -> int:
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM records WHERE namespace = ?', (namespace,)).fetchone()[0]
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        rows = self._connection().execute(
+            'SELECT key FROM records WHERE namespace = ? AND expires <= ?', (namespace, now)).fetchall()
+        return [key for key, in rows]
+
+    def sequence(self) -> int:
+        row = self._connection().execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq: int) -> Tuple[Optional[List[Change]], int]:
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            latest = self.sequence()
+            oldest = conn.execute('SELECT MIN(seq) FROM changes').fetchone()[0]
+            if seq > latest or (seq < latest and (oldest is None or oldest > seq + 1)):
+                return None, latest
+            rows = conn.execute('SELECT namespace, key FROM changes WHERE seq > ? AND seq <= ? ORDER BY seq',
+                                (seq, latest)).fetchall()
+            return [(namespace, key) for namespace, key in rows], latest
+        finally:
+            conn.execute('COMMIT')
+
+    def clear(self, namespace: Optional[str] = None):
+        if namespace is None:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM records')
+            conn.execute('DELETE FROM changes')
+            # Readers at any earlier sequence see a gap and reload
+            conn.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'changes'")
+            conn.execute('COMMIT')
+            return
+
+        keys = [key for key, _ in self.items(namespace)]
+        self._write([('DELETE FROM records WHERE namespace = ?', (namespace,))],
+                    [(namespace, key) for key in keys])
+
+
+class ServiceBackend(StorageBackend):
+    """Storage served by a local state service, reached through `client`.
+
+    The client needs a single method, ``call(method, *args)``, that runs the
+    named StorageBackend method on the service and returns its JSON-decoded
+    result.  HTTPClient talks to a StorageService, started with
+    `python storage.py serve`; tests swap in LocalClient to run the backend
+    in-process.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        return self.client.call('get', namespace, key)
+
+    def put(self, namespace: str, key: str, value: Dict):
+        self.client.call('put', namespace, key, value)
+
+    def put_many(self, namespace: str, records: Dict[str, Dict]):
+        self.client.call('put_many', namespace, records)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        return self.client.call('delete', namespace, key)
+
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        return [(key, value) for key, value in self.client.call('items', namespace)]
+
+    def count(self, namespace: str) -> int:
+        return self.client.call('count', namespace)
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        return self.client.call('expired', namespace, now)
+
+    def sequence(self) -> int:
+        return self.client.call('sequence')
+
+    def changes_since(self, seq: int) -> Tuple[Optional[List[Change]], int]:
+        changes, latest = self.client.call('changes_since', seq)
+        if changes is None:
+            return None, latest
+        return [(namespace, key) for namespace, key in changes], latest
+
+    def clear(self, namespace: Optional[str] = None):
+        self.client.call('clear', namespace)
+
+
+class LocalClient:
+    """ServiceBackend client that calls a backend in this process through a JSON round trip"""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    def call(self, method: str, *args) -> Any:
+        args = json.loads(json.dumps(args))
+        return json.loads(json.dumps(getattr(self.backend, method)(*args)))
+
+
+# StorageBackend methods a StorageService runs for its clients
+SERVICE_METHODS = frozenset({'get', 'put', 'put_many', 'delete', 'items', 'count', 'expired',
+                             'sequence', 'changes_since', 'clear'})
+
+
+class ServiceError(RuntimeError):
+    """The state service failed to run a call"""
+
+
+class HTTPClient:
+    """ServiceBackend client for a StorageService at `url`, one keep-alive connection per thread"""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def call(self, method: str, *args) -> Any:
+        body = json.dumps({'method': method, 'args': args}).encode()
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request('POST', '/call', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                payload = json.loads(response.read())
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The service closed an idle connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise ServiceError(payload.get('error', f'HTTP {response.status}'))
+        return payload['result']
+
+
+class StorageService(ThreadingHTTPServer):
+    """HTTP front for one StorageBackend, shared by every worker that points HTTPClient at it"""
+
+    daemon_threads = True
+
+    def __init__(self, backend: StorageBackend, host: str = '127.0.0.1', port: int = 8765):
+        self.backend = backend
+        super().__init__((host, port), _ServiceHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so clients reuse their connection
+
+    def do_POST(self):
+        try:
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            if request.get('method') not in SERVICE_METHODS:
+                raise ValueError(f"Unknown method {request.get('method')!r}")
+            status, payload = 200, {'result': getattr(self.server.backend, request['method'])(*request['args'])}
+        except Exception as e:
+            status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per call would swamp the log
+
+
+class ReadThroughCache:
+    """Per-worker cache in front of a shared StorageBackend.
+
+    Reads of `cached` namespaces are served from a bounded LRU map after
+    the first miss; writes go to the backend first and then to the map.
+    `sync` polls the backend's change feed and evicts whatever another
+    worker changed, returning the changes so the caller can refresh state
+    derived from them.  Returned records are shared with the cache, so
+    callers must write changes back with `put` rather than only mutating them.
+    """
+
+    def __init__(self, backend: StorageBackend, cached: Sequence[str] = (),
+                 max_entries: int = 50000, sync_interval: float = 0.0):
+        self.backend = backend
+        self.cached = frozenset(cached)
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self._entries: 'OrderedDict[Change, Dict]' = OrderedDict()
+        self._seq = backend.sequence()
+        self._next_sync = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def seq(self) -> int:
+        """Change-feed position this cache has synced to"""
+        return self._seq
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        if namespace not in self.cached:
+            return self.backend.get(namespace, key)
+        with self._lock:
+            value = self._entries.get((namespace, key))
+            if value is not None:
+                self._entries.move_to_end((namespace, key))
+                return value
+        value = self.backend.get(namespace, key)
+        if value is not None:
+            self._remember(namespace, key, value)
+        return value
+
+    def put(self, namespace: str, key: str, value: Dict):
+        self.backend.put(namespace, key, value)
+        if namespace in self.cached:
+            self._remember(namespace, key, value)
+
+    def put_many(self, namespace: str, records: Dict[str, Dict]):
+        self.backend.put_many(namespace, records)
+        if namespace in self.cached:
+            for key, value in records.items():
+                self._remember(namespace, key, value)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+        return self.backend.delete(namespace, key)
+
+    def items(self, namespace: str) -> List[Tuple[str, Dict]]:
+        return self.backend.items(namespace)
+
+    def iter_items(self, namespace: str) -> Iterator[Tuple[str, Dict]]:
+        return self.backend.iter_items(namespace)
+
+    def count(self, namespace: str) -> int:
+        return self.backend.count(namespace)
+
+    def expired(self, namespace: str, now: float) -> List[str]:
+        return self.backend.expired(namespace, now)
+
+    def clear(self, namespace: Optional[str] = None):
+        self.backend.clear(namespace)
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._seq = self.backend.sequence()
+            else:
+                for entry in [e for e in self._entries if e[0] == namespace]:
+                    del self._entries[entry]
+
+    def sync(self, force: bool = False) -> Optional[List[Change]]:
+        """Evict records changed since the last sync and return those changes.
+
+        Returns None when the feed no longer reaches back to the last sync;
+        the whole cache has been dropped and derived state must be rebuilt.
+        """
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return []
+        self._next_sync = now + self.sync_interval
+
+        with self._lock:
+            changes, latest = self.backend.changes_since(self._seq)
+            self._seq = latest
+            if changes is None:
+                self._entries.clear()
+                return None
+            for change in changes:
+                self._entries.pop(change, None)
+            return changes
+
+    def _remember(self, namespace: str, key: str, value: Dict):
+        with self._lock:
+            self._entries[(namespace, key)] = value
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class StoredMapping:
+    """Dict-style view of one namespace of a ReadThroughCache"""
+
+    def __init__(self, store: ReadThroughCache, namespace: str):
+        self.store = store
+        self.namespace = namespace
+
+    def __contains__(self, key: str) -> bool:
+        return self.store.get(self.namespace, key) is not None
+
+    def __getitem__(self, key: str) -> Dict:
+        value = self.store.get(self.namespace, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Dict):
+        self.store.put(self.namespace, key, value)
+
+    def __delitem__(self, key: str):
+        if not self.store.delete(self.namespace, key):
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        return self.store.count(self.namespace)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([key for key, _ in self.store.items(self.namespace)])
+
+    def get(self, key: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        value = self.store.get(self.namespace, key)
+        return default if value is None else value
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        return self.store.items(self.namespace)
+
+    def values(self) -> List[Dict]:
+        return [value for _, value in self.store.items(self.namespace)]
+
+    def clear(self):
+        self.store.clear(self.namespace)
+
+
+class StoredSessionBackend(SessionBackend):
+    """Session records kept in shared storage so every worker sees every login.
+
+    Tokens live in the `sessions` namespace and each user's token list in
+    `user_sessions`.  Updating that list is a read-modify-write, so two
+    logins racing on different workers can lose a token from it; the only
+    effect is that the per-user cap may briefly admit an extra session.
+    """
+
+    def __init__(self, store: ReadThroughCache, namespace: str = 'sessions'):
+        self.store = store
+        self.namespace = namespace
+        self.index_namespace = 'user_' + namespace
+
+    def put(self, token: str, session: Dict):
+        self.store.put(self.namespace, token, session)
+        index = self.store.get(self.index_namespace, session['user_id']) or {'tokens': []}
+        self.store.put(self.index_namespace, session['user_id'],
+                       {'tokens': index['tokens'] + [token]})
+
+    def get(self, token: str) -> Optional[Dict]:
+        return self.store.get(self.namespace, token)
+
+    def delete(self, token: str) -> bool:
+        session = self.store.get(self.namespace, token)
+        if session is None or not self.store.delete(self.namespace, token):
+            return False
+        index = self.store.get(self.index_namespace, session['user_id'])
+        if index is not None:
+            tokens = [t for t in index['tokens'] if t != token]
+            if tokens:
+                self.store.put(self.index_namespace, session['user_id'], {'tokens': tokens})
+            else:
+                self.store.delete(self.index_namespace, session['user_id'])
+        return True
+
+    def user_tokens(self, user_id: str) -> List[str]:
+        index = self.store.get(self.index_namespace, user_id)
+        return list(index['tokens']) if index else []
+
+    def delete_expired(self, now: float) -> int:
+        return sum(self.delete(token) for token in self.store.expired(self.namespace, now))
+
+    def clear(self):
+        self.store.clear(self.namespace)
+        self.store.clear(self.index_namespace)
+
+    def __len__(self) -> int:
+        return self.store.count(self.namespace)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NutriAI shared state')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    serve = subcommands.add_parser('serve', help='Serve a storage backend to the workers over HTTP')
+    serve.add_argument('--db', help='SQLite file to keep the state in; in memory if omitted')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        service = StorageService(SQLiteBackend(args.db) if args.db else MemoryBackend(), args.host, args.port)
+        print(f"Serving state on {service.url}")
+        service.serve_forever()
@@ -0,0 +1,166 @@
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class DayLog:
+    """Days on which a user logged meals, kept as a bitmap over day ordinals.
+
+    Bit i stands for day `base + i`.  Alongside the bitmap the log keeps the
+    run of consecutive logged days ending at the newest logged day, so the
+    current streak is an O(1) read.  Logging the next day extends the run in
+    O(1); back-dated inserts and deletes that touch the run recount it with
+    a couple of big-int operations instead of walking dates.
+    """
+
+    __slots__ = ('_counts', '_bits', '_base', 'last_day', 'run')
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}  # Meals per day, so deletes know when a day empties
+        self._bits = 0
+        self._base: Optional[int] = None
+        self.last_day: Optional[int] = None
+        self.run = 0
+
+    @classmethod
+    def from_counts(cls, days: List[int], counts: List[int]) -> 'DayLog':
+        """Log of distinct `days` with the number of meals on each"""
+        log = cls()
+        if days:
+            log._counts = dict(zip(days, counts))
+            log._base = min(days)
+            log._bits = sum(1 << (day - log._base) for day in log._counts)
+            log._recount()
+        return log
+
+    def __len__(self) -> int:
+        """Number of distinct days with meals"""
+        return len(self._counts)
+
+    def __contains__(self, day: int) -> bool:
+        return day in self._counts
+
+    def add(self, day: int):
+        """Record a meal logged on `day`"""
+        count = self._counts.get(day, 0)
+        self._counts[day] = count + 1
+        if count:
+            return
+
+        if self._base is None:
+            self._base = day
+        elif day < self._base:
+            self._bits <<= self._base - day
+            self._base = day
+        self._bits |= 1 << (day - self._base)
+
+        if self.last_day is None or day > self.last_day + 1:
+            self.last_day = day
+            self.run = 1
+        elif day == self.last_day + 1:
+            self.last_day = day
+            self.run += 1
+        else:
+            self._recount()
+
+    def remove(self, day: int):
+        """Forget a meal previously logged on `day`"""
+        count = self._counts.get(day)
+        if not count:
+            return
+        if count > 1:
+            self._counts[day] = count - 1
+            return
+
+        del self._counts[day]
+        self._bits &= ~(1 << (day - self._base))
+        if day > self.last_day - self.run:
+            self._recount()
+
+    def streak(self, today: int) -> int:
+        """Consecutive days with meals ending today"""
+        return self.run if self.last_day == today else 0
+
+    def days_between(self, first_day: int, last_day: int) -> int:
+        """Number of logged days with first_day <= day <= last_day"""
+        if self._base is None or last_day < first_day:
+            return 0
+        lo = max(first_day - self._base, 0)
+        hi = last_day - self._base + 1
+        if hi <= lo:
+            return 0
+        return bin((self._bits >> lo) & ((1 << (hi - lo)) - 1)).count('1')
+
+    def _recount(self):
+        """Recompute the run ending at the newest logged day from the bitmap"""
+        if not self._bits:
+            self.last_day = None
+            self.run = 0
+            return
+
+        top = self._bits.bit_length() - 1
+        self.last_day = self._base + top
+        # Highest missing day below the newest one bounds the run
+        missing = ~self._bits & ((1 << (top + 1)) - 1)
+        self.run = top + 1 - missing.bit_length()
+
+
+class StreakBoard:
+    """Leaderboard of current streaks served from a lazily cleaned max-heap.
+
+    Every change to a user's DayLog pushes a new (run, last day) entry and
+    bumps the user's version; reads skip entries that are superseded or whose
+    streak has lapsed because no meal was logged today.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[int, str, int, int]] = []
+        self._versions: Dict[str, int] = {}
+        self._current: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, user_id: str, log: DayLog):
+        """Publish a user's current run after their DayLog changed"""
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            if log.last_day is None:
+                self._current.pop(user_id, None)
+                return
+
+            self._current[user_id] = (log.run, log.last_day)
+            heapq.heappush(self._heap, (-log.run, user_id, log.last_day, version))
+            if len(self._heap) > 2 * len(self._current) + 64:
+                self._rebuild()
+
+    def discard(self, user_id: str):
+        """Remove a user from the board"""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._current.pop(user_id, None)
+
+    def leaders(self, today: int, limit: int = 5) -> List[Tuple[str, int]]:
+        """Top (user_id, streak) pairs among users with a streak ending today"""
+        leaders = []
+        keep = []
+        with self._lock:
+            while self._heap and len(leaders) < limit:
+                entry = heapq.heappop(self._heap)
+                run, user_id, last_day, version = entry
+                if version != self._versions.get(user_id):
+                    continue  # Superseded
+                if last_day < today:
+                    continue  # Lapsed; the next meal pushes a fresh entry
+                keep.append(entry)
+                if last_day == today:
+                    leaders.append((user_id, -run))
+
+            for entry in keep:
+                heapq.heappush(self._heap, entry)
+        return leaders
+
+    def _rebuild(self):
+        """Drop superseded entries"""
+        self._heap = [(-run, user_id, last_day, self._versions[user_id])
+                      for user_id, (run, last_day) in self._current.items()]
+        heapq.heapify(self._heap)
@@ -0,0 +1,77 @@
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+
+class RollingStats:
+    """Running meal totals for one user over a rolling window of days.
+
+    Totals are bucketed by day in a ring buffer of `buckets` slots, so
+    inserting or deleting a meal touches one slot and reading the window
+    sums at most `buckets` slots.  A slot still holding an older day is
+    reset the next time a meal lands in it, so expiry happens lazily and
+    old meals are never revisited.
+
+    Days are integer ordinals (``date.toordinal()``).  Meals more than
+    `buckets` days older than the newest bucketed day are outside the
+    buffer and are not counted.
+    """
+
+    def __init__(self, window_days: int = 7, buckets: Optional[int] = None):
+        self.window_days = window_days
+        self.size = max(buckets or window_days + 1, window_days)
+        self._days: List[Optional[int]] = [None] * self.size
+        self._calories: List[float] = [0.0] * self.size
+        self._scores: List[float] = [0.0] * self.size
+        self._counts: List[int] = [0] * self.size
+
+    def add(self, day: int, calories: float, score: float, count: int = 1):
+        """Record `count` meals logged on `day` with these calorie and score totals"""
+        slot = day % self.size
+        current = self._days[slot]
+        if current != day:
+            if current is not None and current > day:
+                return  # Older than everything the buffer holds
+            self._days[slot] = day
+            self._calories[slot] = 0.0
+            self._scores[slot] = 0.0
+            self._counts[slot] = 0
+
+        self._calories[slot] += calories
+        self._scores[slot] += score
+        self._counts[slot] += count
+
+    def add_days(self, days: List[int], calories: List[float], scores: List[float], counts: List[int]):
+        """Record per-day totals given oldest day first, skipping days the buffer would overwrite"""
+        if not days:
+            return
+        start = bisect_left(days, days[-1] - self.size + 1)
+        for totals in zip(days[start:], calories[start:], scores[start:], counts[start:]):
+            self.add(*totals)
+
+    def remove(self, day: int, calories: float, score: float):
+        """Forget a meal previously recorded on `day`"""
+        slot = day % self.size
+        if self._days[slot] != day or self._counts[slot] == 0:
+            return  # Already expired from the buffer
+
+        self._counts[slot] -= 1
+        if self._counts[slot] == 0:
+            # Reset exactly instead of accumulating float error
+            self._calories[slot] = 0.0
+            self._scores[slot] = 0.0
+        else:
+            self._calories[slot] -= calories
+            self._scores[slot] -= score
+
+    def window(self, today: int) -> Tuple[float, float, int]:
+        """Total calories, total meal score and meal count over the window ending `today`"""
+        first_day = today - self.window_days + 1
+        calories = 0.0
+        scores = 0.0
+        count = 0
+        for slot, day in enumerate(self._days):
+            if day is not None and first_day <= day <= today:
+                calories += self._calories[slot]
+                scores += self._scores[slot]
+                count += self._counts[slot]
+        return calories, scores, count
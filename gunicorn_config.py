@@ -1,8 +1,23 @@
 # gunicorn_config.py
 import multiprocessing
+import os
 
+# The app lives in backend/; run as `gunicorn -c gunicorn_config.py app:app` from the repository root
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
 bind = "0.0.0.0:10000"
 workers = multiprocessing.cpu_count() * 2 + 1
 threads = 2
 timeout = 120
 keepalive = 5
+
+# Workers share users, meals and sessions through one SQLite file, and start from a meal snapshot
+raw_env = [
+    f"NUTRIAI_STATE_DB={os.environ.get('NUTRIAI_STATE_DB', 'nutriai_state.db')}",
+    f"NUTRIAI_MEAL_SNAPSHOT={os.environ.get('NUTRIAI_MEAL_SNAPSHOT', 'nutriai_meals.snap')}",
+]
+
+
+def post_worker_init(worker):
+    """Load the health-risk model in the background; /api/ready reports when it is warm"""
+    from ai_engine import nutrition_ai
+    nutrition_ai.warm_up()
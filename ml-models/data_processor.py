@@ -1,15 +1,23 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, LabelEncoder, MinMaxScaler
+from sklearn.preprocessing import StandardScaler, LabelEncoder, MinMaxScaler, OrdinalEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.decomposition import PCA
-from sklearn.feature_selection import SelectKBest, f_classif, mutual_info_classif
+from sklearn.feature_selection import (SelectKBest, f_classif, f_regression, mutual_info_classif,
+                                       mutual_info_regression)
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from functools import partial
 import joblib
+from streaming import ChunkCache, QuantileSketch
 import json
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+# Features whose outliers are removed with the IQR rule
+OUTLIER_FEATURES = ['daily_calories', 'daily_protein_g', 'daily_carbs_g', 'daily_fats_g', 'bmi']
+
 class NutritionDataProcessor:
     """Data processing pipeline for nutrition and health data"""
     
@@ -43,6 +51,98 @@ class NutritionDataProcessor:
         print(f"Data loaded: {df_clean.shape[0]} samples, {df_clean.shape[1]} features")
         return df_clean
     
+    def stream_clean_data(self, filepath, cache_dir, target_column='health_score', chunksize=100_000,
+                          sketch_size=4096):
+        """
+        Clean a CSV too large for memory, chunk by chunk, into a ChunkCache
+        
+        The first pass reads each chunk once to gather quantile sketches of
+        the numeric columns (medians and IQR bounds) and category counts
+        (modes and label encoders).  The second imputes, drops outliers and
+        label-encodes each chunk, fits the scaler on its features with
+        partial_fit and writes it to the cache.  Unlike _clean_data, every
+        feature's IQR bounds come from the whole column rather than from
+        the rows earlier filters left, and are approximate within the
+        sketch's rank error.
+        
+        A column is categorical if any chunk holds text in it, so a column
+        empty in the first chunk is typed by the rows that have values.
+        Categorical columns are read as strings in the second pass, and a
+        value only seen in a numeric chunk of such a column gets the mode.
+        Numeric columns with no values at all are filled with 0.
+        
+        Returns the ChunkCache; iter_training_batches reads it back.
+        """
+        sketches, counts = {}, {}
+        rows_read = 0
+        self.feature_names = None
+        for chunk in pd.read_csv(filepath, chunksize=chunksize):
+            if self.feature_names is None:
+                self.feature_names = chunk.columns.tolist()
+                sketches = {column: QuantileSketch(sketch_size) for column in self.feature_names}
+            rows_read += len(chunk)
+            # Kinds are decided per chunk: an all-empty column reads as float in any chunk
+            chunk_numeric = set(chunk.select_dtypes(include=[np.number]).columns)
+            for column in self.feature_names:
+                if column in chunk_numeric:
+                    sketches[column].update(chunk[column].to_numpy(dtype=float))
+                else:
+                    column_counts = counts.setdefault(column, {})
+                    for value, count in chunk[column].dropna().astype(str).value_counts().items():
+                        column_counts[value] = column_counts.get(value, 0) + count
+        if self.feature_names is None:
+            raise ValueError(f"{filepath} has no rows")
+        categorical = [column for column in self.feature_names if counts.get(column)]
+        numeric = [column for column in self.feature_names if column not in categorical]
+        
+        medians = {column: float(sketches[column].quantile(0.5)) for column in numeric}
+        # Fitting on a single row of the medians gives the imputer exactly those statistics;
+        # a column with no values has a NaN median and is filled with 0 rather than dropped
+        self.imputer = SimpleImputer(strategy='median', keep_empty_features=True).fit(pd.DataFrame([medians]))
+        modes = {column: max(counts[column], key=counts[column].get) for column in categorical}
+        self.label_encoders = {column: LabelEncoder().fit(sorted(counts[column])) for column in categorical}
+        bounds = {}
+        for feature in OUTLIER_FEATURES:
+            if feature in numeric and sketches[feature].count:
+                q1, q3 = sketches[feature].quantile([0.25, 0.75])
+                bounds[feature] = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+        
+        features = [column for column in self.feature_names if column != target_column]
+        self.scaler = StandardScaler()
+        cache = ChunkCache(cache_dir)
+        cache.clear()
+        for chunk in pd.read_csv(filepath, chunksize=chunksize, dtype={column: str for column in categorical}):
+            chunk[numeric] = self.imputer.transform(chunk[numeric].astype(float))
+            keep = np.ones(len(chunk), dtype=bool)
+            for feature, (lower, upper) in bounds.items():
+                keep &= ((chunk[feature] >= lower) & (chunk[feature] <= upper)).to_numpy()
+            chunk = chunk[keep].reset_index(drop=True)
+            if not len(chunk):
+                continue
+            for column in categorical:
+                values = chunk[column].fillna(modes[column])
+                values = values.where(values.isin(self.label_encoders[column].classes_), modes[column])
+                chunk[column] = self.label_encoders[column].transform(values)
+            self.scaler.partial_fit(chunk[features])
+            cache.append(chunk)
+        
+        self.processed_data = {
+            'feature_names': features,
+            'target': target_column,
+            'categorical_mapping': self.label_encoders,
+            'rows_read': rows_read,
+            'rows_kept': len(cache),
+            'outlier_bounds': bounds
+        }
+        print(f"Streamed {rows_read} samples, kept {len(cache)} in {len(cache.manifest['rows'])} chunks")
+        return cache
+    
+    def iter_training_batches(self, cache, target_column='health_score'):
+        """Yield (scaled features, target) arrays, one chunk of the cache at a time"""
+        features = [column for column in cache.columns if column != target_column]
+        for chunk in cache.chunks():
+            yield self.scaler.transform(chunk[features]), chunk[target_column].to_numpy()
+    
     def _generate_synthetic_data(self):
         """Generate synthetic nutrition data for research"""
         np.random.seed(42)
@@ -131,8 +231,7 @@ class NutritionDataProcessor:
                 df_clean[col] = df_clean[col].fillna(df_clean[col].mode()[0])
         
         # Remove outliers using IQR method for key features
-        outlier_features = ['daily_calories', 'daily_protein_g', 'daily_carbs_g', 'daily_fats_g', 'bmi']
-        for feature in outlier_features:
+        for feature in OUTLIER_FEATURES:
             if feature in df_clean.columns:
                 Q1 = df_clean[feature].quantile(0.25)
                 Q3 = df_clean[feature].quantile(0.75)
@@ -241,6 +340,39 @@ class NutritionDataProcessor:
         
         return X_selected, selected_features, importance_df
     
+    def preprocessing_steps(self, X, task='regression', k=20, method='mutual_info'):
+        """
+        Imputation, encoding, scaling and feature selection as Pipeline steps
+        
+        preprocess_features and feature_selection fit on all the data at
+        once.  Leading a model Pipeline instead, these steps are refit on
+        each training fold, so no statistics leak from validation rows;
+        give the Pipeline a FoldCache to fit them once per fold.
+        """
+        numeric = X.select_dtypes(include=[np.number]).columns.tolist()
+        categorical = X.select_dtypes(exclude=[np.number]).columns.tolist()
+        
+        preprocess = ColumnTransformer([
+            ('numeric', Pipeline([
+                ('impute', SimpleImputer(strategy='median')),
+                ('scale', StandardScaler())
+            ]), numeric),
+            ('categorical', Pipeline([
+                ('impute', SimpleImputer(strategy='most_frequent')),
+                ('encode', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1))
+            ]), categorical)
+        ])
+        
+        if method == 'mutual_info':
+            # Seeded so repeated fits of a fold score, and cache, identically
+            score_func = partial(mutual_info_regression if task == 'regression' else mutual_info_classif,
+                                 random_state=42)
+        else:
+            score_func = f_regression if task == 'regression' else f_classif
+        selector = SelectKBest(score_func=score_func, k=min(k, len(numeric) + len(categorical)))
+        
+        return [('preprocess', preprocess), ('select', selector)]
+    
     def apply_pca(self, X, n_components=10):
         """
         Apply PCA for dimensionality reduction
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+from joblib import Memory
+
+DEFAULT_LOCATION = os.environ.get('NUTRIAI_FOLD_CACHE_DIR',
+                                  os.path.join(tempfile.gettempdir(), 'nutriai-fold-cache'))
+
+
+class FoldCache:
+    """
+    On-disk cache of fitted preprocessing steps and the fold matrices they produce
+
+    `memory` goes to a Pipeline, which then stores each transformer's
+    fit_transform result -- the fitted transformer and its output -- under
+    a hash of the step's parameters and of the exact rows and target it was
+    fit on.  Every candidate of a search sees the same folds, so
+    imputation, encoding, scaling and feature scoring run once per fold
+    rather than once per candidate and fold, and later runs on the same
+    data reuse them.
+
+    Parameters:
+    -----------
+    location : str, optional
+        Cache directory; defaults to $NUTRIAI_FOLD_CACHE_DIR or a temp dir
+    bytes_limit : int or str
+        Size the cache is trimmed to by `evict`, e.g. '1G'
+    age_limit : datetime.timedelta, optional
+        Entries unused for longer are evicted too
+    """
+
+    def __init__(self, location=None, bytes_limit='1G', age_limit=None, verbose=0):
+        self.location = location or DEFAULT_LOCATION
+        self.bytes_limit = bytes_limit
+        self.age_limit = age_limit
+        self.memory = Memory(self.location, verbose=verbose)
+
+    def evict(self):
+        """Drop least recently used entries beyond the size and age limits"""
+        self.memory.reduce_size(bytes_limit=self.bytes_limit, age_limit=self.age_limit)
+
+    def size(self):
+        """Bytes the cache takes on disk"""
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(self.location) for name in names)
+
+    def clear(self):
+        self.memory.clear(warn=False)
@@ -10,11 +10,17 @@ from sklearn.metrics import (
     confusion_matrix, classification_report, roc_auc_score
 )
 from sklearn.model_selection import cross_val_score, GridSearchCV, RandomizedSearchCV
+from sklearn.base import clone
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import PolynomialFeatures
 import xgboost as xgb
 import joblib
+from search_strategies import get_strategy
+from parallelism import plan_parallelism
 import json
+import os
+import tempfile
+from contextlib import contextmanager
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
@@ -24,7 +30,7 @@ warnings.filterwarnings('ignore')
 class NutritionAIModel:
     """AI Model for nutrition and health prediction"""
     
-    def __init__(self, model_type='random_forest', task='regression'):
+    def __init__(self, model_type='random_forest', task='regression', n_cores=None):
         """
         Initialize nutrition AI model
         
@@ -34,18 +40,28 @@ class NutritionAIModel:
             Type of model to use: 'random_forest', 'xgboost', 'svm', 'neural_network', 'ensemble'
         task : str
             Type of task: 'regression' or 'classification'
+        n_cores : int, optional
+            Cores training may use; defaults to all available
         """
         self.model_type = model_type
         self.task = task
+        self.n_cores = n_cores
+        self.fold_cache = None
         self.model = None
         self.best_params = None
         self.feature_importance = None
         self.scaler = None
+        # Incremental update count, and the update each forest tree was added in
+        self.generation = 0
+        self.tree_generations = []
         self.history = {
             'training_history': [],
             'validation_history': [],
             'best_score': 0,
-            'training_time': 0
+            'training_time': 0,
+            'search': None,
+            'incremental_updates': [],
+            'parallelism': []
         }
         
     def build_model(self, input_shape=None, params=None):
@@ -175,7 +191,31 @@ class NutritionAIModel:
         print(f"Built {self.model_type} model for {self.task} task")
         return self.model
     
-    def train(self, X_train, y_train, X_val=None, y_val=None, hyperparameter_tuning=False):
+    def use_preprocessing(self, steps, fold_cache=None):
+        """
+        Put preprocessing steps in front of the model in one Pipeline
+        
+        Parameters:
+        -----------
+        steps : list of (name, transformer)
+            e.g. NutritionDataProcessor.preprocessing_steps
+        fold_cache : FoldCache, optional
+            Reuse fitted steps and their output across candidates and folds
+        """
+        if self.model is None:
+            self.build_model()
+        
+        self.fold_cache = fold_cache
+        self.model = Pipeline(list(steps) + [('model', self._estimator())],
+                              memory=fold_cache.memory if fold_cache else None)
+        return self.model
+    
+    def _estimator(self):
+        """The model itself, without preprocessing steps"""
+        return self.model.steps[-1][1] if isinstance(self.model, Pipeline) else self.model
+    
+    def train(self, X_train, y_train, X_val=None, y_val=None, hyperparameter_tuning=False,
+              search_strategy='grid', **search_params):
         """
         Train the model
         
@@ -191,6 +231,10 @@ class NutritionAIModel:
             Validation labels
         hyperparameter_tuning : bool
             Whether to perform hyperparameter tuning
+        search_strategy : str or SearchStrategy
+            'grid', 'random', 'sobol', 'halving' or 'early_stopping' (xgboost)
+        **search_params
+            Passed to the search strategy, e.g. n_iter or factor
         """
         import time
         
@@ -200,13 +244,13 @@ class NutritionAIModel:
             self.build_model(input_shape=X_train.shape[1])
         
         if hyperparameter_tuning:
+            # The search refits the best candidate on the whole training set
             print("Performing hyperparameter tuning...")
-            self._hyperparameter_tuning(X_train, y_train)
-        
-        print(f"Training {self.model_type} model...")
-        
-        # Train the model
-        self.model.fit(X_train, y_train)
+            self._hyperparameter_tuning(X_train, y_train, strategy=search_strategy, **search_params)
+        else:
+            print(f"Training {self.model_type} model...")
+            with self._plan('train', 1, X_train):
+                self.model.fit(X_train, y_train)
         
         # Calculate training metrics
         train_predictions = self.predict(X_train)
@@ -236,6 +280,10 @@ class NutritionAIModel:
         if hasattr(self.model, 'feature_importances_'):
             self.feature_importance = self.model.feature_importances_
         
+        # A full retrain starts a new lineage of trees
+        self.generation = 0
+        self.tree_generations = [0] * len(getattr(self.model, 'estimators_', [])) if self.model_type == 'random_forest' else []
+        
         # Calculate training time
         training_time = time.time() - start_time
         self.history['training_time'] = training_time
@@ -245,8 +293,236 @@ class NutritionAIModel:
         
         return self.model
     
-    def _hyperparameter_tuning(self, X_train, y_train, cv=5):
-        """Perform hyperparameter tuning"""
+    def update(self, X_new, y_new, n_new_estimators=None, max_tree_age=None,
+               X_eval=None, y_eval=None, X_full=None, y_full=None):
+        """
+        Incrementally update a trained model with new data
+        
+        Random forests grow `n_new_estimators` extra trees on the new data
+        with warm_start, and trees added more than `max_tree_age` updates
+        ago are retired.  XGBoost continues boosting `n_new_estimators`
+        rounds from the current booster; its rounds correct the ones before
+        them, so none are retired.
+        
+        Parameters:
+        -----------
+        X_new, y_new : array-like
+            Data added since the last training or update
+        n_new_estimators : int, optional
+            Trees or boosting rounds to add; defaults to 10% of the current model
+        max_tree_age : int, optional
+            Retire forest trees older than this many updates
+        X_eval, y_eval : array-like, optional
+            Held-out data to score the updated model on
+        X_full, y_full : array-like, optional
+            All training data; with an evaluation set, a model of the same
+            size is also trained from scratch on it to report the score
+            delta of updating instead of retraining
+        """
+        import time
+        
+        if self.model is None:
+            raise ValueError("Model must be trained before it can be updated")
+        if self.model_type not in ('random_forest', 'xgboost') or isinstance(self.model, Pipeline):
+            raise ValueError("Incremental updates need a random_forest or xgboost model without preprocessing steps")
+        if self.task == 'classification':
+            # The new trees must predict the same classes as the existing ones
+            known, seen = set(self.model.classes_), set(np.unique(y_new))
+            if seen != known:
+                missing, unknown = sorted(known - seen), sorted(seen - known)
+                raise ValueError(f"New data has classes {sorted(seen)}, the model {sorted(known)} "
+                                 f"(missing {missing}, unseen {unknown}); retrain instead")
+        
+        start_time = time.time()
+        self.generation += 1
+        retired = 0
+        
+        if self.model_type == 'random_forest':
+            current = len(self.model.estimators_)
+            if len(self.tree_generations) != current:
+                self.tree_generations = [0] * current
+            added = n_new_estimators or max(1, current // 10)
+            
+            self.model.set_params(warm_start=True, n_estimators=current + added)
+            with self._plan('update', 1, X_new):
+                self.model.fit(X_new, y_new)
+            self.model.set_params(warm_start=False)
+            self.tree_generations += [self.generation] * added
+            
+            if max_tree_age is not None:
+                keep = [i for i, generation in enumerate(self.tree_generations)
+                        if self.generation - generation <= max_tree_age]
+                retired = len(self.tree_generations) - len(keep)
+                self.model.estimators_ = [self.model.estimators_[i] for i in keep]
+                self.tree_generations = [self.tree_generations[i] for i in keep]
+                self.model.set_params(n_estimators=len(keep))
+            size = len(self.model.estimators_)
+        else:
+            booster = self.model.get_booster()
+            current = booster.num_boosted_rounds()
+            added = n_new_estimators or max(1, current // 10)
+            
+            self.model.set_params(n_estimators=added)
+            with self._plan('update', 1, X_new):
+                self.model.fit(X_new, y_new, xgb_model=booster, verbose=False)
+            size = self.model.get_booster().num_boosted_rounds()
+            self.model.set_params(n_estimators=size)
+        
+        if hasattr(self.model, 'feature_importances_'):
+            self.feature_importance = self.model.feature_importances_
+        
+        record = {
+            'generation': self.generation,
+            'new_samples': len(X_new),
+            'estimators_added': added,
+            'estimators_retired': retired,
+            'n_estimators': size,
+            'update_time': time.time() - start_time
+        }
+        
+        if X_eval is not None and y_eval is not None:
+            record['score'] = self._score(X_eval, y_eval)
+            if X_full is not None and y_full is not None:
+                full_start = time.time()
+                full_model = clone(self.model).fit(X_full, y_full)
+                record['full_retrain_time'] = time.time() - full_start
+                record['full_retrain_score'] = self._score(X_eval, y_eval, full_model)
+                record['score_delta'] = record['score'] - record['full_retrain_score']
+        
+        self.history['incremental_updates'].append(record)
+        
+        print(f"Update {self.generation}: +{added} / -{retired} estimators on {len(X_new)} samples "
+              f"in {record['update_time']:.2f} seconds")
+        if 'score_delta' in record:
+            print(f"Score {record['score']:.4f} vs full retrain {record['full_retrain_score']:.4f} "
+                  f"in {record['full_retrain_time']:.2f} seconds")
+        
+        return record
+    
+    def train_streaming(self, batches, epochs=1, classes=None, trees_per_batch=10, cache_dir=None):
+        """
+        Train from data too large for memory, one batch at a time
+        
+        Neural networks learn with partial_fit, batch by batch, for
+        `epochs` passes.  XGBoost builds an external-memory DMatrix whose
+        pages live in `cache_dir` and boosts n_estimators rounds over it.
+        Random forests grow `trees_per_batch` trees on each batch with
+        warm_start, so each tree sees one batch.
+        
+        Parameters:
+        -----------
+        batches : callable
+            Returns a fresh iterator of (X, y) batches on every call, e.g.
+            lambda: processor.iter_training_batches(cache)
+        epochs : int
+            Passes over the batches for neural networks
+        classes : array-like, optional
+            Every class label; required for classification
+        trees_per_batch : int
+            Trees a random forest grows per batch
+        cache_dir : str, optional
+            Directory for xgboost's pages; a temporary one by default
+        """
+        import time
+        
+        if self.model is None:
+            self.build_model()
+        if self.model_type not in ('random_forest', 'xgboost', 'neural_network') or isinstance(self.model, Pipeline):
+            raise ValueError("Streaming training needs a random_forest, xgboost or neural_network model")
+        if self.task == 'classification' and classes is None:
+            raise ValueError("classes are required to train a classifier from batches")
+        
+        start_time = time.time()
+        counted = {'batches': 0, 'rows': 0}
+        
+        def counting(batch_iter):
+            # Counts the latest pass; epochs and xgboost read the batches more than once
+            counted.update(batches=0, rows=0)
+            for X, y in batch_iter:
+                counted['batches'] += 1
+                counted['rows'] += len(X)
+                yield X, y
+        
+        print(f"Training {self.model_type} model from batches...")
+        with self._plan('train_streaming', 1):
+            if self.model_type == 'neural_network':
+                for _ in range(epochs):
+                    for X, y in counting(batches()):
+                        if self.task == 'classification':
+                            self.model.partial_fit(X, y, classes=classes)
+                        else:
+                            self.model.partial_fit(X, y)
+            
+            elif self.model_type == 'random_forest':
+                self.model.set_params(warm_start=True)
+                self.model.estimators_ = []
+                for X, y in counting(batches()):
+                    if self.task == 'classification' and set(np.unique(y)) != set(classes):
+                        raise ValueError(f"Batch {counted['batches']} does not contain every class")
+                    self.model.set_params(n_estimators=len(self.model.estimators_) + trees_per_batch)
+                    self.model.fit(X, y)
+                self.model.set_params(warm_start=False)
+            
+            else:
+                params = self.model.get_xgb_params()
+                if self.task == 'classification' and len(classes) > 2:
+                    params.update(objective='multi:softprob', num_class=len(classes))
+                with tempfile.TemporaryDirectory(dir=cache_dir) as pages:
+                    dtrain = xgb.DMatrix(_BatchIter(lambda: counting(batches()), os.path.join(pages, 'xgb')))
+                    booster = xgb.train(params, dtrain, num_boost_round=self.model.n_estimators)
+                    del dtrain
+                self.model.load_model(booster.save_raw('ubj'))
+        
+        if hasattr(self.model, 'feature_importances_'):
+            self.feature_importance = self.model.feature_importances_
+        self.generation = 0
+        self.tree_generations = [0] * len(getattr(self.model, 'estimators_', [])) if self.model_type == 'random_forest' else []
+        
+        training_time = time.time() - start_time
+        self.history['training_time'] = training_time
+        self.history['streaming'] = {
+            'batches': counted['batches'],
+            'rows': counted['rows'],
+            'epochs': epochs if self.model_type == 'neural_network' else 1,
+            'training_time': training_time
+        }
+        
+        print(f"Training completed in {training_time:.2f} seconds over {counted['rows']} samples")
+        return self.model
+    
+    @contextmanager
+    def _plan(self, stage, tasks, X=None):
+        """Plan parallelism for a stage and record the decision.
+        
+        Within the block the estimator's n_jobs is the plan's inner_jobs and
+        thread pools are limited; afterwards the model gets back the n_jobs
+        it had, so predictions and saved models use the configured value.
+        """
+        shape = np.shape(X) if X is not None else (0,)
+        plan = plan_parallelism(stage, tasks, shape[0], shape[1] if len(shape) > 1 else 1, self.n_cores)
+        self.history['parallelism'].append(plan.as_dict())
+        has_jobs = 'n_jobs' in self._estimator().get_params()
+        if has_jobs:
+            n_jobs = self._estimator().get_params()['n_jobs']
+            self._estimator().set_params(n_jobs=plan.inner_jobs)
+        try:
+            with plan.limits():
+                yield plan
+        finally:
+            # A search may have replaced self.model with a clone carrying inner_jobs
+            if has_jobs and 'n_jobs' in self._estimator().get_params():
+                self._estimator().set_params(n_jobs=n_jobs)
+    
+    def _score(self, X, y, model=None):
+        """Primary metric (R² or weighted F1) without printing a report"""
+        y_pred = (model or self.model).predict(X)
+        if self.task == 'regression':
+            return r2_score(y, y_pred)
+        return f1_score(y, y_pred, average='weighted', zero_division=0)
+    
+    def _hyperparameter_tuning(self, X_train, y_train, cv=5, strategy='grid', **search_params):
+        """Perform hyperparameter tuning with the given search strategy"""
+        param_grid = None
         
         if self.task == 'regression':
             if self.model_type == 'random_forest':
@@ -287,20 +563,27 @@ class NutritionAIModel:
                 }
                 scoring = 'f1_weighted'
         
-        # Perform grid search
-        grid_search = GridSearchCV(
-            self.model, param_grid, cv=cv, scoring=scoring,
-            n_jobs=-1, verbose=1
-        )
+        if param_grid is None:
+            raise ValueError(f"No hyperparameter grid for {self.model_type} {self.task} models")
+        if isinstance(self.model, Pipeline):
+            param_grid = {f'model__{name}': values for name, values in param_grid.items()}
         
-        grid_search.fit(X_train, y_train)
+        search = get_strategy(strategy, cv=cv, scoring=scoring, **search_params)
+        with self._plan('search', search.parallel_tasks(param_grid), X_train) as plan:
+            if 'n_jobs' not in search_params:
+                search.n_jobs = plan.outer_jobs
+            result = search.search(self.model, param_grid, X_train, y_train)
+            # Update model with best parameters
+            self.model = result.best_estimator
+        if self.fold_cache is not None:
+            self.fold_cache.evict()
         
-        # Update model with best parameters
-        self.model = grid_search.best_estimator_
-        self.best_params = grid_search.best_params_
+        self.best_params = result.best_params
+        self.history['search'] = result.summary()
         
         print(f"Best parameters: {self.best_params}")
-        print(f"Best score: {grid_search.best_score_:.4f}")
+        print(f"Best score: {result.best_score:.4f}")
+        return result
     
     def predict(self, X):
         """Make predictions"""
@@ -474,9 +757,12 @@ class NutritionAIModel:
         else:
             scoring = ['accuracy', 'precision_weighted', 'recall_weighted', 'f1_weighted']
         
-        cv_results = cross_val_score(self.model, X, y, cv=cv, 
-                                    scoring='r2' if self.task == 'regression' else 'f1_weighted',
-                                    n_jobs=-1)
+        with self._plan('cross_validate', cv if isinstance(cv, int) else cv.get_n_splits(), X) as plan:
+            cv_results = cross_val_score(self.model, X, y, cv=cv, 
+                                        scoring='r2' if self.task == 'regression' else 'f1_weighted',
+                                        n_jobs=plan.outer_jobs)
+        if self.fold_cache is not None:
+            self.fold_cache.evict()
         
         print(f"\n=== CROSS-VALIDATION RESULTS ({cv}-fold) ===")
         print(f"Scores: {cv_results}")
@@ -497,6 +783,8 @@ class NutritionAIModel:
             'best_params': self.best_params,
             'feature_importance': self.feature_importance,
             'history': self.history,
+            'generation': self.generation,
+            'tree_generations': self.tree_generations,
             'saved_at': datetime.now().isoformat(),
             'model_version': '1.0.0'
         }
@@ -514,6 +802,10 @@ class NutritionAIModel:
         self.best_params = model_data['best_params']
         self.feature_importance = model_data['feature_importance']
         self.history = model_data['history']
+        self.history.setdefault('incremental_updates', [])
+        self.history.setdefault('parallelism', [])
+        self.generation = model_data.get('generation', 0)
+        self.tree_generations = model_data.get('tree_generations', [])
         
         print(f"Model loaded from {filepath}")
         print(f"Model type: {self.model_type}")
@@ -610,6 +902,27 @@ class NutritionAIModel:
             }
 
 
+class _BatchIter(xgb.DataIter):
+    """Feeds (X, y) batches to an external-memory DMatrix"""
+    
+    def __init__(self, batches, cache_prefix):
+        self._batches = batches
+        self._iter = None
+        super().__init__(cache_prefix=cache_prefix)
+    
+    def next(self, input_data):
+        if self._iter is None:
+            self._iter = iter(self._batches())
+        batch = next(self._iter, None)
+        if batch is None:
+            return False
+        input_data(data=batch[0], label=batch[1])
+        return True
+    
+    def reset(self):
+        self._iter = None
+
+
 # Example usage
 if __name__ == "__main__":
     print("=== NUTRITION AI MODEL DEMO ===")
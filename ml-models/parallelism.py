@@ -0,0 +1,81 @@
+from joblib import cpu_count
+from threadpoolctl import threadpool_limits
+
+# Feature cells (rows x columns) above which one fit is worth several threads
+LARGE_DATA_CELLS = 2_000_000
+
+
+class ParallelPlan:
+    """
+    How one training stage splits the cores between its levels of parallelism
+
+    `outer_jobs` goes to the search or cross-validation loop and
+    `inner_jobs` to the estimator's own n_jobs; OpenMP threads are capped
+    at `inner_jobs`.  `blas_threads` caps BLAS threads at the cores left
+    per outer job, for estimators without n_jobs such as MLPs.  Neither
+    outer x inner nor outer x blas exceeds the number of cores.
+    """
+
+    def __init__(self, stage, cores, tasks, n_samples, outer_jobs, inner_jobs, blas_threads, reason):
+        self.stage = stage
+        self.cores = cores
+        self.tasks = tasks
+        self.n_samples = n_samples
+        self.outer_jobs = outer_jobs
+        self.inner_jobs = inner_jobs
+        self.blas_threads = blas_threads
+        self.reason = reason
+
+    def limits(self):
+        """Context manager capping BLAS and OpenMP thread pools for this plan"""
+        return threadpool_limits(limits={'blas': self.blas_threads, 'openmp': self.inner_jobs})
+
+    def as_dict(self):
+        return {
+            'stage': self.stage,
+            'cores': self.cores,
+            'tasks': self.tasks,
+            'n_samples': self.n_samples,
+            'outer_jobs': self.outer_jobs,
+            'inner_jobs': self.inner_jobs,
+            'blas_threads': self.blas_threads,
+            'reason': self.reason
+        }
+
+
+def plan_parallelism(stage, tasks, n_samples, n_features=1, cores=None):
+    """
+    Decide outer versus inner parallelism for `tasks` independent fits
+
+    Parameters:
+    -----------
+    stage : str
+        Name recorded with the plan, e.g. 'train' or 'search'
+    tasks : int
+        Fits the outer loop can run at once (candidates x folds)
+    n_samples, n_features : int
+        Size of the data each fit sees
+    cores : int, optional
+        Cores to use; defaults to those available to this process
+
+    Running both levels with n_jobs=-1 starts cores x cores workers.
+    Instead, whole fits are spread over the cores when there are enough of
+    them or the data is small; otherwise each of the `tasks` fits gets an
+    equal share of the cores for its own threads.
+    """
+    cores = max(1, cores or cpu_count())
+    tasks = max(1, tasks)
+
+    if cores == 1:
+        outer, inner, reason = 1, 1, 'single core'
+    elif tasks == 1:
+        outer, inner, reason = 1, cores, 'one fit uses every core'
+    elif tasks >= cores:
+        outer, inner, reason = cores, 1, 'enough fits to fill the cores'
+    elif n_samples * n_features < LARGE_DATA_CELLS:
+        outer, inner, reason = tasks, 1, 'small data, parallel fits only'
+    else:
+        outer, inner, reason = tasks, cores // tasks, 'large data, cores shared between fits'
+
+    blas = max(1, cores // outer)
+    return ParallelPlan(stage, cores, tasks, n_samples, outer, inner, blas, reason)
@@ -0,0 +1,387 @@
+import time
+import math
+
+import numpy as np
+from scipy.stats import qmc
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import GridSearchCV, ParameterGrid, cross_validate, train_test_split
+
+
+class SearchResult:
+    """Outcome of a hyperparameter search"""
+
+    def __init__(self, strategy, best_params, best_score, best_estimator, candidates, search_time):
+        self.strategy = strategy
+        self.best_params = best_params
+        self.best_score = best_score
+        self.best_estimator = best_estimator
+        self.candidates = candidates
+        self.search_time = search_time
+
+    def time_to_score(self):
+        """
+        Best score found so far against cumulative candidate time
+
+        Returns a list of (seconds, best_score) pairs, one per candidate in
+        evaluation order, for trading search time against accuracy.
+        """
+        curve = []
+        elapsed, best = 0.0, -np.inf
+        for candidate in self.candidates:
+            elapsed += candidate['fit_time']
+            best = max(best, candidate['score'])
+            curve.append((round(elapsed, 4), best))
+        return curve
+
+    def summary(self):
+        """JSON-friendly record for the model history"""
+        return {
+            'strategy': self.strategy,
+            'best_params': self.best_params,
+            'best_score': float(self.best_score),
+            'search_time': round(self.search_time, 4),
+            'n_candidates': len(self.candidates),
+            'candidates': self.candidates
+        }
+
+
+class SearchStrategy:
+    """
+    Base class for hyperparameter search strategies
+
+    Parameters:
+    -----------
+    cv : int or cross-validation generator
+        Folds used to score each candidate
+    scoring : str
+        sklearn scorer name, e.g. 'r2' or 'f1_weighted'
+    n_jobs : int
+        Parallel jobs for cross-validation
+    random_state : int
+        Seed for sampling candidates and data subsets
+    verbose : int
+        Print progress when greater than 0
+    """
+
+    name = None
+
+    def __init__(self, cv=5, scoring=None, n_jobs=-1, random_state=42, verbose=1):
+        self.cv = cv
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.verbose = verbose
+
+    def search(self, estimator, param_grid, X, y):
+        """Search `param_grid` for `estimator` and return a SearchResult with a refit best estimator"""
+        raise NotImplementedError
+
+    def parallel_tasks(self, param_grid):
+        """Fits this strategy can run at once, for planning n_jobs"""
+        return _n_splits(self.cv)
+
+    def _evaluate(self, estimator, params, X, y, **record):
+        """Cross-validate one candidate, recording its score and wall-clock time"""
+        start = time.time()
+        scores = cross_validate(clone(estimator).set_params(**params), X, y, cv=self.cv,
+                                scoring=self.scoring, n_jobs=self.n_jobs)
+        return {
+            'params': params,
+            'score': float(np.mean(scores['test_score'])),
+            'score_std': float(np.std(scores['test_score'])),
+            'fit_time': time.time() - start,
+            **record
+        }
+
+    def _finish(self, estimator, candidates, X, y, start, final_params=None):
+        """Refit the best candidate on all of X, y"""
+        best = max(candidates, key=lambda candidate: candidate['score'])
+        best_params = {**best['params'], **(final_params or {})}
+        best_estimator = clone(estimator).set_params(**best_params).fit(X, y)
+        result = SearchResult(self.name, best_params, best['score'], best_estimator, candidates,
+                              time.time() - start)
+        if self.verbose:
+            print(f"{self.name}: {len(candidates)} candidates in {result.search_time:.1f}s, "
+                  f"best score {result.best_score:.4f}")
+        return result
+
+
+class GridSearch(SearchStrategy):
+    """Exhaustive search over every combination, through GridSearchCV"""
+
+    name = 'grid'
+
+    def parallel_tasks(self, param_grid):
+        return len(ParameterGrid(param_grid)) * _n_splits(self.cv)
+
+    def search(self, estimator, param_grid, X, y):
+        start = time.time()
+        grid_search = GridSearchCV(estimator, param_grid, cv=self.cv, scoring=self.scoring,
+                                   n_jobs=self.n_jobs, verbose=self.verbose)
+        grid_search.fit(X, y)
+
+        # GridSearchCV runs candidates in parallel, so time is the fit and score time spent on each
+        results = grid_search.cv_results_
+        n_splits = grid_search.n_splits_
+        candidates = [{
+            'params': params,
+            'score': float(results['mean_test_score'][i]),
+            'score_std': float(results['std_test_score'][i]),
+            'fit_time': float((results['mean_fit_time'][i] + results['mean_score_time'][i]) * n_splits)
+        } for i, params in enumerate(results['params'])]
+
+        return SearchResult(self.name, grid_search.best_params_, grid_search.best_score_,
+                            grid_search.best_estimator_, candidates, time.time() - start)
+
+
+class RandomSearch(SearchStrategy):
+    """
+    Evaluate `n_iter` combinations sampled from the grid
+
+    `sampler='sobol'` draws them from a scrambled Sobol sequence, which
+    covers every parameter's values more evenly than independent draws.
+    """
+
+    def __init__(self, n_iter=20, sampler='random', **kwargs):
+        super().__init__(**kwargs)
+        self.n_iter = n_iter
+        self.sampler = sampler
+        self.name = sampler
+
+    def search(self, estimator, param_grid, X, y):
+        start = time.time()
+        candidates = [self._evaluate(estimator, params, X, y)
+                      for params in sample_candidates(param_grid, self.n_iter, self.sampler,
+                                                      self.random_state)]
+        return self._finish(estimator, candidates, X, y, start)
+
+
+class SuccessiveHalvingSearch(SearchStrategy):
+    """
+    Successive halving over the number of trees and training samples
+
+    Every candidate is first scored with a small forest on a small random
+    subset of the rows.  Each rung keeps the best 1/`factor` candidates and
+    multiplies both budgets by `factor`, until the last rung runs the full
+    `n_estimators` on all rows.  `n_estimators` is the budget, so it is taken
+    out of the grid; its largest grid value is the full budget.
+
+    Parameters:
+    -----------
+    factor : int
+        Fraction of candidates kept, and growth of the budget, per rung
+    resources : tuple
+        Budgets to grow: 'n_estimators', 'n_samples' or both
+    min_samples : int
+        Fewest rows any candidate is scored on
+    min_estimators : int
+        Fewest trees any candidate is scored with
+    n_iter : int, optional
+        Sample this many candidates instead of taking the whole grid
+    sampler : str
+        'random' or 'sobol', used with `n_iter`
+    """
+
+    name = 'halving'
+
+    def __init__(self, factor=3, resources=('n_estimators', 'n_samples'), min_samples=200,
+                 min_estimators=10, n_iter=None, sampler='sobol', **kwargs):
+        super().__init__(**kwargs)
+        self.factor = factor
+        self.resources = resources
+        self.min_samples = min_samples
+        self.min_estimators = min_estimators
+        self.n_iter = n_iter
+        self.sampler = sampler
+
+    def search(self, estimator, param_grid, X, y):
+        start = time.time()
+        param_grid = dict(param_grid)
+
+        trees = _param_name(estimator, 'n_estimators') if 'n_estimators' in self.resources else None
+        grow_trees = trees is not None
+        grow_samples = 'n_samples' in self.resources
+        if grow_trees:
+            max_estimators = max(param_grid.pop(trees, [estimator.get_params()[trees]]))
+
+        survivors = (list(ParameterGrid(param_grid)) if self.n_iter is None else
+                     sample_candidates(param_grid, self.n_iter, self.sampler, self.random_state))
+        # Rungs run until at most `factor` candidates are left for the full budget
+        n_rungs, remaining = 1, len(survivors)
+        while remaining > self.factor:
+            remaining = math.ceil(remaining / self.factor)
+            n_rungs += 1
+
+        # The smallest budget either resource allows bounds how small the first rung can be
+        n_samples = len(X)
+        floors = [1.0 / self.factor ** (n_rungs - 1)]
+        if grow_samples:
+            floors.append(min(1.0, self.min_samples / n_samples))
+        if grow_trees:
+            floors.append(min(1.0, self.min_estimators / max_estimators))
+        min_fraction = max(floors)
+
+        # Rungs train on growing prefixes of one shuffle, so each subset contains the last
+        order = np.random.RandomState(self.random_state).permutation(n_samples)
+        candidates = []
+        for rung in range(n_rungs):
+            fraction = max(min_fraction, float(self.factor) ** (rung - n_rungs + 1))
+            rows = order[:max(1, round(n_samples * fraction))] if grow_samples else order
+            rows = np.sort(rows)
+            X_rung, y_rung = _take(X, rows), _take(y, rows)
+            budget = {'rung': rung, 'n_samples': len(rows)}
+            if grow_trees:
+                budget['n_estimators'] = max(1, round(max_estimators * fraction))
+
+            scored = []
+            for params in survivors:
+                trial = dict(params, **{trees: budget['n_estimators']}) if grow_trees else params
+                candidate = self._evaluate(estimator, trial, X_rung, y_rung, **budget)
+                candidate['params'] = params
+                scored.append(candidate)
+            candidates.extend(scored)
+
+            if self.verbose:
+                print(f"halving rung {rung}: {len(scored)} candidates on {budget['n_samples']} samples"
+                      + (f", {budget['n_estimators']} trees" if grow_trees else ''))
+
+            scored.sort(key=lambda candidate: candidate['score'], reverse=True)
+            survivors = [candidate['params'] for candidate in scored[:max(1, math.ceil(len(scored) / self.factor))]]
+
+        # Only candidates of the last rung were scored on the full budget
+        final_rung = [candidate for candidate in candidates if candidate['rung'] == n_rungs - 1]
+        result = self._finish(estimator, final_rung, X, y, start,
+                              final_params={trees: max_estimators} if grow_trees else None)
+        result.candidates = candidates
+        return result
+
+
+class EarlyStoppingSearch(SearchStrategy):
+    """
+    Search for boosted models that stops adding trees once validation stops improving
+
+    Each candidate is fit once with up to `max_estimators` rounds on a
+    train/validation split of the data instead of once per fold and per
+    `n_estimators` value.  Boosting stops after `early_stopping_rounds`
+    rounds without improvement, and the best round count becomes the
+    candidate's `n_estimators` for the final refit on all rows.
+    Requires an estimator with an `early_stopping_rounds` parameter
+    (xgboost).
+    """
+
+    name = 'early_stopping'
+
+    def __init__(self, max_estimators=500, early_stopping_rounds=20, validation_fraction=0.2,
+                 n_iter=None, sampler='sobol', **kwargs):
+        super().__init__(**kwargs)
+        self.max_estimators = max_estimators
+        self.early_stopping_rounds = early_stopping_rounds
+        self.validation_fraction = validation_fraction
+        self.n_iter = n_iter
+        self.sampler = sampler
+
+    def parallel_tasks(self, param_grid):
+        return 1
+
+    def search(self, estimator, param_grid, X, y):
+        if 'early_stopping_rounds' not in estimator.get_params():
+            raise ValueError(f"{type(estimator).__name__} does not support early stopping")
+
+        start = time.time()
+        param_grid = {name: values for name, values in param_grid.items() if name != 'n_estimators'}
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=self.validation_fraction, random_state=self.random_state,
+            stratify=y if is_classifier(estimator) else None
+        )
+        scorer = get_scorer(self.scoring) if self.scoring else None
+
+        candidates = []
+        for params in (list(ParameterGrid(param_grid)) if self.n_iter is None else
+                       sample_candidates(param_grid, self.n_iter, self.sampler, self.random_state)):
+            fit_start = time.time()
+            model = clone(estimator).set_params(n_estimators=self.max_estimators,
+                                                early_stopping_rounds=self.early_stopping_rounds, **params)
+            model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+            score = scorer(model, X_val, y_val) if scorer else model.score(X_val, y_val)
+            candidates.append({
+                'params': dict(params, n_estimators=int(model.best_iteration) + 1),
+                'score': float(score),
+                'fit_time': time.time() - fit_start,
+                'rounds_trained': int(model.get_booster().num_boosted_rounds())
+            })
+
+        return self._finish(estimator, candidates, X, y, start,
+                            final_params={'early_stopping_rounds': None})
+
+
+STRATEGIES = {
+    'grid': GridSearch,
+    'random': lambda **kwargs: RandomSearch(sampler='random', **kwargs),
+    'sobol': lambda **kwargs: RandomSearch(sampler='sobol', **kwargs),
+    'halving': SuccessiveHalvingSearch,
+    'early_stopping': EarlyStoppingSearch
+}
+
+
+def get_strategy(strategy, **kwargs):
+    """Build a search strategy from its name; instances are returned as they are"""
+    if isinstance(strategy, SearchStrategy):
+        return strategy
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy '{strategy}'. Choose from {sorted(STRATEGIES)}")
+    return STRATEGIES[strategy](**kwargs)
+
+
+def sample_candidates(param_grid, n_iter, sampler='random', random_state=42):
+    """
+    Up to `n_iter` distinct combinations from a grid of discrete values
+
+    'random' draws combinations uniformly; 'sobol' maps points of a
+    scrambled Sobol sequence onto the value lists, one dimension per
+    parameter.
+    """
+    grid = list(ParameterGrid(param_grid))
+    if n_iter >= len(grid):
+        return grid
+
+    names = sorted(param_grid)
+    sizes = np.array([len(param_grid[name]) for name in names])
+    if sampler == 'sobol':
+        points = qmc.Sobol(len(names), scramble=True, seed=random_state).random_base2(
+            max(1, math.ceil(math.log2(n_iter * 2))))
+    elif sampler == 'random':
+        points = np.random.RandomState(random_state).random_sample((n_iter * 4, len(names)))
+    else:
+        raise ValueError(f"Unknown sampler '{sampler}'")
+
+    candidates, seen = [], set()
+    for index in np.minimum((points * sizes).astype(int), sizes - 1):
+        key = tuple(index)
+        if key in seen:
+            continue
+        seen.add(key)
+        candidates.append({name: param_grid[name][i] for name, i in zip(names, index)})
+        if len(candidates) == n_iter:
+            break
+    return candidates
+
+
+def _param_name(estimator, name):
+    """Key of parameter `name` in estimator.get_params(), allowing for a Pipeline step prefix"""
+    params = estimator.get_params()
+    if name in params:
+        return name
+    return next((key for key in params if key.endswith('__' + name)), None)
+
+
+def _n_splits(cv):
+    """Number of folds of a cv argument"""
+    if cv is None:
+        return 5
+    return cv if isinstance(cv, int) else cv.get_n_splits()
+
+
+def _take(data, rows):
+    """Rows of an array, DataFrame or Series by position"""
+    return data.iloc[rows] if hasattr(data, 'iloc') else data[rows]
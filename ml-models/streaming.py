@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantiles of a stream in bounded memory
+
+    A stack of compactors: values land in level 0, and a level holding
+    more than `k` values is sorted and every other value, from a random
+    offset, moves up a level where each stands for twice as many.  Memory
+    stays near k x log2(n / k) values and the rank error of a quantile is
+    roughly log2(n / k) / k; up to `k` values it is exact.  NaNs are
+    ignored.
+    """
+
+    def __init__(self, k=4096, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.RandomState(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+    def merge(self, other):
+        """Fold another sketch's values into this one"""
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self._compact()
+
+    def quantile(self, q):
+        """Value at quantile `q` (a float or array of floats in [0, 1])"""
+        if not self.count:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** level) for level, v in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        ranks = np.cumsum(weights[order])
+        index = np.searchsorted(ranks, np.asarray(q) * ranks[-1], side='left')
+        return values[order][np.minimum(index, len(values) - 1)]
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self.k:
+                values = np.sort(values)
+                # An odd value out stays behind so every promoted value stands for exactly two
+                keep = values[len(values) - len(values) % 2:]
+                promoted = values[:len(values) - len(keep)][self._rng.randint(2)::2]
+                self.levels[level] = keep
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+
+class ChunkCache:
+    """
+    Cleaned data on disk as numbered chunks, each column its own array
+
+    Every chunk is an .npz file with one array per column, so readers load
+    only the columns they ask for, one chunk at a time.  `manifest.json`
+    lists the columns and rows per chunk.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'columns': None, 'rows': []}
+
+    @property
+    def columns(self):
+        return self.manifest['columns']
+
+    def __len__(self):
+        """Number of rows"""
+        return sum(self.manifest['rows'])
+
+    def append(self, frame):
+        """Write a DataFrame of numeric columns as the next chunk"""
+        if self.columns is None:
+            self.manifest['columns'] = frame.columns.tolist()
+        path = os.path.join(self.directory, f"chunk-{len(self.manifest['rows']):05d}.npz")
+        np.savez(path, **{column: frame[column].to_numpy() for column in self.columns})
+        self.manifest['rows'].append(len(frame))
+        self._write_manifest()
+
+    def chunks(self, columns=None):
+        """Yield each chunk as a DataFrame of `columns` (default all)"""
+        for index in range(len(self.manifest['rows'])):
+            with np.load(os.path.join(self.directory, f'chunk-{index:05d}.npz')) as data:
+                yield pd.DataFrame({column: data[column] for column in columns or self.columns})
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, 'chunk-*.npz')):
+            os.remove(path)
+        self.manifest = {'columns': None, 'rows': []}
+        self._write_manifest()
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, self.MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,126 @@
+"""
+Test cases for model loading in backend/ai_engine.py
+"""
+import unittest
+import tempfile
+import threading
+import sys
+import os
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+import pandas as pd
+
+import ai_engine
+from ai_engine import ModelNotReady, NutritionAI
+
+USER = {'age': 30, 'weight': 70, 'height': 175}
+
+class TestModelLoading(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.model_dir = tmp.name
+
+    def test_nothing_loads_until_first_use(self):
+        """Test construction is cheap and a missing model is reported, not trained"""
+        ai = NutritionAI(model_dir=self.model_dir, train_if_missing=False)
+        self.assertFalse(ai.ready)
+        with self.assertRaises(ModelNotReady):
+            ai.analyze_meal([{'name': 'apple'}], USER)
+        self.assertIn('ai_engine.py train', ai.status()['error'])
+
+    def test_published_version_is_loaded(self):
+        """Test the latest trained version is served"""
+        ai_engine.train_and_publish(self.model_dir)
+        version = ai_engine.train_and_publish(self.model_dir)
+        self.assertEqual(ai_engine.latest_version(self.model_dir), version)
+
+        ai = NutritionAI(model_dir=self.model_dir, train_if_missing=False)
+        analysis = ai.analyze_meal([{'name': 'apple'}], USER)
+        self.assertEqual(analysis['health_risk']['level'], 'Low Risk')
+        self.assertIsNotNone(ai.risk_predictor)
+        status = ai.status()
+        self.assertEqual((status['ready'], status['version'], status['error']), (True, version, None))
+        self.assertNotIn('batching', status)
+
+    def test_batching_is_opt_in(self):
+        """Test risk predictions go through the micro-batcher once a batch size is configured"""
+        ai_engine.train_and_publish(self.model_dir)
+        with mock.patch.object(ai_engine, 'RISK_BATCH_SIZE', 32):
+            ai = NutritionAI(model_dir=self.model_dir, train_if_missing=False)
+        analysis = ai.analyze_meal([{'name': 'apple'}], USER)
+        self.assertEqual(analysis['health_risk']['level'], 'Low Risk')
+        self.assertEqual(ai.status()['batching']['rows'], 1)
+
+    def test_bundle_is_verified(self):
+        """Test the bundle carries its schema and a corrupted one is refused"""
+        version = ai_engine.train_and_publish(self.model_dir)
+        bundle = ai_engine.load_bundle(self.model_dir, version)
+        self.assertEqual(tuple(bundle['metadata']['features']), ai_engine.RISK_FEATURES)
+        self.assertTrue(hasattr(bundle['scaler'], 'mean_'))
+
+        with open(os.path.join(self.model_dir, version, ai_engine.BUNDLE_FILE), 'ab') as f:
+            f.write(b'corrupt')
+        ai = NutritionAI(model_dir=self.model_dir, train_if_missing=False)
+        with self.assertRaises(ModelNotReady):
+            ai.load_or_train_models()
+        self.assertIn('checksum', ai.status()['error'])
+
+    def test_concurrent_first_use_trains_once(self):
+        """Test threads racing on a missing model share one training run"""
+        ai = NutritionAI(model_dir=self.model_dir, train_if_missing=True)
+        threads = [threading.Thread(target=ai.load_or_train_models) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(ai.ready)
+        versions = [name for name in os.listdir(self.model_dir) if not name.startswith('.')
+                    and name != ai_engine.LATEST_FILE]
+        self.assertEqual(versions, [ai.model_version])
+
+class TestCommunityHealth(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        ai_engine.train_and_publish(cls.tmp.name)
+        cls.ai = NutritionAI(model_dir=cls.tmp.name, train_if_missing=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_per_user_analysis(self):
+        """Test the batched analysis agrees with scoring users one at a time"""
+        rng = np.random.RandomState(3)
+        users = [{'age': int(rng.randint(18, 70)), 'weight': float(rng.uniform(45, 130)),
+                  'height': float(rng.uniform(150, 200)), 'avg_calories': float(rng.uniform(1200, 3200))}
+                 for _ in range(500)]
+        users[0] = {}  # Every field defaulted
+        users[1]['avg_fats'] = 120.0
+
+        scores = []
+        for user in users:
+            calories = user.get('avg_calories', 2000)
+            nutrients = {'calories': calories, 'protein': user.get('weight', 70) * 1.2,
+                         'carbs': calories * 0.5 / 4, 'fats': user.get('avg_fats', calories * 0.3 / 9)}
+            scores.append(self.ai.calculate_health_risk(user, nutrients)['score'])
+        bmis = [self.ai.calculate_bmi(u.get('weight', 70), u.get('height', 170))['value'] for u in users]
+
+        stats = self.ai.analyze_community_health(users)['community_stats']
+        self.assertEqual(stats['sample_size'], 500)
+        self.assertEqual(stats['avg_bmi'], round(np.mean(bmis), 1))
+        self.assertEqual(stats['obesity_rate'], round(sum(b >= 30 for b in bmis) / 5, 1))
+        self.assertEqual(stats['health_risk_distribution'],
+                         {'low_risk': round(scores.count(0) / 5, 1), 'medium_risk': round(scores.count(1) / 5, 1),
+                          'high_risk': round(scores.count(2) / 5, 1)})
+        self.assertEqual(self.ai.analyze_community_health(pd.DataFrame(users))['community_stats'], stats)
+
+    def test_empty_community(self):
+        """Test an empty community is reported as such"""
+        self.assertEqual(self.ai.analyze_community_health([]), {'error': 'No data available'})
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,513 @@
+"""
+Test cases for the nutrition API in backend/app.py
+"""
+import unittest
+import tempfile
+import threading
+import sys
+import os
+import runpy
+import shlex
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import app as nutrition_app
+import ai_engine
+from ai_engine import NutritionAI, train_and_publish
+from meal_snapshot import MealSnapshot
+
+class AppTestCase(unittest.TestCase):
+    """Base class that registers a user against a fresh in-memory state"""
+
+    def setUp(self):
+        """Set up test client and a registered user"""
+        nutrition_app.state.clear()
+        nutrition_app.reset_derived_state()
+        nutrition_app.app.config['TESTING'] = True
+        self.client = nutrition_app.app.test_client()
+
+        response = self.client.post('/api/auth/register', json={
+            'email': 'test@example.com',
+            'password': 'password123',
+            'weight': 75,
+            'height': 175,
+            'goal': 'weight_loss'
+        })
+        self.user_id = response.get_json()['user']['id']
+        self.headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+    def analyze(self, food_items, **extra):
+        """Post a single meal for analysis"""
+        return self.client.post('/api/analyze', json={'food_items': food_items, **extra},
+                                headers=self.headers)
+
+
+class TestAnalyzeMeal(AppTestCase):
+    """Test cases for single meal analysis"""
+
+    def test_analyze_meal(self):
+        """Test a meal is totalled, scored and saved"""
+        response = self.analyze([{'name': 'Grilled Chicken Breast', 'quantity': 2},
+                                 {'name': 'quinoa'}])
+        self.assertEqual(response.status_code, 200)
+        analysis = response.get_json()['analysis']
+        self.assertEqual(analysis['nutrition']['calories'], 165 * 2 + 150)
+        self.assertEqual(analysis['food_details'][0]['nutrition']['protein'], 62)
+        self.assertIn('meal_score', analysis['health_assessment'])
+        self.assertEqual(nutrition_app.meals_db.count(self.user_id), 1)
+
+    def test_analyze_requires_food_items(self):
+        """Test missing food items are rejected"""
+        self.assertEqual(self.analyze([]).status_code, 400)
+
+    def test_analyze_requires_auth(self):
+        """Test analysis requires a valid token"""
+        response = self.client.post('/api/analyze', json={'food_items': [{'name': 'apple'}]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_profile_values_follow_profile(self):
+        """Test BMI and targets follow profile updates"""
+        first = self.analyze([{'name': 'apple'}]).get_json()['analysis']
+        self.client.put('/api/user/profile', json={'profile': {'weight': 95}}, headers=self.headers)
+        second = self.analyze([{'name': 'apple'}]).get_json()['analysis']
+        self.assertEqual(first['bmi_context']['value'], 24.5)
+        self.assertEqual(second['bmi_context']['value'], 31.0)
+        self.assertEqual(second['bmi_context']['category'], 'Obese')
+        self.assertGreater(second['comparison']['daily_targets']['calories'],
+                           first['comparison']['daily_targets']['calories'])
+
+        # A profile written by another worker is picked up from its fields alone
+        user = dict(nutrition_app.users_db[self.user_id],
+                    profile={**nutrition_app.users_db[self.user_id]['profile'], 'weight': 60})
+        nutrition_app.state.backend.put('users', self.user_id, user)
+        third = self.analyze([{'name': 'apple'}]).get_json()['analysis']
+        self.assertEqual(third['bmi_context']['value'], 19.6)
+
+
+class TestAnalyzeBatch(AppTestCase):
+    """Test cases for batch meal analysis"""
+
+    def test_batch_matches_single_analysis(self):
+        """Test batch results agree with the single-meal endpoint"""
+        items = [{'name': 'salmon'}, {'name': 'rice', 'quantity': 2}, {'name': 'broccoli'}]
+        batch = self.client.post('/api/analyze/batch', json={'meals': [{'food_items': items}]},
+                                 headers=self.headers).get_json()
+        single = self.analyze(items).get_json()
+
+        batch_analysis = batch['results'][0]['analysis']
+        for key in ('nutrition', 'health_assessment', 'comparison', 'recommendations'):
+            self.assertEqual(batch_analysis[key], single['analysis'][key])
+
+    def test_batch_reports_errors_in_order(self):
+        """Test invalid meals fail individually without failing the batch"""
+        response = self.client.post('/api/analyze/batch', json={'meals': [
+            {'food_items': [{'name': 'apple'}], 'timestamp': '2024-01-02T08:30:00'},
+            {'food_items': []},
+            'not a meal',
+            {'food_items': [{'name': 'eggs', 'quantity': 'two'}]},
+            {'food_items': [{'name': 'banana'}], 'timestamp': 'yesterday'},
+            {'food_items': [{'name': 'milk'}], 'meal_type': 'snack'},
+            {'food_items': [{'name': 'rice'}], 'timestamp': (datetime.now() + timedelta(days=1)).isoformat()},
+            {'food_items': [{'name': 'rice'}], 'timestamp': (datetime.now() + timedelta(minutes=1)).isoformat()},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+
+        self.assertEqual([r['index'] for r in data['results']], list(range(8)))
+        self.assertEqual([r['success'] for r in data['results']],
+                         [True, False, False, False, False, True, False, True])
+        self.assertEqual(data['results'][6]['error'], 'Timestamp is in the future')
+        self.assertEqual(data['summary'], {'total': 8, 'succeeded': 3, 'failed': 5})
+
+        meals = nutrition_app.meals_db.range(self.user_id)
+        self.assertEqual(len(meals), 3)
+        self.assertEqual(meals[0]['timestamp'], '2024-01-02T08:30:00')
+        self.assertEqual(meals[1]['meal_type'], 'snack')
+
+    def test_batch_limits(self):
+        """Test empty and oversized batches are rejected"""
+        response = self.client.post('/api/analyze/batch', json={'meals': []}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        meals = [{'food_items': [{'name': 'apple'}]}] * (nutrition_app.MAX_BATCH_MEALS + 1)
+        response = self.client.post('/api/analyze/batch', json={'meals': meals}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class TestMealHistory(AppTestCase):
+    """Test cases for meal history endpoints"""
+
+    def test_meals_are_paginated_newest_first(self):
+        """Test pagination and date filters on /api/meals"""
+        self.client.post('/api/analyze/batch', json={'meals': [
+            {'food_items': [{'name': 'apple'}], 'timestamp': f'2024-01-0{day}T12:00:00',
+             'meal_type': 'lunch' if day % 2 else 'dinner'}
+            for day in range(1, 6)
+        ]}, headers=self.headers)
+
+        data = self.client.get('/api/meals?limit=2&offset=1', headers=self.headers).get_json()
+        self.assertEqual([m['timestamp'][:10] for m in data['meals']], ['2024-01-04', '2024-01-03'])
+        self.assertEqual(data['pagination']['total'], 5)
+        self.assertTrue(data['pagination']['has_more'])
+
+        data = self.client.get('/api/meals?start_date=2024-01-02&end_date=2024-01-04T23:59:59',
+                               headers=self.headers).get_json()
+        self.assertEqual(data['pagination']['total'], 3)
+
+        data = self.client.get('/api/meals?meal_type=lunch', headers=self.headers).get_json()
+        self.assertEqual([m['timestamp'][:10] for m in data['meals']],
+                         ['2024-01-05', '2024-01-03', '2024-01-01'])
+
+    def test_get_and_delete_meal(self):
+        """Test fetching and deleting a meal by id"""
+        self.analyze([{'name': 'apple'}])
+        meal_id = nutrition_app.meals_db.newest(self.user_id, 1)[0]['id']
+
+        response = self.client.get(f'/api/meals/{meal_id}', headers=self.headers)
+        self.assertEqual(response.get_json()['meal']['id'], meal_id)
+
+        response = self.client.delete(f'/api/meals/{meal_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/api/meals/{meal_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_pagination(self):
+        """Test next_cursor walks the whole history without repeats"""
+        for name in ('apple', 'banana', 'rice', 'salmon', 'eggs'):
+            self.analyze([{'name': name}])
+        seen = []
+        cursor = None
+        while True:
+            query = '/api/meals?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            pagination = self.client.get(query, headers=self.headers).get_json()
+            seen += [m['foods'][0]['name'] for m in pagination['meals']]
+            cursor = pagination['pagination']['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, ['Eggs', 'Salmon', 'Rice', 'Banana', 'Apple'])
+
+    def test_cursor_pagination_with_ties_and_meal_type(self):
+        """Test cursors over equal timestamps, filtered or not, neither skip nor repeat meals"""
+        self.client.post('/api/analyze/batch', json={'meals': [
+            {'food_items': [{'name': name}], 'timestamp': '2024-01-01T12:00:00', 'meal_type': 'lunch'}
+            for name in ('apple', 'banana', 'rice', 'salmon')
+        ]}, headers=self.headers)
+        expected = [m['id'] for m in self.client.get('/api/meals', headers=self.headers).get_json()['meals']]
+
+        for query in ('/api/meals?limit=2', '/api/meals?limit=2&meal_type=lunch'):
+            seen, pages, cursor = [], 0, None
+            while True:
+                data = self.client.get(query + (f'&cursor={cursor}' if cursor else ''),
+                                       headers=self.headers).get_json()
+                seen += [m['id'] for m in data['meals']]
+                pages += 1
+                cursor = data['pagination']['next_cursor']
+                if not cursor:
+                    break
+            self.assertEqual(seen, expected, query)
+            self.assertEqual(pages, 2, query)  # The second page is full and ends the walk
+
+    def test_malformed_cursor_is_rejected(self):
+        """Test a bad cursor is a client error"""
+        self.analyze([{'name': 'apple'}])
+        for cursor in ('garbage', 'not-a-date|abc'):
+            response = self.client.get(f'/api/meals?cursor={cursor}', headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+
+    def test_meals_from_other_workers_are_synced(self):
+        """Test meals written to shared storage elsewhere appear and disappear"""
+        self.analyze([{'name': 'apple'}])
+        meal = dict(nutrition_app.meals_db.newest(self.user_id, 1)[0], id='from-another-worker')
+        key = nutrition_app.meal_key(self.user_id, meal['id'])
+        nutrition_app.state.backend.put('meals', key, meal)
+
+        response = self.client.get('/api/meals/from-another-worker', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(nutrition_app.community_stats.total_meals, 2)
+
+        nutrition_app.state.backend.delete('meals', key)
+        response = self.client.get('/api/meals/from-another-worker', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(nutrition_app.community_stats.total_meals, 1)
+
+    def test_sync_during_a_write_counts_the_meal_once(self):
+        """Test a sync on another thread between publishing and applying a meal"""
+        put_many = nutrition_app.state.put_many
+        syncs = []
+
+        def publish_then_sync(namespace, records):
+            put_many(namespace, records)
+            syncs.append(threading.Thread(target=nutrition_app.sync_shared_state))
+            syncs[-1].start()
+            syncs[-1].join(0.2)  # Blocks until this write has been applied locally
+
+        with mock.patch.object(nutrition_app.state, 'put_many', side_effect=publish_then_sync):
+            self.analyze([{'name': 'apple'}])
+        syncs[0].join()
+
+        self.assertEqual(nutrition_app.meals_db.count(self.user_id), 1)
+        self.assertEqual(nutrition_app.community_stats.total_meals, 1)
+        self.assertEqual(nutrition_app.user_stats[self.user_id].window(datetime.now().toordinal())[2], 1)
+
+    def test_stats_write_keeps_a_profile_from_another_worker(self):
+        """Test storing stats after a meal does not write back this worker's stale user record"""
+        self.analyze([{'name': 'apple'}])
+        user = dict(nutrition_app.users_db[self.user_id], name='Renamed elsewhere')
+        nutrition_app.state.backend.put('users', self.user_id, user)
+        with mock.patch.object(nutrition_app.state, 'sync', return_value=[]):
+            self.analyze([{'name': 'salmon'}])
+        self.assertEqual(nutrition_app.state.backend.get('users', self.user_id)['name'], 'Renamed elsewhere')
+        self.assertEqual(nutrition_app.state.get('user_stats', self.user_id)['meals_logged_7d'], 2)
+
+    def test_sync_skips_while_another_thread_polls(self):
+        """Test a request does not wait for the change-feed poll another thread is running"""
+        with nutrition_app.sync_lock:
+            sync = threading.Thread(target=nutrition_app.sync_shared_state)
+            sync.start()
+            sync.join(1)
+            self.assertFalse(sync.is_alive())
+
+    def test_restart_from_meal_snapshot(self):
+        """Test a worker started from the meal snapshot matches one that re-read every meal"""
+        self.analyze([{'name': 'apple'}, {'name': 'banana'}])
+        self.analyze([{'name': 'salmon'}])
+        with tempfile.TemporaryDirectory() as tmp:
+            self.addCleanup(nutrition_app.app.config.__setitem__, 'MEAL_SNAPSHOT_PATH',
+                            nutrition_app.app.config['MEAL_SNAPSHOT_PATH'])
+            nutrition_app.app.config['MEAL_SNAPSHOT_PATH'] = os.path.join(tmp, 'meals.snap')
+            nutrition_app.save_meal_snapshot()
+            self.analyze([{'name': 'chicken breast'}])  # Written after the snapshot
+            expected = self.client.get('/api/meals', headers=self.headers).get_json()['meals']
+
+            nutrition_app.reset_derived_state()
+            self.assertTrue(nutrition_app.load_meal_snapshot())
+            self.assertEqual(self.client.get('/api/meals', headers=self.headers).get_json()['meals'],
+                             expected)
+            self.assertEqual(nutrition_app.community_stats.total_meals, 3)
+            self.assertEqual(nutrition_app.community_stats.foods.top(1), [('Apple', 1)])
+            self.assertEqual(nutrition_app.calculate_streak(self.user_id), 1)
+            self.assertEqual(nutrition_app.state.get('user_stats', self.user_id)['meals_logged_7d'], 3)
+
+            # Nothing to replay now, so records stay encoded until read, and survive another save
+            nutrition_app.save_meal_snapshot()
+            for _ in range(2):
+                nutrition_app.reset_derived_state()
+                self.assertTrue(nutrition_app.load_meal_snapshot())
+                self.assertIsNotNone(nutrition_app.meals_db.pending(self.user_id))
+                self.assertEqual(nutrition_app.meals_db.count(self.user_id), 3)
+                nutrition_app.save_meal_snapshot()
+            self.assertEqual(self.client.get('/api/meals', headers=self.headers).get_json()['meals'],
+                             expected)
+            self.assertIsNone(nutrition_app.meals_db.pending(self.user_id))
+
+    def test_large_meal_snapshot_loads_quickly(self):
+        """Test aggregates for 200k snapshot meals are built without a per-meal loop"""
+        start = datetime(2024, 1, 1)
+        histories = []
+        for user in range(2000):
+            times = [start + timedelta(hours=5 * i + user % 7) for i in range(100)]
+            meals = [{'id': f'm{i}', 'timestamp': t.isoformat(), 'foods': [{'name': f'food {(user + i) % 300}'}],
+                      'analysis': {'nutrition': {'calories': 500}, 'health_assessment': {'meal_score': 70}}}
+                     for i, t in enumerate(times)]
+            histories.append((f'user-{user}', [t.timestamp() for t in times], meals))
+        with tempfile.TemporaryDirectory() as tmp:
+            self.addCleanup(nutrition_app.app.config.__setitem__, 'MEAL_SNAPSHOT_PATH',
+                            nutrition_app.app.config['MEAL_SNAPSHOT_PATH'])
+            nutrition_app.app.config['MEAL_SNAPSHOT_PATH'] = os.path.join(tmp, 'meals.snap')
+            MealSnapshot.write(nutrition_app.app.config['MEAL_SNAPSHOT_PATH'], nutrition_app.state.seq, histories)
+            # Only the meal history lives in the snapshot; the store itself holds no meals here
+            with mock.patch.object(nutrition_app.state, 'count', return_value=200000):
+                began = time.perf_counter()
+                self.assertTrue(nutrition_app.load_meal_snapshot())
+                elapsed = time.perf_counter() - began
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(nutrition_app.community_stats.total_meals, 200000)
+        self.assertEqual(nutrition_app.community_stats.avg_meal_score(), 70)
+        food_counts = Counter(food['name'] for _, _, meals in histories for meal in meals for food in meal['foods'])
+        self.assertEqual(nutrition_app.community_stats.top_foods(1), food_counts.most_common(1))
+        self.assertEqual(nutrition_app.day_logs['user-0'].run, 21)
+        self.assertEqual(nutrition_app.user_stats['user-0'].window(start.toordinal() + 20)[2], 32)
+
+
+class TestUserStats(AppTestCase):
+    """Test cases for rolling user statistics"""
+
+    def test_stats_follow_inserts_and_deletes(self):
+        """Test stats update on analyze and delete without rescanning"""
+        first = self.analyze([{'name': 'apple'}]).get_json()['analysis']
+        self.analyze([{'name': 'salmon'}])
+        stats = nutrition_app.state.get('user_stats', self.user_id)
+        self.assertEqual(stats['meals_logged_7d'], 2)
+        self.assertEqual(stats['avg_daily_calories'], round((95 + 206) / 2))
+
+        meal_id = nutrition_app.meals_db.newest(self.user_id, 1)[0]['id']
+        self.client.delete(f'/api/meals/{meal_id}', headers=self.headers)
+        stats = nutrition_app.state.get('user_stats', self.user_id)
+        self.assertEqual(stats['meals_logged_7d'], 1)
+        self.assertEqual(stats['avg_meal_score'], first['health_assessment']['meal_score'])
+
+    def test_profile_read_does_not_write(self):
+        """Test GET /api/user/profile reports stats without writing to shared storage"""
+        self.analyze([{'name': 'apple'}])
+        seq = nutrition_app.state.backend.sequence()
+        response = self.client.get('/api/user/profile', headers=self.headers)
+        self.assertEqual(response.get_json()['profile']['statistics']['avg_daily_calories'], 95)
+        self.assertEqual(nutrition_app.state.backend.sequence(), seq)
+
+    def test_old_meals_are_outside_the_window(self):
+        """Test meals older than seven days are not counted"""
+        self.client.post('/api/analyze/batch', json={'meals': [
+            {'food_items': [{'name': 'apple'}], 'timestamp': '2020-01-01T12:00:00'},
+            {'food_items': [{'name': 'banana'}]},
+        ]}, headers=self.headers)
+        stats = nutrition_app.state.get('user_stats', self.user_id)
+        self.assertEqual(stats['meals_logged_7d'], 1)
+        self.assertEqual(stats['avg_daily_calories'], 105)
+
+    def test_streak_and_leaderboard(self):
+        """Test streaks follow back-dated meals and deletes"""
+        yesterday = (datetime.now() - timedelta(days=1)).replace(hour=12).isoformat()
+        self.client.post('/api/analyze/batch', json={'meals': [
+            {'food_items': [{'name': 'apple'}], 'timestamp': yesterday},
+            {'food_items': [{'name': 'banana'}]},
+        ]}, headers=self.headers)
+        self.assertEqual(nutrition_app.calculate_streak(self.user_id), 2)
+        self.assertEqual(nutrition_app.get_consistency_leaders(),
+                         [{'name': 'Test', 'streak': 2, 'meals_logged': 2}])
+
+        meal_id = nutrition_app.meals_db.newest(self.user_id, 1)[0]['id']
+        self.client.delete(f'/api/meals/{meal_id}', headers=self.headers)
+        self.assertEqual(nutrition_app.calculate_streak(self.user_id), 0)
+        self.assertEqual(nutrition_app.get_consistency_leaders(), [])
+
+
+class TestCommunityInsights(AppTestCase):
+    """Test cases for the community insights snapshot"""
+
+    def insights(self):
+        return self.client.get('/api/community/insights').get_json()
+
+    def test_insights_follow_writes(self):
+        """Test aggregates track meals, deletes and profile changes"""
+        nutrition_app.app.config['COMMUNITY_MAX_STALENESS'] = 0
+        self.analyze([{'name': 'apple'}, {'name': 'rice'}])
+        self.analyze([{'name': 'apple'}])
+        data = self.insights()
+        self.assertEqual(data['insights']['overview']['total_meals_logged'], 2)
+        self.assertEqual(data['insights']['overview']['active_users_7d'], 1)
+        self.assertEqual(data['insights']['health_stats']['most_common_foods'][0],
+                         {'food': 'Apple', 'count': 2})
+        self.assertEqual(data['insights']['health_stats']['goal_distribution'], {'weight_loss': 1})
+        self.assertEqual(data['leaderboards']['meal_quality'][0]['meals_logged'], 2)
+
+        self.client.put('/api/user/profile', json={'profile': {'goal': 'muscle_gain', 'weight': 120}},
+                        headers=self.headers)
+        for meal in nutrition_app.meals_db.range(self.user_id):
+            self.client.delete(f"/api/meals/{meal['id']}", headers=self.headers)
+        data = self.insights()
+        self.assertEqual(data['insights']['overview']['total_meals_logged'], 0)
+        self.assertEqual(data['insights']['overview']['active_users_7d'], 0)
+        self.assertEqual(data['insights']['health_stats']['most_common_foods'], [])
+        self.assertEqual(data['insights']['health_stats']['goal_distribution'], {'muscle_gain': 1})
+        self.assertEqual(data['insights']['health_stats']['bmi_distribution']['Obese'], 100)
+        self.assertEqual(data['leaderboards']['meal_quality'], [])
+
+    def test_snapshot_respects_staleness(self):
+        """Test the snapshot is reused within the staleness bound"""
+        nutrition_app.app.config['COMMUNITY_MAX_STALENESS'] = 3600
+        self.assertEqual(self.insights()['insights']['overview']['total_meals_logged'], 0)
+        self.analyze([{'name': 'apple'}])
+        self.assertEqual(self.insights()['insights']['overview']['total_meals_logged'], 0)
+        nutrition_app.community_stats.invalidate()
+        self.assertEqual(self.insights()['insights']['overview']['total_meals_logged'], 1)
+
+
+class TestReadiness(unittest.TestCase):
+    """Test cases for the readiness probe"""
+
+    def test_ready_once_model_is_loaded(self):
+        """Test /api/ready answers 503 until the model is warm"""
+        client = nutrition_app.app.test_client()
+        with tempfile.TemporaryDirectory() as model_dir:
+            ai = NutritionAI(model_dir=model_dir, train_if_missing=False)
+            with mock.patch.object(nutrition_app, 'nutrition_ai', ai):
+                self.assertEqual(client.get('/api/ready').status_code, 503)
+                ai.train_models()
+                response = client.get('/api/ready')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json()['model']['version'], ai.model_version)
+
+
+    def test_probe_starts_loading_the_model(self):
+        """Test /api/ready loads a published model even if nothing warmed it"""
+        client = nutrition_app.app.test_client()
+        with tempfile.TemporaryDirectory() as model_dir:
+            version = train_and_publish(model_dir)
+            ai = NutritionAI(model_dir=model_dir, train_if_missing=False)
+            with mock.patch.object(nutrition_app, 'nutrition_ai', ai):
+                client.get('/api/ready')
+                ai._warmer.join(30)
+                response = client.get('/api/ready')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json()['model']['version'], version)
+
+    def test_production_start_command(self):
+        """Test render.yaml starts gunicorn with its config, and that config warms the model"""
+        root = os.path.join(os.path.dirname(__file__), '..')
+        with open(os.path.join(root, 'render.yaml')) as f:
+            command = next(line.split(':', 1)[1] for line in f if line.strip().startswith('startCommand:'))
+        args = shlex.split(command)
+        self.assertEqual(args[0], 'gunicorn')
+        config = runpy.run_path(os.path.join(root, args[args.index('-c') + 1]))
+        module, attr = args[-1].split(':')
+        self.assertTrue(os.path.exists(os.path.join(config['chdir'], f'{module}.py')))
+        self.assertTrue(hasattr(nutrition_app, attr))
+        self.assertTrue(any(env.startswith('NUTRIAI_STATE_DB=') for env in config['raw_env']))
+
+        with tempfile.TemporaryDirectory() as model_dir:
+            train_and_publish(model_dir)
+            ai = NutritionAI(model_dir=model_dir, train_if_missing=False)
+            with mock.patch.object(ai_engine, 'nutrition_ai', ai):
+                config['post_worker_init'](None)
+                ai._warmer.join(30)
+            self.assertTrue(ai.ready)
+
+
+class TestScoring(unittest.TestCase):
+    """Test cases for vectorized scoring helpers"""
+
+    def test_scores_for_a_batch_of_meals(self):
+        """Test batch risk and meal scores against hand-computed values"""
+        calories = [300, 850, 1200, 950]
+        protein = [10, 25, 45, 12]
+        carbs = [40, 120, 90, 60]
+        fats = [10, 28, 50, 35]
+        fiber = [2, 3, 12, 1]
+
+        risks = nutrition_app.calculate_risk_scores(calories, fats, carbs, 27.0)
+        self.assertEqual([(r['score'], r['level']) for r in risks],
+                         [(1, 'Moderate Risk'), (4, 'High Risk'), (5, 'Very High Risk'), (3, 'High Risk')])
+        self.assertEqual(risks[1]['factors'], ['Moderate-high calorie intake', 'Moderate-high fat content',
+                                               'High carbohydrate content', 'Overweight BMI range'])
+        self.assertEqual(risks[2]['factors'], ['High calorie intake', 'High fat content',
+                                               'Overweight BMI range'])
+
+        # 100; 100 - 5 + 2.5; 100 - 30 + 10 + 10; 100 - 15 - 15
+        scores = nutrition_app.calculate_meal_scores(calories, protein, carbs, fats, fiber)
+        self.assertEqual(scores, [100, 98, 90, 70])
+        self.assertEqual(nutrition_app.calculate_meal_score(850, 25, 120, 28, 3), 98)
+
+    def test_risk_levels(self):
+        """Test risk levels follow the score thresholds"""
+        low = nutrition_app.calculate_risk_score(300, 10, 40, 22)
+        very_high = nutrition_app.calculate_risk_score(1200, 50, 150, 32)
+        self.assertEqual((low['score'], low['level'], low['factors']), (0, 'Low Risk', []))
+        self.assertEqual(very_high['level'], 'Very High Risk')
+        self.assertEqual(very_high['factors'][0], 'High calorie intake')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+"""
+Test cases for the community aggregates
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from community import CommunityAggregates
+
+def make_meal(score, *foods):
+    return {'foods': [{'name': f} for f in foods],
+            'analysis': {'health_assessment': {'meal_score': score}}}
+
+class TestCommunityAggregates(unittest.TestCase):
+    """Test cases for CommunityAggregates"""
+
+    def setUp(self):
+        """Set up empty aggregates"""
+        self.stats = CommunityAggregates()
+
+    def test_profile_updates_move_buckets(self):
+        """Test profile writes replace the previous contribution"""
+        self.stats.set_profile('a', 'weight_loss', 31.0, 'Obese')
+        self.stats.set_profile('b', 'maintain_weight')
+        self.stats.set_profile('a', 'maintain_weight', 24.0, 'Normal')
+        self.assertEqual(self.stats.total_users, 2)
+        self.assertEqual(self.stats.goal_counts, {'maintain_weight': 2})
+        self.assertEqual(self.stats.bmi_counts, {'Obese': 0, 'Normal': 1})
+        self.assertEqual(self.stats.avg_bmi(), 24.0)
+
+    def test_meal_counters(self):
+        """Test meal adds and removes keep sums, foods and activity exact"""
+        first = make_meal(80, 'apple', 'rice')
+        self.stats.add_meal('a', first, 10, 100.0)
+        self.stats.add_meal('a', make_meal(60, 'apple'), 11, 200.0)
+        self.stats.add_meal('b', make_meal(90, 'fish'), 9, 50.0)
+        self.assertEqual(self.stats.avg_meal_score(), 230 / 3)
+        self.assertEqual(self.stats.top_foods(1), [('apple', 2)])
+        self.assertEqual(self.stats.active_users(75.0), 1)
+
+        self.assertEqual(self.stats.top_foods(5, today=11, days=2), [('apple', 2), ('rice', 1)])
+
+        self.stats.remove_meal('a', first, 10, 200.0)
+        self.assertEqual(self.stats.top_foods(5), [('apple', 1), ('fish', 1)])
+        self.assertEqual(self.stats.avg_meal_score(), 75)
+
+    def test_quality_leaders(self):
+        """Test the leaderboard follows per-user averages"""
+        for user_id, score in (('a', 70), ('b', 90), ('c', 80)):
+            self.stats.add_meal(user_id, make_meal(score), 1, 0.0)
+        self.assertEqual([u for u, _, _ in self.stats.quality_leaders(2)], ['b', 'c'])
+
+        low = make_meal(10)
+        self.stats.add_meal('b', low, 1, 0.0)
+        self.assertEqual(self.stats.quality_leaders(2), [('c', 80.0, 1), ('a', 70.0, 1)])
+        self.stats.remove_meal('b', low, 1, 0.0)
+        self.assertEqual(self.stats.quality_leaders(1), [('b', 90.0, 1)])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
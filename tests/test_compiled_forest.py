@@ -0,0 +1,46 @@
+"""
+Test cases for the compiled random forest inference path
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from compiled_forest import CompiledForest
+
+class TestCompiledForest(unittest.TestCase):
+    def fit(self, **params):
+        X, y = make_classification(n_samples=400, n_features=7, n_informative=5, n_classes=3,
+                                   random_state=0)
+        X = X * 40 + 100
+        scaler = StandardScaler().fit(X)
+        forest = RandomForestClassifier(random_state=0, **params).fit(scaler.transform(X), y)
+        return X, scaler, forest
+
+    def test_matches_sklearn(self):
+        """Test probabilities and classes equal sklearn's exactly, batched and row by row"""
+        X, scaler, forest = self.fit(n_estimators=30)
+        compiled = CompiledForest.from_sklearn(forest, scaler)
+        probe = np.vstack([X, np.random.RandomState(1).uniform(-50, 250, (200, 7))])
+
+        expected = forest.predict_proba(scaler.transform(probe))
+        np.testing.assert_array_equal(compiled.predict_proba(probe), expected)
+        np.testing.assert_array_equal(compiled.predict(probe), forest.predict(scaler.transform(probe)))
+        for row in probe[:20]:
+            np.testing.assert_array_equal(compiled.predict_proba(row), forest.predict_proba(scaler.transform([row])))
+
+    def test_string_labels_and_shallow_trees(self):
+        """Test class labels are passed through and trees of mixed depth line up"""
+        X, scaler, forest = self.fit(n_estimators=10, max_depth=3)
+        forest.fit(scaler.transform(X), np.array(['low', 'medium', 'high'])[forest.predict(scaler.transform(X))])
+        compiled = CompiledForest.from_sklearn(forest, scaler)
+        np.testing.assert_array_equal(compiled.predict(X), forest.predict(scaler.transform(X)))
+        self.assertLessEqual(compiled.depth, 3)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,76 @@
+"""
+Test cases for fold-level caching of preprocessing
+"""
+import unittest
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml-models'))
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_selection import SelectKBest, f_regression
+
+from data_processor import NutritionDataProcessor
+from fold_cache import FoldCache
+from nutrition_model import NutritionAIModel
+
+SCORED = []
+
+def counting_f_regression(X, y):
+    """f_regression that records each call"""
+    SCORED.append(len(X))
+    return f_regression(X, y)
+
+class TestFoldCache(unittest.TestCase):
+    """Test cases for reusing fitted preprocessing across candidates and runs"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        del SCORED[:]
+
+        rng = np.random.RandomState(0)
+        self.X = pd.DataFrame({
+            'age': rng.randint(20, 60, 150).astype(float),
+            'weight_kg': rng.uniform(50, 100, 150),
+            'daily_calories': rng.uniform(1500, 3000, 150),
+            'activity_level': rng.choice(['Sedentary', 'Moderate', 'Active'], 150)
+        })
+        self.X.loc[::10, 'weight_kg'] = np.nan
+        self.y = self.X['daily_calories'] / 30 + rng.normal(0, 1, 150)
+
+    def tuned_model(self, cache):
+        steps = NutritionDataProcessor().preprocessing_steps(self.X, k=3)
+        steps[-1] = ('select', SelectKBest(counting_f_regression, k=3))
+        model = NutritionAIModel(model_type='random_forest', task='regression', n_cores=1)
+        model.build_model(params={'n_estimators': 10})
+        model.use_preprocessing(steps, cache)
+        model.train(self.X, self.y, hyperparameter_tuning=True, search_strategy='sobol', n_iter=3, cv=3)
+        return model
+
+    def test_features_are_scored_once_per_fold(self):
+        """Test candidates share fitted steps, and a second run reuses them all"""
+        cache = FoldCache(os.path.join(self.tmp.name, 'folds'))
+        model = self.tuned_model(cache)
+        self.assertEqual(len(SCORED), 4)  # Three folds and the final refit
+        self.assertEqual(model.history['search']['n_candidates'], 3)
+        self.assertTrue(all(name.startswith('model__') for name in model.best_params))
+
+        self.tuned_model(cache)
+        self.assertEqual(len(SCORED), 4)
+        self.assertGreater(cache.size(), 0)
+
+    def test_uncached_pipeline_refits_per_candidate(self):
+        """Test without a cache each candidate refits its preprocessing"""
+        self.tuned_model(None)
+        self.assertEqual(len(SCORED), 10)
+
+    def test_evict_trims_to_limit(self):
+        """Test eviction keeps the cache within its size limit"""
+        cache = FoldCache(os.path.join(self.tmp.name, 'folds'), bytes_limit=1)
+        self.tuned_model(cache)
+        self.assertLessEqual(cache.size(), 1024)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
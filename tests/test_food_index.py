@@ -0,0 +1,89 @@
+"""
+Test cases for the food name index
+"""
+import unittest
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from food_index import FoodIndex
+
+class TestFoodIndex(unittest.TestCase):
+    """Test cases for FoodIndex"""
+
+    def setUp(self):
+        """Set up a small catalogue"""
+        self.index = FoodIndex(['apple', 'chicken breast', 'rice', 'eggs', 'fish', 'beans', 'milk'])
+
+    def test_exact_match(self):
+        """Test exact names resolve to themselves"""
+        self.assertEqual(self.index.resolve('rice'), 'rice')
+        self.assertEqual(self.index.resolve('  Chicken   Breast '), 'chicken breast')
+
+    def test_key_inside_name(self):
+        """Test catalogue keys found inside longer names"""
+        self.assertEqual(self.index.resolve('grilled chicken breast'), 'chicken breast')
+        self.assertEqual(self.index.resolve('fried rice'), 'rice')
+
+    def test_name_inside_key(self):
+        """Test short names resolve to the closest containing key"""
+        self.assertEqual(self.index.resolve('chicken'), 'chicken breast')
+        self.assertEqual(self.index.resolve('egg'), 'eggs')
+
+    def test_ranking_is_deterministic(self):
+        """Test whole-word and longer matches win over insertion order"""
+        index = FoodIndex(['apple', 'pineapple', 'apple pie'])
+        self.assertEqual(index.resolve('pineapple slices'), 'pineapple')
+        self.assertEqual(index.resolve('warm apple pie'), 'apple pie')
+        self.assertEqual(index.resolve('app'), 'apple')
+
+    def test_unknown_and_empty_names(self):
+        """Test names without a match return None"""
+        self.assertIsNone(self.index.resolve('quinoa'))
+        self.assertIsNone(self.index.resolve(''))
+
+    def test_short_keys(self):
+        """Test keys shorter than a trigram still match"""
+        index = FoodIndex(['ox', 'oxtail soup'])
+        self.assertEqual(index.resolve('braised ox cheek'), 'ox')
+
+    def test_add_invalidates_cache(self):
+        """Test adding a key refreshes cached resolutions"""
+        self.assertIsNone(self.index.resolve('quinoa salad'))
+        self.index.add('quinoa')
+        self.assertEqual(self.index.resolve('quinoa salad'), 'quinoa')
+
+    def test_resolve_many(self):
+        """Test batch resolution preserves order"""
+        self.assertEqual(self.index.resolve_many(['Milk', 'tofu', 'black beans']),
+                         ['milk', None, 'beans'])
+
+    def test_large_catalogue(self):
+        """Test lookups stay correct with many keys"""
+        index = FoodIndex([f'food item {i}' for i in range(20000)] + ['salmon'])
+        self.assertEqual(index.resolve('smoked salmon'), 'salmon')
+        self.assertEqual(index.resolve('food item 1234'), 'food item 1234')
+        self.assertEqual(len(index), 20001)
+
+    def test_lookups_at_100k_items(self):
+        """Test uncached lookups stay well under a millisecond on a 100k catalogue"""
+        index = FoodIndex([f'food item {i}' for i in range(100000)] + ['salmon'])
+        expected = {
+            'fresh food item 1234 with salmon': 'food item 1234',
+            'ite': 'food item 0',
+            'i': 'food item 0',
+            'item 99': 'food item 99',
+            'item food': None,
+            'food food': None,
+            'quinoa': None,
+        }
+        start = time.perf_counter()
+        for _ in range(10):
+            results = {name: index._resolve(name) for name in expected}
+        elapsed = (time.perf_counter() - start) / (10 * len(expected))
+        self.assertEqual(results, expected)
+        self.assertLess(elapsed, 0.001)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
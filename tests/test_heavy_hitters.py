@@ -0,0 +1,84 @@
+"""
+Test cases for the Space-Saving heavy-hitters sketches
+"""
+import unittest
+import random
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from heavy_hitters import SpaceSaving, WindowedSpaceSaving
+
+class TestSpaceSaving(unittest.TestCase):
+    """Test cases for SpaceSaving"""
+
+    def test_exact_below_capacity(self):
+        """Test counts are exact while every item fits"""
+        sketch = SpaceSaving(capacity=8)
+        for item in ['apple'] * 5 + ['rice'] * 3 + ['fish']:
+            sketch.add(item)
+        sketch.discard('rice')
+        self.assertEqual(sketch.top(2), [('apple', 5), ('rice', 2)])
+        sketch.discard('tofu')
+        self.assertEqual(len(sketch), 3)
+
+    def test_error_bounds_on_skewed_stream(self):
+        """Test heavy items are kept and overcounts stay within N / capacity"""
+        rng = random.Random(3)
+        stream = [f'food{int(rng.paretovariate(1.1))}' for _ in range(20000)]
+        truth = {}
+        for item in stream:
+            truth[item] = truth.get(item, 0) + 1
+
+        sketch = SpaceSaving(capacity=32)
+        for item in stream:
+            sketch.add(item)
+
+        bound = len(stream) / 32
+        for item, count, error in sketch.items():
+            self.assertGreaterEqual(count, truth.get(item, 0))
+            self.assertLessEqual(count - truth.get(item, 0), error)
+            self.assertLessEqual(error, bound)
+        for item, count in truth.items():
+            if count > bound:
+                self.assertIn(item, sketch)
+        exact_top = sorted(truth, key=truth.get, reverse=True)[:3]
+        self.assertEqual([item for item, _ in sketch.top(3)], exact_top)
+
+    def test_add_counts_keeps_largest_exactly(self):
+        """Test exact totals counted at once keep the largest items with no error"""
+        sketch = SpaceSaving(capacity=2)
+        sketch.add_counts({'apple': 5, 'rice': 1, 'fish': 3, 'tofu': 2})
+        self.assertEqual(sorted(sketch.items()), [('apple', 5, 0), ('fish', 3, 0)])
+        self.assertEqual(sketch.total, 11)
+        sketch.add('rice')
+        self.assertEqual(sketch.top(2), [('apple', 5), ('rice', 4)])
+
+
+class TestWindowedSpaceSaving(unittest.TestCase):
+    """Test cases for WindowedSpaceSaving"""
+
+    def test_windows(self):
+        """Test day windows only count their own days"""
+        sketch = WindowedSpaceSaving(capacity=8, days=30)
+        sketch.add(99, ['apple', 'apple', 'rice'])
+        sketch.add(105, ['fish'])
+        sketch.add(106, ['fish', 'rice'])
+        self.assertEqual(sketch.top(1, today=106, days=1), [('fish', 1)])
+        self.assertEqual(sketch.top(2, today=106, days=7), [('fish', 2), ('rice', 1)])
+        self.assertEqual(sketch.top(1), [('apple', 2)])
+
+        sketch.discard(106, ['fish'])
+        self.assertEqual(sketch.top(5, today=106, days=1), [('rice', 1)])
+
+    def test_expired_days_are_dropped(self):
+        """Test reused ring slots forget old days"""
+        sketch = WindowedSpaceSaving(capacity=8, days=7)
+        sketch.add(100, ['apple'])
+        sketch.add(107, ['rice'])
+        sketch.add(100, ['apple'])
+        self.assertEqual(sketch.top(5, today=107, days=7), [('rice', 1)])
+        self.assertEqual(sketch.top(5), [('apple', 2), ('rice', 1)])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,132 @@
+"""
+Test cases for the write-behind journal and the backend it makes durable
+"""
+import unittest
+import tempfile
+import threading
+import time
+import sys
+import os
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import journal
+from journal import Journal, JournalError, JournaledBackend
+
+class TestJournaledBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def open_backend(self, snapshot_every=10000):
+        backend = JournaledBackend(Journal(self.tmp.name, flush_interval=0.001),
+                                   snapshot_every=snapshot_every)
+        self.addCleanup(backend.journal.close)
+        return backend
+
+    def restart(self, backend, snapshot_every=10000):
+        backend.journal.close()
+        return self.open_backend(snapshot_every)
+
+    def test_replay_after_restart(self):
+        """Test writes survive a restart through journal replay"""
+        backend = self.open_backend()
+        backend.put('users', 'u1', {'name': 'Ann'})
+        backend.put_many('meals', {'u1/m1': {'id': 'm1'}, 'u1/m2': {'id': 'm2'}})
+        self.assertTrue(backend.delete('meals', 'u1/m1'))
+        backend.clear('sessions')
+
+        backend = self.restart(backend)
+        self.assertEqual(backend.get('users', 'u1'), {'name': 'Ann'})
+        self.assertEqual(backend.items('meals'), [('u1/m2', {'id': 'm2'})])
+
+    def test_snapshot_rotates_segments(self):
+        """Test a snapshot replaces the segments it covers"""
+        backend = self.open_backend(snapshot_every=5)
+        for i in range(12):
+            backend.put('users', f'u{i}', {'n': i})
+        user = {'n': 'changed'}
+        backend.put('users', 'u0', user)
+        user['n'] = 'mutated after the write'
+        backend.journal.flush()
+
+        segments = [name for name in os.listdir(self.tmp.name) if name.startswith('journal-')]
+        self.assertEqual(segments, ['journal-00000000000000000011.log'])
+
+        backend = self.restart(backend)
+        self.assertEqual(backend.count('users'), 12)
+        self.assertEqual(backend.get('users', 'u0'), {'n': 'changed'})
+        self.assertEqual(backend.get('users', 'u11'), {'n': 11})
+
+    def test_snapshot_is_durable_before_segments_are_removed(self):
+        """Test the directory is synced after the snapshot rename and before old segments go"""
+        backend = self.open_backend(snapshot_every=5)
+        calls = []
+        fsync_directory = journal._fsync_directory
+        remove = os.remove
+        with mock.patch.object(journal, '_fsync_directory',
+                               side_effect=lambda path: calls.append('fsync') or fsync_directory(path)), \
+                mock.patch.object(journal.os, 'remove', side_effect=lambda path: calls.append('remove') or remove(path)):
+            for i in range(5):
+                backend.put('users', f'u{i}', {'n': i})
+            backend.journal.flush()
+        self.assertEqual(calls[:2], ['fsync', 'remove'])
+
+    def test_concurrent_deletes_log_once(self):
+        """Test only one of two racing deletes of a record reports and logs it"""
+        backend = self.open_backend()
+        backend.put('users', 'u1', {'name': 'Ann'})
+        results = []
+        get = backend.memory.get
+
+        def slow_get(namespace, key):
+            value = get(namespace, key)
+            time.sleep(0.01)  # Let the other deletes see the record too unless they wait for the lock
+            return value
+
+        with mock.patch.object(backend.memory, 'get', side_effect=slow_get), \
+                mock.patch.object(backend, '_log', wraps=backend._log) as log:
+            threads = [threading.Thread(target=lambda: results.append(backend.delete('users', 'u1')))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sorted(results), [False] * 7 + [True])
+        self.assertEqual(log.call_count, 1)
+
+    def test_torn_tail_is_ignored(self):
+        """Test a partially written last entry is dropped on replay"""
+        backend = self.open_backend()
+        backend.put('users', 'u1', {'name': 'Ann'})
+        backend.put('users', 'u2', {'name': 'Bob'})
+        backend.journal.close()
+
+        segment = os.path.join(self.tmp.name, os.listdir(self.tmp.name)[0])
+        with open(segment, 'r+b') as f:
+            f.truncate(os.path.getsize(segment) - 3)
+
+        backend = self.open_backend()
+        self.assertEqual(backend.get('users', 'u1'), {'name': 'Ann'})
+        self.assertIsNone(backend.get('users', 'u2'))
+
+        backend.put('users', 'u3', {'name': 'Cy'})
+        backend = self.restart(backend)
+        self.assertEqual([key for key, _ in backend.items('users')], ['u1', 'u3'])
+
+    def test_write_failure_is_raised_not_hung(self):
+        """Test a failed disk write surfaces from flush and later writes instead of blocking"""
+        backend = self.open_backend()
+        backend.put('users', 'u1', {'name': 'Ann'})
+        backend.journal.flush()
+
+        with mock.patch.object(backend.journal, '_commit', side_effect=OSError(28, 'No space left on device')):
+            backend.put('users', 'u2', {'name': 'Bob'})
+            with self.assertRaises(JournalError):
+                backend.journal.flush()
+        with self.assertRaises(JournalError):
+            backend.put('users', 'u3', {'name': 'Cy'})
+        self.assertIsNone(backend.get('users', 'u3'))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
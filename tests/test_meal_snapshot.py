@@ -0,0 +1,93 @@
+"""
+Test cases for the memory-mapped meal snapshot
+"""
+import unittest
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+from meal_snapshot import MealSnapshot, UserHistory
+
+def make_meal(meal_id, timestamp, foods, calories, score):
+    return {
+        'id': meal_id,
+        'timestamp': timestamp,
+        'foods': [{'name': name} for name in foods],
+        'analysis': {'nutrition': {'calories': calories}, 'health_assessment': {'meal_score': score}}
+    }
+
+class TestMealSnapshot(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'meals.snap')
+
+    def test_round_trip(self):
+        """Test columns, interned food names and records survive a write and load"""
+        ann = [make_meal('m1', '2024-03-01T08:00:00', ['Apple', 'Oats'], 250, 80),
+               make_meal('m2', '2024-03-02T12:30:00', ['Apple'], 95, 70)]
+        bob = [make_meal('m3', '2024-03-02T19:00:00', [], 0, 50)]
+        MealSnapshot.write(self.path, 42, [('ann', [1.0, 2.0], ann), ('nobody', [], []),
+                                           ('bob', [3.0], bob)])
+
+        snapshot = MealSnapshot.load(self.path)
+        self.assertEqual(snapshot.seq, 42)
+        self.assertEqual(snapshot.users, ['ann', 'bob'])
+        self.assertEqual(len(snapshot), 3)
+        self.assertIsInstance(snapshot.columns['epoch'], np.memmap)
+        self.assertEqual(snapshot.user_range(1), (2, 3))
+        self.assertEqual(snapshot.columns['day'].tolist(), [738946, 738947, 738947])
+        self.assertEqual(snapshot.columns['calories'].tolist(), [250, 95, 0])
+        self.assertEqual(snapshot.foods(0, 3), [['Apple', 'Oats'], ['Apple'], []])
+        self.assertEqual(snapshot.strings.count('Apple'), 1)
+        self.assertEqual(snapshot.meals(0), ann)
+        self.assertEqual(snapshot.meals(1), bob)
+
+    def test_column_totals(self):
+        """Test per-day and per-food totals are computed over the columns"""
+        ann = [make_meal('m1', '2024-03-01T08:00:00', ['Apple', 'Oats'], 250, 80),
+               make_meal('m2', '2024-03-01T12:30:00', ['Apple'], 95, 70),
+               make_meal('m3', '2024-03-03T12:30:00', ['Rice'], 400, 60)]
+        bob = [make_meal('m4', '2024-03-02T19:00:00', ['Apple'], 100, 50)]
+        MealSnapshot.write(self.path, 1, [('ann', [1.0, 2.0, 3.0], ann), ('bob', [4.0], bob)])
+        snapshot = MealSnapshot.load(self.path)
+        self.assertEqual(snapshot.daily_totals(), [([738946, 738948], [2, 1], [345.0, 400.0], [150.0, 60.0]),
+                                                   ([738947], [1], [100.0], [50.0])])
+        self.assertEqual(snapshot.food_counts(), {'Apple': 3, 'Oats': 1, 'Rice': 1})
+        self.assertEqual(snapshot.daily_food_counts(738947), {738947: {'Apple': 1}, 738948: {'Rice': 1}})
+
+    def test_user_history_carries_over_encoded(self):
+        """Test an undecoded UserHistory is rewritten into a new snapshot unchanged"""
+        ann = [make_meal('m1', '2024-03-01T08:00:00', ['Apple', 'Oats'], 250, 80)]
+        bob = [make_meal('m2', '2024-03-02T19:00:00', ['Rice'], 400, 60)]
+        MealSnapshot.write(self.path, 1, [('ann', [1.0], ann), ('bob', [2.0], bob)])
+        old = MealSnapshot.load(self.path)
+        history = UserHistory(old, 1)
+        self.assertEqual(history.user_id, 'bob')
+        self.assertEqual(history(), ([2.0], bob))
+
+        # Replacing the file leaves the old mapping readable
+        MealSnapshot.write(self.path, 2, [('ann', [1.0], ann), UserHistory(old, 1)])
+        snapshot = MealSnapshot.load(self.path)
+        self.assertEqual(snapshot.users, ['ann', 'bob'])
+        self.assertEqual(snapshot.meals(1), bob)
+        self.assertEqual(snapshot.columns['score'].tolist(), [80, 60])
+        self.assertEqual(snapshot.foods(0, 2), [['Apple', 'Oats'], ['Rice']])
+        self.assertEqual(history.encoded(), snapshot.encoded_meals(1))
+
+    def test_empty_and_invalid_files(self):
+        """Test an empty snapshot loads and a foreign file is rejected"""
+        MealSnapshot.write(self.path, 0, [])
+        snapshot = MealSnapshot.load(self.path)
+        self.assertEqual((len(snapshot), snapshot.users), (0, []))
+        self.assertEqual(snapshot.daily_totals(), [])
+
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot at all')
+        with self.assertRaises(ValueError):
+            MealSnapshot.load(self.path)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,128 @@
+"""
+Test cases for the time-indexed meal store
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from datetime import datetime, timedelta
+from meal_store import MealStore
+
+class TestMealStore(unittest.TestCase):
+    """Test cases for MealStore"""
+
+    def setUp(self):
+        """Set up a store with ten daily meals"""
+        self.store = MealStore()
+        self.base = datetime(2024, 3, 1, 12, 0)
+        for day in range(10):
+            self.store.add('u1', self.meal(f'm{day}', self.base + timedelta(days=day)))
+
+    def meal(self, meal_id, timestamp):
+        """Build a minimal meal record"""
+        return {'id': meal_id, 'timestamp': timestamp.isoformat()}
+
+    def ids(self, meals):
+        return [m['id'] for m in meals]
+
+    def test_counts(self):
+        """Test per-user and total counts"""
+        self.store.add('u2', self.meal('x', self.base))
+        self.assertEqual(self.store.count('u1'), 10)
+        self.assertEqual(len(self.store), 11)
+        self.assertIn('u2', self.store)
+        self.assertNotIn('u3', self.store)
+
+    def test_range_is_inclusive(self):
+        """Test date filters include both endpoints"""
+        meals = self.store.range('u1', self.base + timedelta(days=2), self.base + timedelta(days=4))
+        self.assertEqual(self.ids(meals), ['m2', 'm3', 'm4'])
+        self.assertEqual(self.store.count('u1', start=self.base + timedelta(days=8)), 2)
+
+    def test_back_dated_insert_keeps_order(self):
+        """Test out-of-order inserts land in timestamp order"""
+        self.store.add('u1', self.meal('late', self.base + timedelta(days=3, hours=1)))
+        meals = self.store.range('u1', self.base + timedelta(days=3), self.base + timedelta(days=4))
+        self.assertEqual(self.ids(meals), ['m3', 'late', 'm4'])
+
+    def test_newest_and_pages(self):
+        """Test newest-first pagination"""
+        self.assertEqual(self.ids(self.store.newest('u1', 3)), ['m9', 'm8', 'm7'])
+        page, total = self.store.page('u1', 3, 2)
+        self.assertEqual((self.ids(page), total), (['m6', 'm5'], 10))
+        page, total = self.store.page('u1', 8, 5)
+        self.assertEqual(self.ids(page), ['m1', 'm0'])
+        page, total = self.store.page('u1', 20, 5)
+        self.assertEqual((page, total), ([], 10))
+
+    def test_page_within_range(self):
+        """Test pagination inside a date range"""
+        page, total = self.store.page('u1', 1, 2, start=self.base + timedelta(days=5))
+        self.assertEqual((self.ids(page), total), (['m8', 'm7'], 5))
+
+    def test_keyset_page(self):
+        """Test cursor pages resume below the cursor meal, even after it is deleted"""
+        cursor = ((self.base + timedelta(days=7)).timestamp(), 'm7')
+        page, total = self.store.page_before('u1', cursor, 3)
+        self.assertEqual((self.ids(page), total), (['m6', 'm5', 'm4'], 10))
+
+        self.store.remove('u1', 'm7')
+        self.store.add('u1', self.meal('late', self.base + timedelta(days=8, hours=1)))
+        page, _ = self.store.page_before('u1', cursor, 2)
+        self.assertEqual(self.ids(page), ['m6', 'm5'])
+
+    def test_get_and_remove(self):
+        """Test lookup and delete by id"""
+        self.assertEqual(self.store.get('u1', 'm4')['id'], 'm4')
+        self.assertEqual(self.store.remove('u1', 'm4')['id'], 'm4')
+        self.assertIsNone(self.store.get('u1', 'm4'))
+        self.assertIsNone(self.store.remove('u1', 'm4'))
+        self.assertEqual(self.store.count('u1'), 9)
+        self.assertEqual(len(self.store), 9)
+
+    def test_tombstones_are_skipped(self):
+        """Test deleted meals drop out of ranges, pages and counts"""
+        for meal_id in ('m2', 'm5', 'm6'):
+            self.store.remove('u1', meal_id)
+        self.assertEqual(self.ids(self.store.range('u1')), ['m0', 'm1', 'm3', 'm4', 'm7', 'm8', 'm9'])
+        page, total = self.store.page('u1', 2, 3)
+        self.assertEqual((self.ids(page), total), (['m7', 'm4', 'm3'], 7))
+        self.assertEqual(len(self.store.epochs('u1')), 7)
+        self.assertEqual(self.store.count('u1', end=self.base + timedelta(days=5)), 4)
+
+    def test_deleting_newest_meal(self):
+        """Test the latest timestamp follows deletes of the newest meal"""
+        self.store.remove('u1', 'm8')
+        self.store.remove('u1', 'm9')
+        self.assertEqual(self.store.latest_epoch('u1'), (self.base + timedelta(days=7)).timestamp())
+        self.assertEqual(self.ids(self.store.newest('u1', 1)), ['m7'])
+
+    def test_compaction(self):
+        """Test many deletes compact the history and keep the index valid"""
+        for i in range(300):
+            self.store.add('u2', self.meal(f'x{i}', self.base + timedelta(minutes=i)))
+        for i in range(0, 300, 2):
+            self.store.remove('u2', f'x{i}')
+        self.assertEqual(self.store.count('u2'), 150)
+        for i in range(1, 300, 2):
+            self.assertEqual(self.store.get('u2', f'x{i}')['id'], f'x{i}')
+        page, _ = self.store.page('u2', 10, 3)
+        self.assertEqual(self.ids(page), ['x279', 'x277', 'x275'])
+
+    def test_back_dated_insert_after_delete(self):
+        """Test shifting slots keeps the index and tombstones aligned"""
+        self.store.remove('u1', 'm3')
+        self.store.add('u1', self.meal('early', self.base + timedelta(days=1, hours=1)))
+        self.assertEqual(self.store.get('u1', 'm4')['id'], 'm4')
+        self.assertIsNone(self.store.get('u1', 'm3'))
+        self.assertEqual(self.ids(self.store.range('u1', end=self.base + timedelta(days=4))),
+                         ['m0', 'm1', 'early', 'm2', 'm4'])
+
+    def test_latest_epoch(self):
+        """Test the newest timestamp is available without scanning"""
+        self.assertEqual(self.store.latest_epoch('u1'), (self.base + timedelta(days=9)).timestamp())
+        self.assertIsNone(self.store.latest_epoch('nobody'))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,64 @@
+"""
+Test cases for the micro-batching prediction scheduler
+"""
+import unittest
+import threading
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+from micro_batcher import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+    def make_batcher(self, predict_fn, **options):
+        batcher = MicroBatcher(predict_fn, **options)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_concurrent_rows_share_batches(self):
+        """Test rows from many threads are batched and each caller gets its own result"""
+        calls = []
+
+        def predict(rows):
+            calls.append(len(rows))
+            return rows.sum(axis=1)
+
+        batcher = self.make_batcher(predict, max_batch=8, max_wait=0.05)
+        results = {}
+        start = threading.Barrier(16)
+
+        def worker(i):
+            start.wait()
+            results[i] = batcher.predict(np.array([i, i]))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {i: 2 * i for i in range(16)})
+        self.assertLess(len(calls), 16)
+        metrics = batcher.metrics()
+        self.assertEqual((metrics['rows'], metrics['batches']), (16, len(calls)))
+        self.assertEqual(sum(size * n for size, n in metrics['batch_sizes'].items()), 16)
+        self.assertGreaterEqual(metrics['flush_reasons']['size'], 1)
+
+    def test_lone_row_flushes_on_timeout(self):
+        """Test a single row is not held past the wait limit"""
+        batcher = self.make_batcher(lambda rows: rows[:, 0] * 10, max_batch=32, max_wait=0.001)
+        self.assertEqual(batcher.predict(np.array([3.0]), timeout=5), 30.0)
+        self.assertEqual(batcher.metrics()['flush_reasons'], {'size': 0, 'timeout': 1, 'shutdown': 0})
+
+    def test_errors_reach_every_caller(self):
+        """Test a failing batch raises in the caller"""
+        def predict(rows):
+            raise ValueError('bad batch')
+
+        batcher = self.make_batcher(predict, max_batch=4, max_wait=0.001)
+        with self.assertRaises(ValueError):
+            batcher.predict(np.array([1.0]), timeout=5)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -179,6 +179,50 @@ class TestMLModels(unittest.TestCase):
         self.assertIsInstance(cv_scores, np.ndarray)
         self.assertEqual(len(cv_scores), 3)
 
+    def test_incremental_forest_update(self):
+        """Test forest updates add trees, retire old ones and report the retrain delta"""
+        X, y, _ = self.processor.preprocess_features(self.test_data, target_column='health_score')
+        self.model.build_model(params={'n_estimators': 20, 'n_jobs': 1})
+        self.model.train(X[:60], y[:60])
+
+        first = self.model.update(X[60:80], y[60:80], n_new_estimators=5)
+        self.assertEqual(first['n_estimators'], 25)
+        record = self.model.update(X[80:90], y[80:90], n_new_estimators=5, max_tree_age=1,
+                                   X_eval=X[90:], y_eval=y[90:], X_full=X[:90], y_full=y[:90])
+
+        self.assertEqual(record['estimators_retired'], 20)
+        self.assertEqual(len(self.model.model.estimators_), 10)
+        self.assertEqual(self.model.tree_generations, [1] * 5 + [2] * 5)
+        self.assertAlmostEqual(record['score_delta'], record['score'] - record['full_retrain_score'])
+        self.assertEqual(len(self.model.predict(X[90:])), 10)
+
+    def test_update_rejects_a_different_class_set(self):
+        """Test classifier updates must see exactly the classes the model was trained on"""
+        X, _, _ = self.processor.preprocess_features(self.test_data, target_column='health_score')
+        y = np.arange(100) % 2
+        model = NutritionAIModel(model_type='random_forest', task='classification')
+        model.build_model(params={'n_estimators': 10, 'n_jobs': 1})
+        model.model.fit(X[:60], y[:60])
+
+        with self.assertRaises(ValueError):
+            model.update(X[60:], np.arange(40) % 3, n_new_estimators=5)
+        with self.assertRaises(ValueError):
+            model.update(X[60:], np.zeros(40, dtype=int), n_new_estimators=5)
+        self.assertEqual(len(model.model.estimators_), 10)
+
+    def test_incremental_xgboost_update(self):
+        """Test xgboost updates continue boosting from the current booster"""
+        X, y, _ = self.processor.preprocess_features(self.test_data, target_column='health_score')
+        model = NutritionAIModel(model_type='xgboost', task='regression')
+        model.build_model(params={'n_estimators': 30, 'n_jobs': 1})
+        model.train(X[:80], y[:80])
+        before = model.predict(X[80:])
+
+        record = model.update(X[60:80], y[60:80], n_new_estimators=10)
+        self.assertEqual(record['n_estimators'], 40)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 40)
+        self.assertFalse(np.allclose(before, model.predict(X[80:])))
+
 if __name__ == '__main__':
     print("Running ML model tests...")
     unittest.main(verbosity=2)
\ No newline at end of file
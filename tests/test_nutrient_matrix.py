@@ -0,0 +1,61 @@
+"""
+Test cases for the columnar nutrient matrix
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import numpy as np
+from nutrient_matrix import NutrientMatrix
+
+class TestNutrientMatrix(unittest.TestCase):
+    """Test cases for NutrientMatrix"""
+
+    def setUp(self):
+        """Set up a small catalogue"""
+        self.foods = {
+            'apple': {'calories': 95, 'protein': 0.5, 'carbs': 25, 'fats': 0.3, 'fiber': 4.4},
+            'rice': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fats': 0.3, 'fiber': 0.4},
+        }
+        self.default = {'calories': 150, 'protein': 5, 'carbs': 20, 'fats': 5, 'fiber': 2}
+        self.matrix = NutrientMatrix(self.foods, default=self.default)
+
+    def test_layout(self):
+        """Test matrix shape, dtype and fallback row"""
+        self.assertEqual(self.matrix.matrix.shape, (3, 5))
+        self.assertEqual(self.matrix.matrix.dtype, np.float32)
+        self.assertTrue(self.matrix.matrix.flags['C_CONTIGUOUS'])
+        self.assertEqual(self.matrix.row('rice'), 1)
+        self.assertEqual(self.matrix.row(None), self.matrix.default_row)
+        self.assertEqual(self.matrix.row('pizza'), self.matrix.default_row)
+
+    def test_meal_totals(self):
+        """Test quantity-weighted totals match the dict computation"""
+        rows = self.matrix.rows(['apple', 'rice', None])
+        totals = self.matrix.as_dict(self.matrix.meal_totals(rows, [2, 0.5, 1]))
+        for nutrient in self.matrix.nutrients:
+            expected = (self.foods['apple'][nutrient] * 2 + self.foods['rice'][nutrient] * 0.5
+                        + self.default[nutrient])
+            self.assertAlmostEqual(totals[nutrient], expected, places=4)
+
+    def test_batch_totals(self):
+        """Test a batch of meals matches per-meal totals"""
+        meals = [
+            (self.matrix.rows(['apple']), [1]),
+            (self.matrix.rows(['rice', 'rice', 'apple']), [1, 2, 3]),
+            (self.matrix.rows([None]), [0.5]),
+        ]
+        batch = self.matrix.batch_totals(meals)
+        self.assertEqual(batch.shape, (3, 5))
+        for i, (rows, quantities) in enumerate(meals):
+            np.testing.assert_allclose(batch[i], self.matrix.meal_totals(rows, quantities), rtol=1e-6)
+
+    def test_empty_inputs(self):
+        """Test empty meals and batches"""
+        self.assertEqual(self.matrix.batch_totals([]).shape, (0, 5))
+        totals = self.matrix.meal_totals(self.matrix.rows([]), [])
+        self.assertEqual(float(totals.sum()), 0.0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
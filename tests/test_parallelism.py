@@ -0,0 +1,63 @@
+"""
+Test cases for the training parallelism planner
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml-models'))
+
+import numpy as np
+
+from nutrition_model import NutritionAIModel
+from parallelism import plan_parallelism
+
+class TestParallelismPlanner(unittest.TestCase):
+    """Test cases for outer versus inner parallelism decisions"""
+
+    def test_plans_never_oversubscribe(self):
+        """Test every plan keeps outer x inner within the cores"""
+        for cores in (1, 2, 8, 64):
+            for tasks in (1, 3, 5, 540):
+                for n_samples in (100, 10 ** 6):
+                    plan = plan_parallelism('search', tasks, n_samples, 20, cores)
+                    self.assertLessEqual(plan.outer_jobs * plan.inner_jobs, cores)
+                    self.assertLessEqual(plan.outer_jobs * plan.blas_threads, cores)
+
+    def test_outer_versus_inner(self):
+        """Test fits spread across cores unless few fits share large data"""
+        single = plan_parallelism('train', 1, 5000, 20, 8)
+        self.assertEqual((single.outer_jobs, single.inner_jobs), (1, 8))
+        grid = plan_parallelism('search', 540, 5000, 20, 8)
+        self.assertEqual((grid.outer_jobs, grid.inner_jobs, grid.blas_threads), (8, 1, 1))
+        small_cv = plan_parallelism('cross_validate', 3, 5000, 20, 8)
+        self.assertEqual((small_cv.outer_jobs, small_cv.inner_jobs), (3, 1))
+        large_cv = plan_parallelism('cross_validate', 3, 10 ** 6, 20, 8)
+        self.assertEqual((large_cv.outer_jobs, large_cv.inner_jobs), (3, 2))
+
+    def test_model_records_plans(self):
+        """Test NutritionAIModel applies each plan and keeps it in history"""
+        rng = np.random.RandomState(0)
+        X, y = rng.rand(120, 4), rng.rand(120)
+        model = NutritionAIModel(model_type='random_forest', task='regression', n_cores=4)
+        model.build_model(params={'n_estimators': 10})
+        model.train(X, y)
+        model.cross_validate(X, y, cv=3)
+
+        stages = [(plan['stage'], plan['outer_jobs'], plan['inner_jobs'])
+                  for plan in model.history['parallelism']]
+        self.assertEqual(stages, [('train', 1, 4), ('cross_validate', 3, 1)])
+        self.assertEqual(model.model.n_jobs, -1)
+
+    def test_plans_do_not_change_the_model(self):
+        """Test n_jobs set for a stage is restored afterwards, also on the model a search returns"""
+        rng = np.random.RandomState(0)
+        X, y = rng.rand(120, 4), rng.rand(120)
+        model = NutritionAIModel(model_type='random_forest', task='regression', n_cores=4)
+        model.build_model(params={'n_estimators': 5, 'n_jobs': 3})
+        model.train(X, y, hyperparameter_tuning=True, search_strategy='random', n_iter=2, cv=2)
+
+        self.assertEqual(model.history['parallelism'][0]['inner_jobs'], 1)
+        self.assertEqual(model.model.n_jobs, 3)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
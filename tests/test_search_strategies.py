@@ -0,0 +1,98 @@
+"""
+Test cases for the hyperparameter search strategies
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml-models'))
+
+import numpy as np
+from sklearn.datasets import make_classification, make_regression
+from sklearn.ensemble import RandomForestRegressor
+import xgboost as xgb
+
+from nutrition_model import NutritionAIModel
+from search_strategies import (EarlyStoppingSearch, SuccessiveHalvingSearch, get_strategy,
+                               sample_candidates)
+
+PARAM_GRID = {
+    'n_estimators': [20, 40],
+    'max_depth': [2, 4, 8, None],
+    'min_samples_leaf': [1, 4, 16]
+}
+
+class TestSearchStrategies(unittest.TestCase):
+    """Test cases for candidate sampling and the search strategies"""
+
+    def setUp(self):
+        self.X, self.y = make_regression(n_samples=600, n_features=6, noise=5.0, random_state=0)
+
+    def test_sobol_candidates_are_distinct_and_cover_values(self):
+        """Test Sobol sampling returns distinct combinations spread over every value"""
+        candidates = sample_candidates(PARAM_GRID, 8, 'sobol')
+        self.assertEqual(len(candidates), 8)
+        self.assertEqual(len({tuple(sorted(c.items(), key=str)) for c in candidates}), 8)
+        self.assertEqual({c['max_depth'] for c in candidates}, {2, 4, 8, None})
+        self.assertEqual(len(sample_candidates(PARAM_GRID, 100, 'random')), 24)
+
+    def test_halving_grows_budgets_and_records_time(self):
+        """Test halving narrows candidates while growing trees and samples"""
+        search = SuccessiveHalvingSearch(factor=3, min_samples=60, min_estimators=4, cv=3,
+                                         n_jobs=1, verbose=0)
+        result = search.search(RandomForestRegressor(random_state=0), PARAM_GRID, self.X, self.y)
+
+        rungs = {}
+        for candidate in result.candidates:
+            rungs.setdefault(candidate['rung'], []).append(candidate)
+            self.assertGreater(candidate['fit_time'], 0)
+        self.assertEqual([len(rungs[r]) for r in sorted(rungs)], [12, 4, 2])
+        self.assertEqual([rungs[r][0]['n_samples'] for r in sorted(rungs)], [67, 200, 600])
+        self.assertEqual([rungs[r][0]['n_estimators'] for r in sorted(rungs)], [4, 13, 40])
+
+        self.assertEqual(result.best_params['n_estimators'], 40)
+        self.assertEqual(len(result.best_estimator.estimators_), 40)
+        self.assertEqual(len(result.time_to_score()), 18)
+
+    def test_halving_on_samples_keeps_tree_grid(self):
+        """Test n_estimators stays a searched parameter when only samples are halved"""
+        search = SuccessiveHalvingSearch(factor=2, resources=('n_samples',), min_samples=60, cv=3,
+                                         n_jobs=1, verbose=0)
+        result = search.search(RandomForestRegressor(random_state=0),
+                               {'n_estimators': [5, 10], 'max_depth': [2, 4]}, self.X, self.y)
+
+        first_rung = [c for c in result.candidates if c['rung'] == 0]
+        self.assertEqual({c['params']['n_estimators'] for c in first_rung}, {5, 10})
+        self.assertNotIn('n_estimators', first_rung[0])
+        self.assertEqual(len(result.best_estimator.estimators_), result.best_params['n_estimators'])
+
+    def test_early_stopping_sets_rounds_from_validation(self):
+        """Test the refit booster keeps the best round count found on the validation split"""
+        X, y = make_classification(n_samples=400, n_features=8, random_state=0)
+        search = EarlyStoppingSearch(max_estimators=200, early_stopping_rounds=5, scoring='f1_weighted',
+                                     verbose=0)
+        result = search.search(xgb.XGBClassifier(n_jobs=1, random_state=0),
+                               {'max_depth': [2, 4], 'learning_rate': [0.3]}, X, y)
+
+        best = max(result.candidates, key=lambda candidate: candidate['score'])
+        self.assertLess(best['rounds_trained'], 200)
+        self.assertEqual(result.best_estimator.get_booster().num_boosted_rounds(),
+                         best['params']['n_estimators'])
+        with self.assertRaises(ValueError):
+            search.search(RandomForestRegressor(), PARAM_GRID, self.X, self.y)
+
+    def test_model_records_search_in_history(self):
+        """Test tuning through NutritionAIModel keeps the search summary"""
+        model = NutritionAIModel(model_type='random_forest', task='regression')
+        model.build_model(params={'n_jobs': 1})
+        model.train(self.X, self.y, hyperparameter_tuning=True, search_strategy='sobol', n_iter=3,
+                    cv=3)
+
+        search = model.history['search']
+        self.assertEqual(search['strategy'], 'sobol')
+        self.assertEqual(search['n_candidates'], 3)
+        self.assertEqual(model.best_params, search['best_params'])
+        with self.assertRaises(ValueError):
+            get_strategy('exhaustive')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
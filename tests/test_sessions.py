@@ -0,0 +1,59 @@
+"""
+Test cases for the session store
+"""
+import unittest
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from sessions import InMemorySessionBackend, SessionStore
+
+class TestSessionStore(unittest.TestCase):
+    """Test cases for SessionStore"""
+
+    def test_create_lookup_revoke(self):
+        """Test tokens resolve until revoked"""
+        store = SessionStore()
+        token, expires = store.create('user-1', 'tests')
+        self.assertGreater(expires, time.time())
+        self.assertEqual(store.user_id(token), 'user-1')
+        self.assertTrue(store.revoke(token))
+        self.assertIsNone(store.user_id(token))
+        self.assertEqual(len(store), 0)
+
+    def test_expired_tokens_are_rejected_and_swept(self):
+        """Test expired sessions fail lookup and are removed by a sweep"""
+        store = SessionStore(ttl=-1, sweep_interval=3600)
+        first, _ = store.create('user-1')
+        second, _ = store.create('user-2')
+        self.assertIsNone(store.user_id(first))
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.backend.delete_expired(time.time()), 1)
+        self.assertEqual(len(store), 0)
+        self.assertIsNone(store.user_id(second))
+
+    def test_per_user_cap(self):
+        """Test the oldest sessions are signed out past the cap"""
+        store = SessionStore(max_per_user=2)
+        tokens = [store.create('user-1')[0] for _ in range(3)]
+        store.create('user-2')
+        self.assertIsNone(store.user_id(tokens[0]))
+        self.assertEqual(store.backend.user_tokens('user-1'), tokens[1:])
+        self.assertEqual(len(store), 3)
+
+
+class TestInMemorySessionBackend(unittest.TestCase):
+    """Test cases for InMemorySessionBackend"""
+
+    def test_sweep_only_removes_expired(self):
+        """Test sweeping follows expiry order and skips revoked sessions"""
+        backend = InMemorySessionBackend()
+        for i, expires in enumerate([30.0, 10.0, 20.0, 40.0]):
+            backend.put(f't{i}', {'user_id': 'u', 'created': 0.0, 'expires': expires, 'user_agent': ''})
+        backend.delete('t1')
+        self.assertEqual(backend.delete_expired(25.0), 1)
+        self.assertEqual(backend.user_tokens('u'), ['t0', 't3'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
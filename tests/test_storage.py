@@ -0,0 +1,237 @@
+"""
+Test cases for the shared storage backends and read-through cache
+"""
+import unittest
+import sqlite3
+import tempfile
+import threading
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from storage import (HTTPClient, LocalClient, MemoryBackend, ReadThroughCache, ServiceBackend,
+                     ServiceError, SQLiteBackend, StorageService, StoredSessionBackend)
+from sessions import SessionStore
+from flask import Flask
+from sql_storage import SQLAlchemyBackend
+
+class BackendContract:
+    """Checks every StorageBackend implementation must pass"""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.make_backend()
+
+    def test_records_and_change_feed(self):
+        """Test writes are readable and show up in the change feed"""
+        start = self.backend.sequence()
+        self.backend.put('users', 'u1', {'name': 'Ann'})
+        self.backend.put_many('meals', {'u1/m1': {'id': 'm1'}, 'u1/m2': {'id': 'm2'}})
+        self.assertEqual(self.backend.get('users', 'u1'), {'name': 'Ann'})
+        self.assertEqual(self.backend.count('meals'), 2)
+        self.assertTrue(self.backend.delete('meals', 'u1/m1'))
+        self.assertFalse(self.backend.delete('meals', 'u1/m1'))
+        self.assertEqual(self.backend.items('meals'), [('u1/m2', {'id': 'm2'})])
+
+        changes, latest = self.backend.changes_since(start)
+        self.assertEqual(changes, [('users', 'u1'), ('meals', 'u1/m1'), ('meals', 'u1/m2'),
+                                   ('meals', 'u1/m1')])
+        self.assertEqual(self.backend.changes_since(latest), ([], latest))
+
+    def test_expired_records(self):
+        """Test only live records whose expiry has passed are reported"""
+        self.backend.put_many('sessions', {'t1': {'expires': 1.0}, 't2': {'expires': 2.0},
+                                           't3': {'expires': 5.0}, 't4': {'expires': 1.5}})
+        self.backend.put('sessions', 't2', {'expires': 9.0})
+        self.backend.delete('sessions', 't4')
+        self.backend.put('users', 'u1', {'name': 'Ann'})
+        self.assertEqual(self.backend.expired('sessions', 2.0), ['t1'])
+        self.assertEqual(sorted(self.backend.expired('sessions', 9.0)), ['t1', 't2', 't3'])
+        self.assertEqual(self.backend.expired('users', 9.0), [])
+
+    def test_clear_invalidates_readers(self):
+        """Test readers behind a full clear are told to reload"""
+        self.backend.put('users', 'u1', {'name': 'Ann'})
+        seq = self.backend.sequence()
+        self.backend.clear()
+        self.assertIsNone(self.backend.changes_since(seq)[0])
+        self.assertEqual(self.backend.count('users'), 0)
+
+
+class TestMemoryBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return MemoryBackend()
+
+    def test_trimmed_feed_requires_reload(self):
+        """Test readers older than the trimmed feed are told to reload"""
+        backend = MemoryBackend(max_changes=4)
+        for i in range(6):
+            backend.put('users', f'u{i}', {})
+        self.assertIsNone(backend.changes_since(0)[0])
+        self.assertEqual(backend.changes_since(5)[0], [('users', 'u5')])
+
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'state.db')
+        return SQLiteBackend(self.path)
+
+    def test_expiry_column_added_to_old_files(self):
+        """Test a file from before the expires column gets it, filled from stored records"""
+        path = os.path.join(self.tmp.name, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE records (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+                                  PRIMARY KEY (namespace, key)) WITHOUT ROWID;
+            INSERT INTO records VALUES ('sessions', 't1', '{"expires": 1.0}');
+        """)
+        conn.close()
+        self.assertEqual(SQLiteBackend(path).expired('sessions', 2.0), ['t1'])
+
+    def test_caches_in_two_workers(self):
+        """Test a write through one worker's cache evicts the other's copy"""
+        first = ReadThroughCache(self.backend, cached=('users',))
+        second = ReadThroughCache(SQLiteBackend(self.path), cached=('users',))
+        first.put('users', 'u1', {'name': 'Ann'})
+        self.assertEqual(second.get('users', 'u1'), {'name': 'Ann'})
+
+        first.put('users', 'u1', {'name': 'Bea'})
+        self.assertEqual(second.get('users', 'u1'), {'name': 'Ann'})
+        self.assertEqual(second.sync(), [('users', 'u1'), ('users', 'u1')])
+        self.assertEqual(second.get('users', 'u1'), {'name': 'Bea'})
+
+    def test_sessions_shared_between_workers(self):
+        """Test a login on one worker is valid on another until logout"""
+        first = SessionStore(StoredSessionBackend(ReadThroughCache(self.backend, cached=('sessions',))))
+        second_cache = ReadThroughCache(SQLiteBackend(self.path), cached=('sessions',))
+        second = SessionStore(StoredSessionBackend(second_cache))
+        token, _ = first.create('u1')
+        self.assertEqual(second.user_id(token), 'u1')
+        first.revoke(token)
+        second_cache.sync()
+        self.assertIsNone(second.user_id(token))
+
+
+class TestServiceBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return ServiceBackend(LocalClient(MemoryBackend()))
+
+
+class TestHTTPServiceBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        service = StorageService(MemoryBackend(), port=0)
+        threading.Thread(target=service.serve_forever, daemon=True).start()
+        self.addCleanup(service.server_close)
+        self.addCleanup(service.shutdown)
+        self.url = service.url
+        return ServiceBackend(HTTPClient(self.url))
+
+    def test_workers_share_the_service(self):
+        """Test two clients see each other's writes and service errors are raised"""
+        other = ServiceBackend(HTTPClient(self.url))
+        self.backend.put('users', 'u1', {'name': 'Ann'})
+        self.assertEqual(other.get('users', 'u1'), {'name': 'Ann'})
+        with self.assertRaises(ServiceError):
+            self.backend.client.call('__init__')
+
+
+class TestSQLAlchemyBackend(unittest.TestCase):
+    """Test cases for SQLAlchemyBackend"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        uri = 'sqlite:///' + os.path.join(self.tmp.name, 'app.db')
+        self.backend = SQLAlchemyBackend(Flask(__name__), uri)
+        self.user = {'id': 'u1', 'email': 'a@example.com', 'name': 'Ann', 'password_hash': 'x',
+                     'profile': {'weight': 60.0, 'height': 165.0, 'goal': 'weight_loss', 'diet': 'vegan'},
+                     'preferences': {'allergies': ['nuts']}}
+        self.backend.put('users', 'u1', self.user)
+
+    def meal(self, meal_id, timestamp, *names):
+        return {'id': meal_id, 'timestamp': timestamp, 'meal_type': 'lunch',
+                'analysis': {'health_assessment': {'meal_score': 80}},
+                'foods': [{'name': n, 'quantity': 1.0, 'unit': 'serving',
+                           'nutrition': {'calories': 10.0, 'protein': 1.0, 'carbs': 2.0,
+                                         'fats': 0.5, 'fiber': 0.1}} for n in names]}
+
+    def test_user_round_trip(self):
+        """Test users keep column and JSON fields"""
+        self.assertEqual(self.backend.get('users', 'u1'), self.user)
+        self.assertEqual(self.backend.count('users'), 1)
+
+    def test_meals_round_trip(self):
+        """Test meals are stored as item rows and grouped back in time order"""
+        later = self.meal('m2', '2024-03-02T12:00:00', 'Rice')
+        earlier = self.meal('m1', '2024-03-01T12:00:00', 'Apple', 'Milk')
+        self.backend.put_many('meals', {'u1/m2': later, 'u1/m1': earlier})
+        self.assertEqual(self.backend.get('meals', 'u1/m1'), earlier)
+        self.assertEqual(self.backend.items('meals'), [('u1/m1', earlier), ('u1/m2', later)])
+        self.assertEqual(self.backend.count('meals'), 2)
+
+        self.assertTrue(self.backend.delete('meals', 'u1/m1'))
+        self.assertIsNone(self.backend.get('meals', 'u1/m1'))
+        changes, _ = self.backend.changes_since(1)
+        self.assertEqual(changes, [('meals', 'u1/m2'), ('meals', 'u1/m1'), ('meals', 'u1/m1')])
+
+    def test_state_records(self):
+        """Test other namespaces use the generic record table"""
+        self.backend.put('sessions', 't1', {'user_id': 'u1', 'expires': 1.0})
+        self.assertEqual(self.backend.items('sessions'), [('t1', {'user_id': 'u1', 'expires': 1.0})])
+        self.assertEqual(self.backend.expired('sessions', 2.0), ['t1'])
+        self.assertEqual(self.backend.expired('sessions', 0.5), [])
+        seq = self.backend.sequence()
+        self.backend.clear()
+        self.assertIsNone(self.backend.changes_since(seq)[0])
+        self.assertEqual(self.backend.count('users'), 0)
+
+    def test_writes_from_two_workers_arrive_in_sequence(self):
+        """Test sequence numbers come from the shared counter, one block per transaction"""
+        uri = 'sqlite:///' + os.path.join(self.tmp.name, 'app.db')
+        other = SQLAlchemyBackend(Flask('other'), uri)
+        seq = self.backend.sequence()
+        other.put('sessions', 't1', {'user_id': 'u1'})
+        self.backend.put_many('sessions', {'t2': {'user_id': 'u1'}, 't3': {'user_id': 'u1'}})
+        other.delete('sessions', 't1')
+        changes, latest = self.backend.changes_since(seq)
+        self.assertEqual(latest, seq + 4)
+        self.assertEqual(other.sequence(), latest)
+        self.assertEqual(changes, [('sessions', 't1'), ('sessions', 't2'), ('sessions', 't3'),
+                                   ('sessions', 't1')])
+
+    def test_old_schema_is_migrated(self):
+        """Test a database made by the original models gets the new columns and indexes"""
+        path = os.path.join(self.tmp.name, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+                                email VARCHAR(120) NOT NULL UNIQUE, password_hash VARCHAR(200) NOT NULL,
+                                age INTEGER, weight FLOAT, height FLOAT, gender VARCHAR(10),
+                                health_conditions TEXT, created_at DATETIME);
+            CREATE TABLE nutrition_logs (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,
+                                         meal_type VARCHAR(50), food_item VARCHAR(200) NOT NULL,
+                                         calories FLOAT, protein FLOAT, carbs FLOAT, fats FLOAT,
+                                         fiber FLOAT, sugar FLOAT, timestamp DATETIME, image_url VARCHAR(500));
+            INSERT INTO users (id, username, email, password_hash) VALUES (1, 'old', 'old@example.com', 'x');
+            INSERT INTO nutrition_logs (user_id, food_item) VALUES (1, 'Apple');
+        """)
+        conn.commit()
+        conn.close()
+
+        backend = SQLAlchemyBackend(Flask('old'), 'sqlite:///' + path)
+        (public_id, old_user), = backend.items('users')
+        self.assertEqual((old_user['email'], len(public_id)), ('old@example.com', 32))
+        backend.put('users', 'u1', self.user)
+        backend.put('meals', 'u1/m1', self.meal('m1', '2024-03-01T12:00:00', 'Rice'))
+        self.assertEqual([key for key, _ in backend.items('meals')], ['u1/m1'])
+        self.assertEqual(backend.count('meals'), 1)
+        indexes = {name for name, in sqlite3.connect(path).execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'ix_users_public_id', 'ix_nutrition_logs_user_id_timestamp'} <= indexes)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,114 @@
+"""
+Test cases for day bitmaps and the streak leaderboard
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from streaks import DayLog, StreakBoard
+
+class TestDayLog(unittest.TestCase):
+    """Test cases for DayLog"""
+
+    def test_consecutive_days_extend_run(self):
+        """Test logging the next day extends the streak"""
+        log = DayLog()
+        for day in (100, 101, 101, 102):
+            log.add(day)
+        self.assertEqual(log.streak(102), 3)
+        self.assertEqual(log.streak(103), 0)
+        self.assertEqual(len(log), 3)
+
+    def test_from_counts_matches_adding_meals(self):
+        """Test a log built from per-day counts equals one built meal by meal"""
+        log = DayLog()
+        for day in (90, 100, 101, 101, 102):
+            log.add(day)
+        built = DayLog.from_counts([90, 100, 101, 102], [1, 1, 2, 1])
+        for days in (log, built):
+            self.assertEqual((days.streak(102), len(days), days.days_between(95, 101)), (3, 4, 2))
+        built.remove(101)
+        self.assertEqual(built.streak(102), 3)
+        self.assertEqual(DayLog.from_counts([], []).streak(102), 0)
+
+    def test_back_dated_day_bridges_gap(self):
+        """Test filling a gap joins the runs on either side"""
+        log = DayLog()
+        for day in (100, 101, 103, 104):
+            log.add(day)
+        self.assertEqual(log.streak(104), 2)
+        log.add(102)
+        self.assertEqual(log.streak(104), 5)
+        log.add(90)
+        self.assertEqual(log.streak(104), 5)
+
+    def test_remove_breaks_run_only_when_day_empties(self):
+        """Test deletes keep days with other meals and split runs"""
+        log = DayLog()
+        for day in (100, 101, 101, 102):
+            log.add(day)
+        log.remove(101)
+        self.assertEqual(log.streak(102), 3)
+        log.remove(101)
+        self.assertEqual(log.streak(102), 1)
+        log.remove(102)
+        self.assertEqual(log.streak(100), 1)
+        log.remove(100)
+        self.assertEqual(log.streak(100), 0)
+        self.assertIsNone(log.last_day)
+
+    def test_days_between(self):
+        """Test counting logged days in a window"""
+        log = DayLog()
+        for day in (95, 100, 101, 110):
+            log.add(day)
+        self.assertEqual(log.days_between(100, 110), 3)
+        self.assertEqual(log.days_between(80, 99), 1)
+        self.assertEqual(log.days_between(111, 140), 0)
+
+    def test_matches_date_walk(self):
+        """Test the run matches walking back day by day"""
+        import random
+        rng = random.Random(7)
+        log = DayLog()
+        days = []
+        for _ in range(500):
+            if days and rng.random() < 0.3:
+                day = days.pop(rng.randrange(len(days)))
+                log.remove(day)
+            else:
+                day = rng.randrange(1000, 1060)
+                days.append(day)
+                log.add(day)
+            today = max(days) if days else 0
+            expected = 0
+            while today - expected in days:
+                expected += 1
+            self.assertEqual(log.streak(today), expected)
+
+
+class TestStreakBoard(unittest.TestCase):
+    """Test cases for StreakBoard"""
+
+    def test_leaders_skip_superseded_and_lapsed(self):
+        """Test only current streaks ending today are ranked"""
+        board = StreakBoard()
+        logs = {user: DayLog() for user in ('a', 'b', 'c')}
+        for day in (8, 9, 10):
+            logs['a'].add(day)
+        for day in (9, 10):
+            logs['b'].add(day)
+        logs['c'].add(9)
+        for user, log in logs.items():
+            board.update(user, log)
+        self.assertEqual(board.leaders(10), [('a', 3), ('b', 2)])
+
+        logs['a'].remove(9)
+        board.update('a', logs['a'])
+        self.assertEqual(board.leaders(10), [('b', 2), ('a', 1)])
+        self.assertEqual(board.leaders(10, limit=1), [('b', 2)])
+        self.assertEqual(board.leaders(11), [])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
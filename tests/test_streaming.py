@@ -0,0 +1,117 @@
+"""
+Test cases for the out-of-core cleaning and training path
+"""
+import unittest
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml-models'))
+
+import numpy as np
+from sklearn.metrics import r2_score
+
+from data_processor import NutritionDataProcessor
+from nutrition_model import NutritionAIModel
+from streaming import QuantileSketch
+
+class TestQuantileSketch(unittest.TestCase):
+    """Test cases for the streaming quantile sketch"""
+
+    def test_rank_error_is_small(self):
+        """Test quantiles of a long stream stay within a small rank error"""
+        values = np.random.RandomState(0).lognormal(size=400_000)
+        sketch, other = QuantileSketch(k=1024), QuantileSketch(k=1024, seed=1)
+        for chunk in np.array_split(values[:200_000], 40):
+            sketch.update(chunk)
+        other.update(values[200_000:])
+        sketch.merge(other)
+
+        quantiles = np.array([0.01, 0.25, 0.5, 0.75, 0.99])
+        ranks = np.searchsorted(np.sort(values), sketch.quantile(quantiles)) / len(values)
+        self.assertLess(np.abs(ranks - quantiles).max(), 0.005)
+        self.assertEqual(sketch.count, 400_000)
+        self.assertLess(sum(len(level) for level in sketch.levels), 20_000)
+
+    def test_exact_below_capacity(self):
+        """Test small streams give exact order statistics and skip NaNs"""
+        sketch = QuantileSketch(k=100)
+        sketch.update([5.0, np.nan, 1.0, 3.0, 2.0, 4.0])
+        self.assertEqual(sketch.quantile(0.5), 3.0)
+        self.assertEqual(list(sketch.quantile([0.0, 1.0])), [1.0, 5.0])
+
+class TestStreamingTraining(unittest.TestCase):
+    """Test cases for cleaning a CSV in chunks and training from the cache"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        processor = NutritionDataProcessor()
+        df = processor._generate_synthetic_data()
+        df.loc[::17, 'sleep_hours'] = np.nan
+        cls.csv = os.path.join(cls.tmp.name, 'meals.csv')
+        df.to_csv(cls.csv, index=False)
+
+        cls.processor = NutritionDataProcessor()
+        cls.cache = cls.processor.stream_clean_data(cls.csv, os.path.join(cls.tmp.name, 'cache'),
+                                                    chunksize=700, sketch_size=8192)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_streaming_matches_in_memory_cleaning(self):
+        """Test chunked statistics agree with cleaning the whole file at once"""
+        in_memory = NutritionDataProcessor()
+        cleaned = in_memory.load_and_clean_data(self.csv)
+
+        self.assertEqual(len(self.cache.manifest['rows']), 8)
+        self.assertLess(abs(len(self.cache) - len(cleaned)) / len(cleaned), 0.02)
+        self.assertFalse(any(chunk.isnull().any().any() for chunk in self.cache.chunks()))
+        np.testing.assert_allclose(self.processor.imputer.statistics_, in_memory.imputer.statistics_,
+                                   rtol=1e-3)
+        features = self.processor.processed_data['feature_names']
+        self.assertEqual(list(self.processor.scaler.feature_names_in_), features)
+        self.assertEqual(self.processor.scaler.n_samples_seen_, len(self.cache))
+
+    def stream(self, name, edit):
+        """Stream-clean 1000 synthetic rows in chunks of 300 after `edit` changes them"""
+        df = NutritionDataProcessor()._generate_synthetic_data().head(1000)
+        edit(df)
+        path = os.path.join(self.tmp.name, f'{name}.csv')
+        df.to_csv(path, index=False)
+        processor = NutritionDataProcessor()
+        cache = processor.stream_clean_data(path, os.path.join(self.tmp.name, name), chunksize=300)
+        chunks = list(cache.chunks())
+        self.assertFalse(any(chunk.isnull().any().any() for chunk in chunks))
+        return processor, chunks
+
+    def test_text_column_empty_in_first_chunk(self):
+        """Test a text column with no values in the first chunk is still categorical"""
+        def edit(df):
+            df.loc[:299, 'region'] = np.nan
+        processor, _ = self.stream('late_region', edit)
+        self.assertEqual(list(processor.label_encoders['region'].classes_), ['Rural', 'Suburban', 'Urban'])
+
+    def test_numeric_column_with_no_values(self):
+        """Test a numeric column empty in every chunk is kept and filled with 0"""
+        def edit(df):
+            df['sleep_hours'] = np.nan
+        processor, chunks = self.stream('no_sleep', edit)
+        self.assertTrue(all((chunk['sleep_hours'] == 0).all() for chunk in chunks))
+        self.assertIn('sleep_hours', processor.scaler.feature_names_in_)
+
+    def test_models_train_from_cache(self):
+        """Test partial_fit, external-memory and per-batch forest training"""
+        X, y = next(self.processor.iter_training_batches(self.cache))
+        batches = lambda: self.processor.iter_training_batches(self.cache)
+        for model_type in ('neural_network', 'xgboost', 'random_forest'):
+            model = NutritionAIModel(model_type=model_type, task='regression', n_cores=1)
+            model.build_model(params={'n_estimators': 50} if model_type == 'xgboost' else None)
+            model.train_streaming(batches, epochs=40, trees_per_batch=5)
+
+            self.assertEqual(model.history['streaming']['rows'], len(self.cache))
+            self.assertGreater(r2_score(y, model.predict(X)), 0.5, model_type)
+        self.assertEqual(len(model.model.estimators_), 40)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
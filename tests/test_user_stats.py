@@ -0,0 +1,58 @@
+"""
+Test cases for rolling user statistics
+"""
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from user_stats import RollingStats
+
+class TestRollingStats(unittest.TestCase):
+    """Test cases for RollingStats"""
+
+    def setUp(self):
+        """Set up a 7-day window"""
+        self.stats = RollingStats(window_days=7)
+        self.today = 738000
+
+    def test_window_sums(self):
+        """Test meals inside the window are summed"""
+        self.stats.add(self.today, 500, 80)
+        self.stats.add(self.today - 6, 300, 60)
+        self.stats.add(self.today - 7, 900, 10)  # Outside the window
+        self.assertEqual(self.stats.window(self.today), (800, 140, 2))
+
+    def test_remove(self):
+        """Test deletes subtract from the right bucket"""
+        self.stats.add(self.today, 500, 80)
+        self.stats.add(self.today, 250, 70)
+        self.stats.remove(self.today, 500, 80)
+        self.assertEqual(self.stats.window(self.today), (250, 70, 1))
+        self.stats.remove(self.today, 250, 70)
+        self.assertEqual(self.stats.window(self.today), (0, 0, 0))
+
+    def test_lazy_expiry(self):
+        """Test reused slots drop the day they previously held"""
+        self.stats.add(self.today, 500, 80)
+        later = self.today + self.stats.size
+        self.stats.add(later, 100, 90)
+        self.assertEqual(self.stats.window(later), (100, 90, 1))
+        # Removing the expired meal is a no-op
+        self.stats.remove(self.today, 500, 80)
+        self.assertEqual(self.stats.window(later), (100, 90, 1))
+
+    def test_old_meals_do_not_clobber_newer_buckets(self):
+        """Test a meal older than the buffer is ignored"""
+        self.stats.add(self.today, 500, 80)
+        self.stats.add(self.today - self.stats.size, 700, 50)
+        self.assertEqual(self.stats.window(self.today), (500, 80, 1))
+
+    def test_window_moves_with_time(self):
+        """Test reading later drops days that left the window"""
+        self.stats.add(self.today, 500, 80)
+        self.assertEqual(self.stats.window(self.today + 6)[2], 1)
+        self.assertEqual(self.stats.window(self.today + 7)[2], 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)